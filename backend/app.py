@@ -3,6 +3,10 @@ import os
 from flask_jwt_extended import JWTManager
 from config import DevConfig
 from extensions import db
+from cache import catalog_cache, make_backend
+import metrics
+import sql_debug
+import profiling
 from flask_cors import CORS
 
 
@@ -15,10 +19,15 @@ def create_app():
     uploads_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), 'uploads'))
     os.makedirs(uploads_dir, exist_ok=True)
 
-    # init extensions
+    # init extensions (metrics first: it selects the pool class used by db)
+    metrics.init_app(app)
     db.init_app(app)
+    if app.config['SQL_DEBUG']:
+        sql_debug.init_app(app)
+    profiling.init_app(app)
     JWTManager(app)
-    CORS(app, resources={r"/api/*": {"origins": "*"}})
+    CORS(app, resources={r"/api/*": {"origins": "*"}}, expose_headers=["ETag", "Last-Modified", "X-Profile", "X-Profile-SQL", "Content-Disposition"])
+    catalog_cache.configure(make_backend(app.config['CATALOG_CACHE_URL']), app.config['CATALOG_CACHE_MAX_AGE'])
 
     # Register blueprints
     from routes.auth import bp as auth_bp
@@ -31,6 +40,7 @@ def create_app():
     from routes.catalog import bp as catalog_bp
     from routes.relationships import bp as relationships_bp
     from routes.product_supplier import bp as product_supplier_bp
+    from routes.exports import bp as exports_bp
 
     app.register_blueprint(auth_bp, url_prefix='/api/auth')
     app.register_blueprint(products_bp, url_prefix='/api/products')
@@ -42,7 +52,9 @@ def create_app():
     app.register_blueprint(catalog_bp, url_prefix='/api/catalog')
     app.register_blueprint(relationships_bp, url_prefix='/api/relationships')
     app.register_blueprint(product_supplier_bp, url_prefix='/api/product-supplier')
+    app.register_blueprint(exports_bp, url_prefix='/api/exports')
 
+    # Liveness only; readiness (DB reachable, pool not saturated) is /api/ready
     @app.get('/api/health')
     def health():
         return jsonify(status='ok')
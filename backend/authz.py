@@ -0,0 +1,46 @@
+"""
+Shared authorization helpers for route handlers
+
+The role of the calling user is looked up once (users JOIN roles) and cached
+per process for ROLE_CACHE_SECONDS. Handlers that change a user's role or
+status call invalidate_role() so the change applies immediately in this
+process; other workers pick it up when their entry expires.
+"""
+import time
+
+from flask import current_app
+from flask_jwt_extended import get_jwt_identity
+from sqlalchemy import select
+
+from extensions import db
+from models import User, Role
+
+_role_cache = {}  # user_id -> (expires_at, role_name or None)
+
+
+def current_role():
+    """Role name of the JWT user, or None if unknown/inactive"""
+    try:
+        uid = int(get_jwt_identity())
+    except (TypeError, ValueError):
+        return None
+    now = time.monotonic()
+    hit = _role_cache.get(uid)
+    if hit and hit[0] > now:
+        return hit[1]
+    row = db.session.execute(
+        select(Role.role_name, User.status)
+        .join(User, User.role_id == Role.role_id)
+        .where(User.user_id == uid)
+    ).first()
+    role = row.role_name if row and row.status == 'active' else None
+    _role_cache[uid] = (now + current_app.config['ROLE_CACHE_SECONDS'], role)
+    return role
+
+
+def require_manager() -> bool:
+    return current_role() == 'manager'
+
+
+def invalidate_role(user_id: int):
+    _role_cache.pop(user_id, None)
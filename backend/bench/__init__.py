@@ -0,0 +1,3 @@
+"""
+Performance tooling run from backend/ (python -m bench.<module>); not part of the app
+"""
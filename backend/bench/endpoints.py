@@ -0,0 +1,250 @@
+"""
+Endpoint micro-benchmarks with EXPLAIN plan checks and a stored baseline
+
+Run from backend/ against a scratch database (DATABASE_URL). Before each size
+is measured, the database is topped up to that size with generate_scale_data.py,
+so sizes are cumulative and a re-run reuses the data already loaded:
+
+    python -m bench.endpoints                       # all sizes, compare with bench/baseline.json
+    python -m bench.endpoints --sizes small         # one size
+    python -m bench.endpoints --update-baseline     # record the current numbers as the baseline
+
+Each endpoint is called in-process through app.test_client(). The benchmark
+records p50/p95 latency, peak Python memory per request (tracemalloc), response
+size and SQL statement count. It also EXPLAINs each distinct SELECT the
+endpoint issued. Compared with the baseline, the run fails (exit code 1) when:
+  - p50 latency grows by more than --tolerance (plus LATENCY_SLACK_MS)
+  - the endpoint issues more SQL statements than before
+  - a table that was read through an index is now fully scanned
+"""
+import argparse
+import datetime
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+# The dev-mode SQL diagnostics walk the stack on every statement; keep them out of the timings
+os.environ.setdefault('SQL_DEBUG', '0')
+
+from flask_jwt_extended import create_access_token
+from sqlalchemy import event, text
+from sqlalchemy.engine import Engine
+
+import generate_scale_data
+from app import create_app
+from extensions import db
+from sql_debug import fingerprint
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+SIZES = {
+    'small': {'products': 1_000, 'warehouses': 3, 'suppliers': 50, 'transactions': 100_000},
+    'medium': {'products': 10_000, 'warehouses': 5, 'suppliers': 200, 'transactions': 1_000_000},
+    'large': {'products': 20_000, 'warehouses': 8, 'suppliers': 400, 'transactions': 10_000_000},
+}
+WARMUP = 2
+LATENCY_SLACK_MS = 2.0
+FULL_SCAN_TYPES = ('ALL', 'index')
+# Full scans estimated below this many rows (roles, a handful of warehouses) are not flagged
+FULL_SCAN_MIN_ROWS = 1000
+
+
+def _endpoints(pid, wid):
+    """(name, method, url, body(i)) for every benchmarked endpoint"""
+    today = datetime.date.today()
+    year_ago = today - datetime.timedelta(days=365)
+    move = {'product_id': pid, 'warehouse_id': wid, 'reason': 'bench'}
+    return [
+        ('reports/current-stock', 'GET', '/api/reports/current-stock', None),
+        ('reports/low-stock', 'GET', '/api/reports/low-stock', None),
+        ('reports/monthly-in-out', 'GET', f'/api/reports/monthly-in-out?from={year_ago}&to={today}', None),
+        ('reports/txns', 'GET', '/api/reports/txns?limit=500', None),
+        ('reports/txns?product_id', 'GET', f'/api/reports/txns?product_id={pid}&limit=500', None),
+        ('products', 'GET', '/api/products/', None),
+        ('products?limit', 'GET', '/api/products/?limit=100', None),
+        ('relationships/product-supplier-warehouse', 'GET', '/api/relationships/product-supplier-warehouse', None),
+        ('relationships/warehouse-managers', 'GET', '/api/relationships/warehouse-managers', None),
+        ('relationships/supplier-warehouses', 'GET', '/api/relationships/supplier-warehouses', None),
+        # Writes net out: every IN of 1 is followed by an OUT of 1, ADJUST alternates +1/-1
+        ('stock/in', 'POST', '/api/stock/in', lambda i: {**move, 'quantity': 1}),
+        ('stock/out', 'POST', '/api/stock/out', lambda i: {**move, 'quantity': 1}),
+        ('stock/adjust', 'POST', '/api/stock/adjust', lambda i: {**move, 'signed_delta': 1 if i % 2 == 0 else -1}),
+    ]
+
+
+class StatementLog:
+    """Records every SQL statement run while active, with parameters rendered in"""
+
+    def __init__(self):
+        self.statements = []
+
+    def _capture(self, conn, cursor, statement, parameters, context, executemany):
+        mogrify = getattr(cursor, 'mogrify', None)
+        rendered = mogrify and parameters and not executemany
+        self.statements.append(mogrify(statement, parameters) if rendered else statement)
+
+    def __enter__(self):
+        event.listen(Engine, 'before_cursor_execute', self._capture)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(Engine, 'before_cursor_execute', self._capture)
+
+
+def explain(statement: str):
+    """EXPLAIN steps (table, type, key, rows, Extra) of a statement with its parameters rendered in"""
+    raw = db.engine.raw_connection()
+    try:
+        cur = raw.cursor()
+        cur.execute('EXPLAIN ' + statement)
+        cols = [c[0] for c in cur.description]
+        return [{k: row[cols.index(k)] for k in ('table', 'type', 'key', 'rows', 'Extra')}
+                for row in cur.fetchall()]
+    finally:
+        raw.close()
+
+
+def _measure(client, headers, method, url, body, iterations):
+    def call(i):
+        resp = client.open(url, method=method, headers=headers, json=body(i) if body else None)
+        if resp.status_code >= 400:
+            raise RuntimeError(f'{method} {url} -> {resp.status_code}: {resp.get_data(as_text=True)[:200]}')
+        return resp
+
+    for i in range(WARMUP):
+        call(i)
+    times = []
+    for i in range(iterations):
+        start = time.perf_counter()
+        call(i)
+        times.append((time.perf_counter() - start) * 1000)
+
+    # One extra call (not timed) for allocations and the statements it runs
+    with StatementLog() as log:
+        tracemalloc.start()
+        resp = call(iterations)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    plans = {}
+    for statement in log.statements:
+        fp = fingerprint(statement)
+        if fp.upper().startswith(('SELECT', 'WITH')) and fp not in plans:
+            plans[fp] = explain(statement)
+    times.sort()
+    return {
+        'p50_ms': round(statistics.median(times), 2),
+        'p95_ms': round(times[min(len(times) - 1, int(len(times) * 0.95))], 2),
+        'peak_kib': round(peak / 1024, 1),
+        'bytes': len(resp.get_data()),
+        'sql': len(log.statements),
+        'plans': plans,
+    }
+
+
+def _seed(size: str):
+    """Top the database up to SIZES[size] with generate_scale_data (skipped if already loaded)"""
+    target = SIZES[size]
+    prefix = f'B{size.upper()}'
+    counts = {}
+    for key, sql in (('products', 'SELECT COUNT(*) FROM products'),
+                     ('warehouses', 'SELECT COUNT(*) FROM warehouses'),
+                     ('suppliers', 'SELECT COUNT(*) FROM suppliers'),
+                     ('transactions', 'SELECT COUNT(*) FROM inventory_transactions'),
+                     ('seeded', f"SELECT COUNT(*) FROM products WHERE sku LIKE '{prefix}-%'")):
+        counts[key] = db.session.execute(text(sql)).scalar()
+    db.session.commit()
+    if counts['seeded']:
+        return
+    argv = ['--prefix', prefix]
+    for key in ('products', 'warehouses', 'suppliers'):
+        argv += [f'--{key}', str(max(1, target[key] - counts[key]))]
+    argv += ['--transactions', str(max(0, target['transactions'] - counts['transactions']))]
+    generate_scale_data.main(argv)
+
+
+def _regressions(size, name, now, base, tolerance):
+    found = []
+    if now['p50_ms'] > base['p50_ms'] * (1 + tolerance) + LATENCY_SLACK_MS:
+        found.append(f"p50 {base['p50_ms']} -> {now['p50_ms']} ms")
+    if now['sql'] > base['sql']:
+        found.append(f"SQL statements {base['sql']} -> {now['sql']}")
+    for fp, base_plan in base.get('plans', {}).items():
+        was_indexed = {step['table'] for step in base_plan if step['type'] not in FULL_SCAN_TYPES}
+        for step in now['plans'].get(fp, []):
+            if step['table'] in was_indexed and step['type'] in FULL_SCAN_TYPES \
+                    and (step['rows'] or 0) >= FULL_SCAN_MIN_ROWS:
+                found.append(f"full scan of {step['table']} ({step['rows']} rows) in: {fp[:120]}")
+    return [f'[{size}] {name}: {r}' for r in found]
+
+
+def run(sizes, iterations, tolerance, update_baseline):
+    app = create_app()
+    baseline = {}
+    if os.path.exists(BASELINE_PATH):
+        with open(BASELINE_PATH, encoding='utf-8') as f:
+            baseline = json.load(f)
+    results, failures = {}, []
+    with app.app_context():
+        for size in sizes:
+            _seed(size)
+            manager_id = db.session.execute(text("""
+                SELECT u.user_id FROM users u JOIN roles r ON r.role_id = u.role_id
+                WHERE r.role_name = 'manager' AND u.status = 'active' ORDER BY u.user_id LIMIT 1
+            """)).scalar()
+            pid, wid = db.session.execute(text(
+                'SELECT product_id, warehouse_id FROM stock_balances ORDER BY qty_on_hand DESC LIMIT 1'
+            )).one()
+            db.session.commit()
+            headers = {'Authorization': 'Bearer ' + create_access_token(
+                identity=str(manager_id), additional_claims={'role': 'manager'})}
+            client = app.test_client()
+
+            print(f"\n== {size} ==")
+            print(f"{'endpoint':<44}{'p50 ms':>9}{'p95 ms':>9}{'peak KiB':>10}{'KiB out':>9}{'SQL':>5}")
+            results[size] = {}
+            for name, method, url, body in _endpoints(pid, wid):
+                now = _measure(client, headers, method, url, body, iterations)
+                results[size][name] = now
+                print(f"{name:<44}{now['p50_ms']:>9}{now['p95_ms']:>9}{now['peak_kib']:>10}"
+                      f"{now['bytes'] / 1024:>9.1f}{now['sql']:>5}")
+                for fp, plan in now['plans'].items():
+                    scans = [s for s in plan if s['type'] in FULL_SCAN_TYPES and (s['rows'] or 0) >= FULL_SCAN_MIN_ROWS]
+                    for s in scans:
+                        print(f"    full scan: {s['table']} (~{s['rows']} rows) in {fp[:100]}")
+                base = baseline.get(size, {}).get(name)
+                if base and not update_baseline:
+                    failures += _regressions(size, name, now, base, tolerance)
+
+    if update_baseline:
+        for size, endpoints in results.items():
+            baseline.setdefault(size, {}).update(endpoints)
+        with open(BASELINE_PATH, 'w', encoding='utf-8') as f:
+            json.dump(baseline, f, indent=2, sort_keys=True, default=str)
+        print(f"\n✅ Đã lưu baseline: {BASELINE_PATH}")
+        return 0
+    if failures:
+        print('\n❌ Regressions:')
+        for line in failures:
+            print('  ' + line)
+        return 1
+    print('\n✅ Không có regression' if baseline else '\n⚠️  Chưa có baseline (chạy với --update-baseline)')
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark các endpoint chính')
+    parser.add_argument('--sizes', default=','.join(SIZES), help=f"comma-separated, from {', '.join(SIZES)}")
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed p50 growth (0.25 = 25%%)')
+    parser.add_argument('--update-baseline', action='store_true')
+    args = parser.parse_args(argv)
+    sizes = [s for s in args.sizes.split(',') if s]
+    unknown = [s for s in sizes if s not in SIZES]
+    if unknown:
+        parser.error(f"unknown size: {', '.join(unknown)}")
+    return run(sizes, args.iterations, args.tolerance, args.update_baseline)
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,269 @@
+"""
+Concurrent mixed-workload load generator for a running backend
+
+Replays a weighted mix of JWT-authenticated calls (stock writes on hot SKUs,
+reports, catalog reads, logins) at a target rate against a local server:
+
+    python app.py                                                  # in another terminal
+    python -m bench.load --rate 80 --duration 60 --workers 64
+    python -m bench.load --mix stock_out=60,stock_in=30,dashboard=10 --hot 5
+
+Arrivals are open-loop (Poisson at --rate): latency is measured from the time a
+call was scheduled, so a server that falls behind shows up in the percentiles
+instead of silently lowering the offered load. Stock writes target the --hot
+fullest (product, warehouse) pairs with Zipf skew, the way shift-change traffic
+piles onto a few SKUs.
+
+Reported per endpoint: throughput, p50/p90/p99/max latency, errors, deadlocks
+and lock-wait timeouts (from the 409 body). Unless --no-db is given, InnoDB
+row-lock waits, deadlocks and the statements with the most lock time are read
+from the database before and after the run and reported as deltas.
+"""
+import argparse
+import itertools
+import random
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from sqlalchemy import create_engine
+from sqlalchemy.pool import NullPool
+
+from set_default_passwords import DEFAULT_PASSWORDS
+
+DEFAULT_MIX = 'stock_out=35,stock_in=20,stock_adjust=5,dashboard=10,current_stock=5,txns=5,' \
+              'catalog=10,search=5,products=3,login=2'
+REQUEST_TIMEOUT = 30
+TOP_DIGESTS = 10
+PICO = 1e12
+
+
+class Workload:
+    """Builds (method, path, json) for each operation from the data read at start-up"""
+
+    def __init__(self, base_url, users, hot, skew, rng):
+        self.base_url = base_url.rstrip('/')
+        self.users = users
+        self.rng = rng
+        self.tokens = [self._login(u, p) for u, p in users]
+        manager = self.tokens[0]
+        resp = requests.get(f'{self.base_url}/api/reports/current-stock', timeout=REQUEST_TIMEOUT,
+                            headers={'Authorization': f'Bearer {manager}'})
+        resp.raise_for_status()
+        stock = sorted(resp.json()['items'], key=lambda r: r['stock_quantity'], reverse=True)[:hot]
+        if not stock:
+            sys.exit("Chưa có tồn kho nào; hãy chạy generate_scale_data.py trước.")
+        self.pairs = [(r['product_id'], r['warehouse_id']) for r in stock]
+        self.skus = [r['sku'] for r in stock]
+        self.cum_weights = list(itertools.accumulate(1 / (i + 1) ** skew for i in range(len(self.pairs))))
+
+    def _login(self, username, password):
+        resp = requests.post(f'{self.base_url}/api/auth/login', json={'username': username, 'password': password},
+                             timeout=REQUEST_TIMEOUT)
+        if resp.status_code != 200:
+            sys.exit(f"Đăng nhập thất bại cho {username}: {resp.status_code} {resp.text[:200]}")
+        return resp.json()['access_token']
+
+    def _move(self, rng, **extra):
+        pid, wid = rng.choices(self.pairs, cum_weights=self.cum_weights)[0]
+        return {'product_id': pid, 'warehouse_id': wid, 'reason': 'load test', **extra}
+
+    def build(self, op, rng):
+        """(method, path, json, token) for one call of `op`"""
+        token = rng.choice(self.tokens)
+        if op == 'stock_out':
+            return 'POST', '/api/stock/out', self._move(rng, quantity=rng.randint(1, 3)), token
+        if op == 'stock_in':
+            return 'POST', '/api/stock/in', self._move(rng, quantity=rng.randint(5, 20)), token
+        if op == 'stock_adjust':
+            return 'POST', '/api/stock/adjust', self._move(rng, signed_delta=rng.choice((-1, 1))), token
+        if op == 'login':
+            username, password = rng.choice(self.users)
+            return 'POST', '/api/auth/login', {'username': username, 'password': password}, None
+        if op == 'search':
+            return 'GET', f'/api/catalog/products/search?q={rng.choice(self.skus)[:4]}', None, token
+        return ('GET', {
+            'dashboard': '/api/reports/dashboard',
+            'current_stock': '/api/reports/current-stock',
+            'txns': '/api/reports/txns?limit=500',
+            'catalog': '/api/catalog/products-min',
+            'products': '/api/products/?limit=100',
+        }[op], None, token)
+
+
+OPS = ('stock_out', 'stock_in', 'stock_adjust', 'dashboard', 'current_stock', 'txns',
+       'catalog', 'search', 'products', 'login')
+
+
+class Results:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = defaultdict(list)  # op -> [ms from scheduled start]
+        self.outcomes = defaultdict(Counter)
+
+    def record(self, op, ms, outcome):
+        with self._lock:
+            self.latencies[op].append(ms)
+            self.outcomes[op][outcome] += 1
+
+
+def _outcome(resp):
+    if resp.status_code < 400:
+        return 'ok'
+    if resp.status_code == 409:
+        try:
+            return resp.json().get('reason') or 'conflict'
+        except ValueError:
+            return 'conflict'
+    if resp.status_code == 400 and resp.request.path_url.startswith('/api/stock/'):
+        return 'rejected'  # business rule, e.g. insufficient stock
+    return f'http_{resp.status_code}'
+
+
+def _percentile(sorted_ms, q):
+    return sorted_ms[min(len(sorted_ms) - 1, int(len(sorted_ms) * q))] if sorted_ms else 0.0
+
+
+# ---------------------
+# Database-side lock counters (deltas over the run)
+# ---------------------
+def _db_snapshot(conn):
+    snap = {'status': {}, 'deadlocks': None, 'digests': {}}
+    cur = conn.cursor()
+    cur.execute("SHOW GLOBAL STATUS LIKE 'Innodb_row_lock_%'")
+    snap['status'] = {name: int(value) for name, value in cur.fetchall()}
+    try:
+        cur.execute("SELECT `COUNT` FROM information_schema.INNODB_METRICS WHERE NAME = 'lock_deadlocks'")
+        row = cur.fetchone()
+        snap['deadlocks'] = int(row[0]) if row else None
+    except Exception:
+        conn.rollback()
+    try:
+        cur.execute("""
+            SELECT DIGEST, DIGEST_TEXT, COUNT_STAR, SUM_LOCK_TIME, SUM_TIMER_WAIT
+            FROM performance_schema.events_statements_summary_by_digest
+            WHERE SCHEMA_NAME = DATABASE()
+        """)
+        snap['digests'] = {d: (t, n, lock, wait) for d, t, n, lock, wait in cur.fetchall()}
+    except Exception:
+        conn.rollback()  # performance_schema off or not readable by this user
+    conn.commit()
+    return snap
+
+
+def _db_report(before, after):
+    status = {k: after['status'].get(k, 0) - before['status'].get(k, 0)
+              for k in ('Innodb_row_lock_waits', 'Innodb_row_lock_time')}
+    print('\nDatabase (delta over the run):')
+    print(f"  row lock waits: {status['Innodb_row_lock_waits']}, "
+          f"row lock time: {status['Innodb_row_lock_time']} ms, "
+          f"max single wait: {after['status'].get('Innodb_row_lock_time_max', 0)} ms (since server start)")
+    if after['deadlocks'] is not None and before['deadlocks'] is not None:
+        print(f"  deadlocks: {after['deadlocks'] - before['deadlocks']}")
+    rows = []
+    for digest, (text_, n, lock, wait) in after['digests'].items():
+        _, n0, lock0, wait0 = before['digests'].get(digest, (None, 0, 0, 0))
+        if n - n0:
+            rows.append(((lock - lock0) / PICO * 1000, n - n0, (wait - wait0) / PICO * 1000, text_ or ''))
+    if rows:
+        print(f"  statements by lock time (performance_schema, top {TOP_DIGESTS}):")
+        print(f"    {'lock ms':>10}{'calls':>8}{'total ms':>11}  statement")
+        for lock_ms, n, wait_ms, text_ in sorted(rows, reverse=True)[:TOP_DIGESTS]:
+            print(f"    {lock_ms:>10.1f}{n:>8}{wait_ms:>11.1f}  {' '.join(text_.split())[:90]}")
+
+
+def run(args):
+    rng = random.Random(args.seed)
+    mix = {}
+    for part in args.mix.split(','):
+        op, _, weight = part.partition('=')
+        if op not in OPS or not weight.isdigit():
+            sys.exit(f"--mix không hợp lệ: {part!r} (chọn trong: {', '.join(OPS)})")
+        mix[op] = int(weight)
+    users = [tuple(u.split(':', 1)) for u in args.users.split(',')]
+    workload = Workload(args.base_url, users, args.hot, args.skew, rng)
+    ops, cum = list(mix), list(itertools.accumulate(mix.values()))
+
+    db_conn = None
+    if not args.no_db:
+        from app import create_app
+        url = args.db_url or create_app().config['SQLALCHEMY_DATABASE_URI']
+        db_conn = create_engine(url, poolclass=NullPool).raw_connection()
+    before = _db_snapshot(db_conn) if db_conn else None
+
+    results = Results()
+    local = threading.local()
+
+    def call(op, scheduled, seed):
+        session = getattr(local, 'session', None)
+        if session is None:
+            session = local.session = requests.Session()
+        method, path, body, token = workload.build(op, random.Random(seed))
+        headers = {'Authorization': f'Bearer {token}'} if token else {}
+        try:
+            resp = session.request(method, workload.base_url + path, json=body, headers=headers,
+                                   timeout=REQUEST_TIMEOUT)
+            outcome = _outcome(resp)
+        except requests.RequestException as e:
+            outcome = type(e).__name__
+        results.record(op, (time.perf_counter() - scheduled) * 1000, outcome)
+
+    print(f"▶ {args.rate} req/s trong {args.duration}s, {args.workers} workers, "
+          f"{len(workload.pairs)} cặp hàng nóng, mix: {args.mix}")
+    start = time.perf_counter()
+    scheduled = start
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        while True:
+            scheduled += rng.expovariate(args.rate)
+            if scheduled - start >= args.duration:
+                break
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            op = rng.choices(ops, cum_weights=cum)[0]
+            pool.submit(call, op, scheduled, rng.getrandbits(64))
+    elapsed = time.perf_counter() - start
+
+    print(f"\n{'endpoint':<15}{'calls':>7}{'req/s':>8}{'p50':>9}{'p90':>9}{'p99':>9}{'max':>9}"
+          f"{'errors':>8}{'deadlk':>8}{'lockwt':>8}{'rejected':>9}")
+    total = Counter()
+    for op in ops:
+        lat = sorted(results.latencies.get(op, []))
+        out = results.outcomes.get(op, Counter())
+        total.update(out)
+        errors = sum(n for k, n in out.items() if k not in ('ok', 'deadlock', 'lock_wait_timeout', 'rejected'))
+        print(f"{op:<15}{len(lat):>7}{len(lat) / elapsed:>8.1f}"
+              f"{_percentile(lat, 0.5):>9.1f}{_percentile(lat, 0.9):>9.1f}{_percentile(lat, 0.99):>9.1f}"
+              f"{(lat[-1] if lat else 0):>9.1f}{errors:>8}{out['deadlock']:>8}{out['lock_wait_timeout']:>8}"
+              f"{out['rejected']:>9}")
+    print(f"\nTổng: {sum(total.values())} lượt trong {elapsed:.1f}s ({sum(total.values()) / elapsed:.1f} req/s), "
+          f"kết quả: {dict(total)}  (latency ms, tính từ thời điểm lên lịch)")
+    if db_conn:
+        _db_report(before, _db_snapshot(db_conn))
+        db_conn.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Sinh tải hỗn hợp đồng thời cho backend đang chạy')
+    parser.add_argument('--base-url', default='http://localhost:5000')
+    parser.add_argument('--rate', type=float, default=50, help='target requests per second')
+    parser.add_argument('--duration', type=float, default=60, help='seconds')
+    parser.add_argument('--workers', type=int, default=32)
+    parser.add_argument('--mix', default=DEFAULT_MIX, help=f"op=weight,... from {', '.join(OPS)}")
+    parser.add_argument('--users', default=','.join(f'{u}:{p}' for u, p in DEFAULT_PASSWORDS.items()),
+                        help='user:password,... (the first one reads the stock list at start-up)')
+    parser.add_argument('--hot', type=int, default=20, help='number of hot (product, warehouse) pairs')
+    parser.add_argument('--skew', type=float, default=1.2, help='Zipf exponent over the hot pairs')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--db-url', help='database for lock counters (default: the app DATABASE_URL)')
+    parser.add_argument('--no-db', action='store_true', help='skip the database lock counters')
+    args = parser.parse_args(argv)
+    if args.rate <= 0 or args.duration <= 0 or args.workers < 1 or args.hot < 1:
+        parser.error('rate, duration, workers and hot must be positive')
+    run(args)
+
+if __name__ == '__main__':
+    main()
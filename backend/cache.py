@@ -0,0 +1,158 @@
+"""
+Small caches for read-mostly endpoints
+"""
+import sqlite3
+import threading
+import time
+
+
+class TTLCache:
+    """Key -> value cache with a fixed time-to-live and explicit invalidation"""
+
+    def __init__(self, ttl_seconds: float):
+        self.ttl = ttl_seconds
+        self._data = {}  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+
+    def get_or_set(self, key, compute):
+        now = time.monotonic()
+        hit = self._data.get(key)
+        if hit and hit[0] > now:
+            return hit[1]
+        value = compute()
+        with self._lock:
+            self._data[key] = (now + self.ttl, value)
+        return value
+
+    def invalidate(self, key=None):
+        with self._lock:
+            if key is None:
+                self._data.clear()
+            else:
+                self._data.pop(key, None)
+
+
+# Aggregates over product_supplier (relationships.supplier_warehouses).
+# Invalidated by product_supplier, supplier and warehouse writes.
+relationships_cache = TTLCache(ttl_seconds=30)
+
+
+class MemoryBackend:
+    """Per-process key/value store (default catalog cache backend)"""
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        return self._data.get(key)
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+
+    def incr(self, key) -> int:
+        with self._lock:
+            value = int(self._data.get(key) or 0) + 1
+            self._data[key] = value
+            return value
+
+
+class SQLiteBackend:
+    """Key/value store in a local SQLite file shared by every worker on the host.
+
+    Stand-in for a shared store such as Redis: same get/set/incr surface, so a
+    networked backend can be dropped in without touching callers.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('CREATE TABLE IF NOT EXISTS kv (key TEXT PRIMARY KEY, value)')
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+        return conn
+
+    def get(self, key):
+        row = self._conn().execute('SELECT value FROM kv WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else None
+
+    def set(self, key, value):
+        self._conn().execute('INSERT OR REPLACE INTO kv (key, value) VALUES (?, ?)', (key, value))
+
+    def incr(self, key) -> int:
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute("""
+                INSERT INTO kv (key, value) VALUES (?, 1)
+                ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + 1
+            """, (key,))
+            value = conn.execute('SELECT value FROM kv WHERE key = ?', (key,)).fetchone()[0]
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return int(value)
+
+
+def make_backend(url: str):
+    """'' or 'memory' -> MemoryBackend; 'sqlite:///<path>' -> SQLiteBackend"""
+    if not url or url == 'memory':
+        return MemoryBackend()
+    if url.startswith('sqlite:///'):
+        return SQLiteBackend(url[len('sqlite:///'):])
+    raise ValueError(f'unsupported cache backend: {url}')
+
+
+class VersionedCache:
+    """Pre-serialized bodies per entity type, valid while the entity's version is unchanged.
+
+    Writers bump the version after commit; readers rebuild only when the stored
+    body was built under an older version or is older than max_age seconds (the
+    bound on staleness when a per-process backend misses other workers' bumps).
+    """
+
+    def __init__(self, backend=None, max_age: float = 60):
+        self.backend = backend or MemoryBackend()
+        self.max_age = max_age
+
+    def configure(self, backend, max_age: float = None):
+        self.backend = backend
+        if max_age is not None:
+            self.max_age = max_age
+
+    def version(self, entity: str) -> int:
+        return int(self.backend.get(f'version:{entity}') or 0)
+
+    def bump(self, entity: str) -> int:
+        return self.backend.incr(f'version:{entity}')
+
+    def get_or_build(self, entity: str, build, extra_version=None):
+        """(body, version); build() returns the serialized body.
+
+        extra_version (e.g. a database-side counter) is folded into the version,
+        so bodies also turn over on writes this process never saw.
+        """
+        version = str(self.version(entity))
+        if extra_version is not None:
+            version = f'{version}.{extra_version}'
+        stored = self.backend.get(f'body:{entity}')
+        now = time.time()
+        if stored is not None:
+            stored_version, built_at, body = stored.split(':', 2)
+            if stored_version == version and now - float(built_at) < self.max_age:
+                return body, version
+        body = build()
+        self.backend.set(f'body:{entity}', f'{version}:{now}:{body}')
+        return body, version
+
+
+# Reference data behind /api/catalog/* (products, suppliers, warehouses).
+# Versions are bumped by the create/update/delete handlers of each entity.
+catalog_cache = VersionedCache()
@@ -1,4 +1,5 @@
 import os
+import tempfile
 from dotenv import load_dotenv
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -15,9 +16,40 @@ class Config:
     SESSION_COOKIE_NAME = 'warehouse_session'
     SESSION_COOKIE_SAMESITE = 'Lax'
     SESSION_COOKIE_SECURE = False  # True only behind HTTPS in production
+    # Per-process cache of user -> role used by authz.require_manager()
+    ROLE_CACHE_SECONDS = int(os.getenv('ROLE_CACHE_SECONDS', '60'))
+    # Catalog cache backend: '' (per-process memory) or 'sqlite:///<path>' shared by all workers
+    CATALOG_CACHE_URL = os.getenv('CATALOG_CACHE_URL', '')
+    # Rebuild cached catalog bodies at least this often (bounds staleness for per-process caches)
+    CATALOG_CACHE_MAX_AGE = int(os.getenv('CATALOG_CACHE_MAX_AGE', '60'))
+    # Bearer token required by /api/metrics; unset disables the endpoint
+    METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+    # /api/ready answers 503 once this fraction of pool capacity (size + max_overflow) is checked out
+    READY_POOL_SATURATION = float(os.getenv('READY_POOL_SATURATION', '0.9'))
+    # Dev-only SQL diagnostics (sql_debug.py): N+1 and slow-query warnings
+    SQL_DEBUG = False
+    SQL_SLOW_MS = float(os.getenv('SQL_SLOW_MS', '200'))
+    SQL_NPLUS1_THRESHOLD = int(os.getenv('SQL_NPLUS1_THRESHOLD', '5'))
+    # ?profile=1 request profiling for managers (profiling.py)
+    PROFILING_ENABLED = os.getenv('PROFILING_ENABLED', '0') == '1'
+    PROFILE_DIR = os.getenv('PROFILE_DIR', os.path.join(BASE_DIR, 'profiles'))
+    PROFILE_INTERVAL_MS = float(os.getenv('PROFILE_INTERVAL_MS', '1'))
+    # Cadence used by create_stock_checkpoints.py: 'month', 'week' or 'day'
+    STOCK_CHECKPOINT_EVERY = os.getenv('STOCK_CHECKPOINT_EVERY', 'month')
+    # ledger_partitions.py: monthly partitions created ahead, months kept online, archive files
+    LEDGER_PARTITIONS_AHEAD = int(os.getenv('LEDGER_PARTITIONS_AHEAD', '3'))
+    LEDGER_KEEP_MONTHS = int(os.getenv('LEDGER_KEEP_MONTHS', '24'))
+    LEDGER_ARCHIVE_DIR = os.getenv('LEDGER_ARCHIVE_DIR', os.path.join(BASE_DIR, 'archive'))
+    # routes/exports.py: larger exports run as background jobs writing to EXPORT_DIR
+    # (default outside the source tree: the files hold users' report data)
+    EXPORT_DIR = os.getenv('EXPORT_DIR', os.path.join(tempfile.gettempdir(), 'warehouse-exports'))
+    EXPORT_ASYNC_ROWS = int(os.getenv('EXPORT_ASYNC_ROWS', '100000'))
+    EXPORT_JOB_WORKERS = int(os.getenv('EXPORT_JOB_WORKERS', '2'))
+    EXPORT_MAX_AGE_HOURS = float(os.getenv('EXPORT_MAX_AGE_HOURS', '24'))
 
 class DevConfig(Config):
     DEBUG = True
+    SQL_DEBUG = os.getenv('SQL_DEBUG', '1') == '1'
 
 class ProdConfig(Config):
     DEBUG = False
@@ -0,0 +1,60 @@
+"""
+Script to add the missing stock checkpoints (closing balances) up to yesterday
+Run it daily from cron; it is a no-op until the next period has closed
+
+    python create_stock_checkpoints.py                 # STOCK_CHECKPOINT_EVERY (default: month ends)
+    python create_stock_checkpoints.py --every week    # Sundays
+    python create_stock_checkpoints.py --every day
+
+Each checkpoint is built by sp_create_stock_checkpoint from the previous one
+plus the daily movements in txn_daily_rollup, so a run costs one period of
+rollup rows per checkpoint. Checkpoints are only taken for closed days.
+"""
+import argparse
+import datetime
+from sqlalchemy import text
+from extensions import db
+from app import create_app
+
+PERIODS = ('month', 'week', 'day')
+
+
+def period_ends(first: datetime.date, last: datetime.date, every: str):
+    """Checkpoint dates in [first's period end, last]"""
+    day = first
+    while True:
+        if every == 'month':
+            nxt = (day.replace(day=28) + datetime.timedelta(days=4)).replace(day=1)
+            end = nxt - datetime.timedelta(days=1)
+        elif every == 'week':
+            end = day + datetime.timedelta(days=6 - day.weekday())
+        else:
+            end = day
+        if end > last:
+            return
+        yield end
+        day = end + datetime.timedelta(days=1)
+
+
+def create_checkpoints(every: str):
+    app = create_app()
+    with app.app_context():
+        every = every or app.config['STOCK_CHECKPOINT_EVERY']
+        latest = db.session.execute(text('SELECT MAX(checkpoint_date) FROM stock_checkpoints')).scalar()
+        first = latest + datetime.timedelta(days=1) if latest else \
+            db.session.execute(text('SELECT MIN(day) FROM txn_daily_rollup')).scalar()
+        db.session.commit()
+        yesterday = datetime.date.today() - datetime.timedelta(days=1)
+        created = 0
+        for d in period_ends(first, yesterday, every) if first else ():
+            with db.session.begin():
+                db.session.execute(text('CALL sp_create_stock_checkpoint(:d)'), {'d': d})
+            created += 1
+            print(f"✅ Đã chốt tồn ngày {d}")
+        if not created:
+            print(f"Không có kỳ nào cần chốt (lần chốt gần nhất: {latest or 'chưa có'})")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Tạo các lần chốt tồn kho còn thiếu')
+    parser.add_argument('--every', choices=PERIODS, help='checkpoint cadence (default: STOCK_CHECKPOINT_EVERY)')
+    create_checkpoints(parser.parse_args().every)
@@ -0,0 +1,312 @@
+"""
+Script to generate a reproducible, production-scale dataset for load and query testing
+
+Adds generated warehouses, suppliers, products, product_supplier links and a
+ledger with realistic skew: Zipf-distributed hot SKUs, yearly seasonality,
+weekend dips and random burst days. stock_before/stock_after chains are
+consistent per (product, warehouse) and no OUT ever exceeds the balance.
+
+The ledger is bulk-loaded (multi-row INSERT, or LOAD DATA LOCAL INFILE with
+--load-data) with the inventory_transactions triggers dropped for the duration
+of the load, so rows skip the per-row balance lock and rollup upsert; the
+triggers are recreated from their SHOW CREATE TRIGGER text afterwards and
+stock_balances / txn_daily_rollup are rebuilt from the ledger (codes are added
+to transaction_codes alongside each chunk). Run it against an idle database,
+then split the loaded history into monthly partitions with ledger_partitions.py.
+
+The ledger spans --days days ending at --end-date (default: today). The same
+--seed, sizes and --end-date always produce the same data; without --end-date
+the dates move with the day the script runs.
+
+    python generate_scale_data.py --products 20000 --warehouses 8 --transactions 10000000
+    python generate_scale_data.py --prefix G2 --transactions 500000 --load-data
+    python generate_scale_data.py --end-date 2025-06-30     # pinned, reproducible dates
+"""
+import argparse
+import datetime
+import itertools
+import math
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.pool import NullPool
+
+from app import create_app
+from rebuild_ledger_tables import REBUILD_PROCS
+
+LEDGER_TRIGGERS = ('trg_it_before_insert', 'trg_it_after_insert')
+LEDGER_COLUMNS = ('transaction_code', 'product_id', 'warehouse_id', 'supplier_id', 'quantity',
+                  'transaction_type', 'reason', 'reference_document', 'stock_before_transaction',
+                  'stock_after_transaction', 'created_by', 'created_at')
+INSERT_BATCH_ROWS = 5000
+CHUNK_ROWS = 100_000  # rows per commit / per LOAD DATA file
+
+NAME_WORDS = ('Ống', 'Van', 'Bulong', 'Đai ốc', 'Dây điện', 'Công tắc', 'Ổ cắm', 'Bóng đèn', 'Sơn',
+              'Keo', 'Băng dính', 'Thép hộp', 'Tôn', 'Xi măng', 'Gạch', 'Ốc vít', 'Bản lề', 'Khóa',
+              'Vòi nước', 'Máy bơm')
+NAME_TRAITS = ('nhựa', 'inox', 'đồng', 'thép', 'nhôm', 'chống cháy', 'cao cấp', 'loại 1',
+               'công nghiệp', 'mini', 'chịu nhiệt', 'đa năng')
+CATEGORIES = ('Điện', 'Nước', 'Cơ khí', 'Xây dựng', 'Sơn & Keo', 'Dụng cụ', 'Chiếu sáng', 'An toàn')
+UNITS = ('pcs', 'box', 'kg', 'm', 'cuộn', 'thùng')
+CITIES = ('Hà Nội', 'TP.HCM', 'Đà Nẵng', 'Hải Phòng', 'Cần Thơ', 'Bình Dương', 'Đồng Nai', 'Huế')
+
+# Share of transactions per hour of the working day (0h-23h)
+HOUR_WEIGHTS = (0, 0, 0, 0, 0, 0, 1, 3, 8, 10, 10, 8, 3, 6, 9, 10, 9, 7, 3, 1, 0, 0, 0, 0)
+# Monday..Sunday
+WEEKDAY_WEIGHTS = (1.0, 1.0, 1.0, 1.0, 1.1, 0.7, 0.3)
+SEASON_AMPLITUDE = 0.35
+SEASON_PEAK_DOY = 20        # pre-Tết peak in late January
+BURST_PROBABILITY = 0.03
+BURST_FACTOR = 3.0
+# Transaction mix while stock is available; an empty pair always restocks first
+P_IN, P_ADJUST = 0.35, 0.05
+
+
+def _day_weights(days):
+    rng = random.Random(f'days-{days[0]}-{len(days)}')
+    weights = []
+    for d in days:
+        season = 1 + SEASON_AMPLITUDE * math.cos(2 * math.pi * (d.timetuple().tm_yday - SEASON_PEAK_DOY) / 365)
+        burst = BURST_FACTOR if rng.random() < BURST_PROBABILITY else 1.0
+        weights.append(season * WEEKDAY_WEIGHTS[d.weekday()] * burst)
+    return weights
+
+
+def _split(total: int, weights):
+    """Integer counts proportional to weights that sum exactly to total"""
+    scale = total / sum(weights)
+    counts = [int(w * scale) for w in weights]
+    remainders = sorted(range(len(weights)), key=lambda i: counts[i] - weights[i] * scale)
+    for i in remainders[:total - sum(counts)]:
+        counts[i] += 1
+    return counts
+
+
+def generate_ledger(rng, pairs, pair_weights, suppliers_of, user_ids, n, days, prefix):
+    """Yield ledger rows (LEDGER_COLUMNS order) in created_at order, CHUNK_ROWS at a time"""
+    cum_weights = list(itertools.accumulate(pair_weights))
+    hours = [h for h, w in enumerate(HOUR_WEIGHTS) for _ in range(w)]
+    balances = {}
+    seq = 0
+    chunk = []
+    for day, count in zip(days, _split(n, _day_weights(days))):
+        if not count:
+            continue
+        seconds = sorted(rng.choice(hours) * 3600 + rng.randrange(3600) for _ in range(count))
+        day_str = day.isoformat()
+        for (pid, wid), second in zip(rng.choices(pairs, cum_weights=cum_weights, k=count), seconds):
+            before = balances.get((pid, wid), 0)
+            r = rng.random()
+            sid, ref = None, None
+            if before == 0 or r < P_IN:
+                kind, qty = 'IN', rng.randint(20, 200)
+                after = before + qty
+                sid = rng.choice(suppliers_of[pid]) if suppliers_of.get(pid) else None
+                reason, ref = 'Nhập hàng', f'PO-{day:%y%m}-{rng.randrange(10000):04d}'
+            elif r < P_IN + P_ADJUST:
+                kind, qty = 'ADJUST', rng.randint(-min(before, 5), 5) or 1
+                after = before + qty
+                reason = 'Kiểm kê'
+            else:
+                kind, qty = 'OUT', rng.randint(1, min(before, 30))
+                after = before - qty
+                reason, ref = 'Xuất bán', f'SO-{day:%y%m}-{rng.randrange(10000):04d}'
+            balances[(pid, wid)] = after
+            seq += 1
+            created_at = f'{day_str} {second // 3600:02d}:{second // 60 % 60:02d}:{second % 60:02d}'
+            chunk.append((f'{kind}-{prefix}-{seq:010d}', pid, wid, sid, qty, kind, reason, ref,
+                          before, after, rng.choice(user_ids), created_at))
+            if len(chunk) >= CHUNK_ROWS:
+                yield chunk
+                chunk = []
+    if chunk:
+        yield chunk
+
+
+def _insert_many(cur, table, columns, rows):
+    sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))})"
+    for i in range(0, len(rows), INSERT_BATCH_ROWS):
+        cur.executemany(sql, rows[i:i + INSERT_BATCH_ROWS])  # PyMySQL sends one multi-row INSERT
+
+
+def _load_data(cur, rows):
+    with tempfile.NamedTemporaryFile('w', suffix='.tsv', encoding='utf-8', newline='\n', delete=False) as f:
+        for row in rows:
+            f.write('\t'.join(r'\N' if v is None else str(v) for v in row) + '\n')
+    try:
+        cur.execute(
+            f"LOAD DATA LOCAL INFILE %s INTO TABLE inventory_transactions CHARACTER SET utf8mb4 "
+            f"FIELDS TERMINATED BY '\\t' LINES TERMINATED BY '\\n' ({', '.join(LEDGER_COLUMNS)})",
+            (f.name,))
+    finally:
+        os.unlink(f.name)
+
+
+def _ids(cur, sql, args):
+    cur.execute(sql, args)
+    return [r[0] for r in cur.fetchall()]
+
+
+def generate(args):
+    rng = random.Random(args.seed)
+    app = create_app()
+    engine = create_engine(app.config['SQLALCHEMY_DATABASE_URI'], poolclass=NullPool,
+                           connect_args={'local_infile': True} if args.load_data else {})
+    conn = engine.raw_connection()
+    cur = conn.cursor()
+    like = f'{args.prefix}-%'
+
+    cur.execute('SELECT COUNT(*) FROM products WHERE sku LIKE %s', (like,))
+    if cur.fetchone()[0]:
+        sys.exit(f"Đã có dữ liệu với tiền tố {args.prefix}. Dùng --prefix khác hoặc xóa dữ liệu cũ.")
+    user_ids = _ids(cur, "SELECT user_id FROM users WHERE status = 'active'", ())
+    if not user_ids:
+        sys.exit("Chưa có user nào. Hãy import schema (có dữ liệu mẫu) trước.")
+
+    # ---------------------
+    # Catalog (small: goes through the normal triggers, so table_versions moves)
+    # ---------------------
+    start = time.perf_counter()
+    _insert_many(cur, 'warehouses', ('warehouse_code', 'warehouse_name', 'location'), [
+        (f'{args.prefix}-WH{i:02d}', f'Kho {CITIES[i % len(CITIES)]} {i}', CITIES[i % len(CITIES)])
+        for i in range(1, args.warehouses + 1)])
+    warehouse_ids = _ids(cur, 'SELECT warehouse_id FROM warehouses WHERE warehouse_code LIKE %s ORDER BY warehouse_id', (like,))
+
+    _insert_many(cur, 'suppliers', ('supplier_name', 'contact_person', 'phone', 'email', 'address'), [
+        (f'{args.prefix}-NCC {i:05d}', f'Liên hệ {i}', f'09{rng.randrange(10 ** 8):08d}',
+         f'ncc{i}@{args.prefix.lower()}.example.com', rng.choice(CITIES))
+        for i in range(1, args.suppliers + 1)])
+    supplier_ids = _ids(cur, 'SELECT supplier_id FROM suppliers WHERE supplier_name LIKE %s ORDER BY supplier_id', (like,))
+
+    product_rows = []
+    for i in range(1, args.products + 1):
+        name = f'{rng.choice(NAME_WORDS)} {rng.choice(NAME_TRAITS)} D{rng.choice((10, 16, 20, 25, 32, 50, 90))}'
+        product_rows.append((f'{args.prefix}-{i:07d}', name, rng.choice(CATEGORIES), rng.choice(UNITS),
+                             rng.choice((0, 5, 10, 20, 50)), rng.choice(warehouse_ids)))
+    _insert_many(cur, 'products', ('sku', 'product_name', 'category', 'unit', 'min_stock_level',
+                                   'default_warehouse_id'), product_rows)
+    product_ids = _ids(cur, 'SELECT product_id FROM products WHERE sku LIKE %s ORDER BY product_id', (like,))
+    default_wh = {pid: row[5] for pid, row in zip(product_ids, product_rows)}
+
+    link_rows, suppliers_of = [], {}
+    for pid in product_ids:
+        suppliers_of[pid] = rng.sample(supplier_ids, k=min(len(supplier_ids), rng.randint(1, 3)))
+        for sid in suppliers_of[pid]:
+            link_rows.append((pid, sid, default_wh[pid], None, 'active'))
+    _insert_many(cur, 'product_supplier', ('product_id', 'supplier_id', 'warehouse_id', 'delivery_date', 'status'),
+                 link_rows)
+    conn.commit()
+    print(f"✅ Danh mục: {len(warehouse_ids)} kho, {len(supplier_ids)} NCC, {len(product_ids)} sản phẩm, "
+          f"{len(link_rows)} liên kết ({time.perf_counter() - start:.1f}s)")
+
+    # ---------------------
+    # Ledger: Zipf popularity per product, stocked in its default warehouse plus a few others
+    # ---------------------
+    ranks = list(range(1, len(product_ids) + 1))
+    rng.shuffle(ranks)
+    pairs, pair_weights = [], []
+    for pid, rank in zip(product_ids, ranks):
+        popularity = 1 / rank ** args.skew
+        for wid in warehouse_ids:
+            if wid == default_wh[pid]:
+                pairs.append((pid, wid))
+                pair_weights.append(popularity)
+            elif rng.random() < 0.3:
+                pairs.append((pid, wid))
+                pair_weights.append(popularity * 0.4)
+    days = [args.end_date - datetime.timedelta(days=d) for d in range(args.days - 1, -1, -1)]
+
+    cur.execute("""
+        SELECT TRIGGER_NAME FROM information_schema.TRIGGERS
+        WHERE TRIGGER_SCHEMA = DATABASE() AND EVENT_OBJECT_TABLE = 'inventory_transactions'
+    """)
+    saved = {}
+    for (name,) in cur.fetchall():
+        cur.execute(f'SHOW CREATE TRIGGER {name}')
+        _, sql_mode, statement = cur.fetchone()[:3]
+        saved[name] = (sql_mode, statement)
+    missing = [t for t in LEDGER_TRIGGERS if t not in saved]
+    if missing:
+        print(f"⚠️  Không tìm thấy trigger: {', '.join(missing)}")
+
+    start = time.perf_counter()
+    loaded = 0
+    try:
+        for name in saved:
+            cur.execute(f'DROP TRIGGER {name}')
+        # References are generated from the ids read back above
+        cur.execute('SET unique_checks = 0, foreign_key_checks = 0')
+        for chunk in generate_ledger(rng, pairs, pair_weights, suppliers_of, user_ids,
+                                     args.transactions, days, args.prefix):
+            if args.load_data:
+                _load_data(cur, chunk)
+            else:
+                _insert_many(cur, 'inventory_transactions', LEDGER_COLUMNS, chunk)
+            # trg_it_before_insert would have registered the codes
+            _insert_many(cur, 'transaction_codes', ('transaction_code',), [(row[0],) for row in chunk])
+            conn.commit()
+            loaded += len(chunk)
+            elapsed = time.perf_counter() - start
+            print(f"   {loaded:>12,} / {args.transactions:,} giao dịch ({loaded / elapsed:,.0f} dòng/s)", flush=True)
+    finally:
+        conn.rollback()
+        cur.execute('SET unique_checks = 1, foreign_key_checks = 1')
+        cur.execute('SELECT @@SESSION.sql_mode')
+        session_mode = cur.fetchone()[0]
+        for name, (sql_mode, statement) in saved.items():
+            try:
+                cur.execute(f'DROP TRIGGER IF EXISTS {name}')
+                cur.execute('SET SESSION sql_mode = %s', (sql_mode,))
+                cur.execute(statement)
+            except Exception:
+                print(f"❌ Không tạo lại được {name}; hãy chạy lại câu lệnh sau:\n{statement}", file=sys.stderr)
+                raise
+        cur.execute('SET SESSION sql_mode = %s', (session_mode,))
+    print(f"✅ Sổ giao dịch: {loaded:,} dòng ({time.perf_counter() - start:.1f}s)")
+
+    for table, proc in REBUILD_PROCS.items():
+        start = time.perf_counter()
+        cur.execute(f'CALL {proc}()')
+        conn.commit()
+        print(f"✅ Đã tính lại {table} ({time.perf_counter() - start:.1f}s)")
+    conn.close()
+    print("   Chia sổ giao dịch thành partition theo tháng: python ledger_partitions.py ensure")
+
+
+def _date_arg(value: str) -> datetime.date:
+    try:
+        return datetime.datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise argparse.ArgumentTypeError('expected YYYY-MM-DD')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Sinh dữ liệu lớn, tái lập được, cho warehouse_db')
+    parser.add_argument('--products', type=int, default=10_000)
+    parser.add_argument('--warehouses', type=int, default=5)
+    parser.add_argument('--suppliers', type=int, default=200)
+    parser.add_argument('--transactions', type=int, default=1_000_000)
+    parser.add_argument('--days', type=int, default=730, help='ledger spans this many days ending at --end-date')
+    parser.add_argument('--end-date', type=_date_arg, default=datetime.date.today(),
+                        help='last ledger day, YYYY-MM-DD (default: today); pin it for reproducible dates')
+    parser.add_argument('--skew', type=float, default=1.1, help='Zipf exponent for SKU popularity')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--prefix', default='GEN', help='prefix of generated SKUs, codes and names')
+    parser.add_argument('--load-data', action='store_true',
+                        help='load the ledger with LOAD DATA LOCAL INFILE (server needs local_infile=ON)')
+    args = parser.parse_args(argv)
+    if not re.fullmatch(r'[A-Za-z0-9]{1,20}', args.prefix):
+        parser.error('--prefix: 1-20 letters or digits')
+    if min(args.products, args.warehouses, args.suppliers, args.days) < 1 or args.transactions < 0:
+        parser.error('sizes must be positive')
+    if args.end_date > datetime.date.today():
+        parser.error('--end-date cannot be in the future')
+    generate(args)
+
+if __name__ == '__main__':
+    main()
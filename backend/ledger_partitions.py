@@ -0,0 +1,283 @@
+"""
+Script to maintain the monthly partitions of inventory_transactions and archive old months
+
+    python ledger_partitions.py status
+    python ledger_partitions.py ensure                  # partitions up to LEDGER_PARTITIONS_AHEAD months ahead
+    python ledger_partitions.py archive                 # archive months older than LEDGER_KEEP_MONTHS
+    python ledger_partitions.py archive --keep-months 12
+    python ledger_partitions.py restore 2024-01         # reload an archived month for querying
+
+Partitions are named p<YYYYMM> (rows created in that month) plus pmax.
+`ensure` splits every partition that spans several months (pmax, or the first
+partition after a bulk load) with REORGANIZE PARTITION; run it daily from cron.
+
+`archive` works through the oldest partitions, one closed month at a time:
+  1. checks the month against txn_daily_rollup and takes its month-end stock
+     checkpoint (the rebuild procedures start from it once the rows are gone)
+  2. streams the partition to LEDGER_ARCHIVE_DIR/inventory_transactions_<YYYYMM>.csv.gz
+  3. re-reads the file and compares the row count with the partition
+  4. records the month in ledger_archive, then drops the partition
+txn_daily_rollup and stock_checkpoints keep the archived history, so reports
+and /api/reports/stock-as-of are unaffected. Re-running archive completes an
+interrupted run. `restore` loads an archived file into
+inventory_transactions_archive, read by /api/reports/txns?archived=1.
+"""
+import argparse
+import csv
+import datetime
+import gzip
+import hashlib
+import os
+import re
+import sys
+
+import pymysql
+from flask import current_app
+from sqlalchemy import text
+
+from app import create_app
+from extensions import db
+
+ARCHIVE_COLUMNS = ('transaction_id', 'transaction_code', 'product_id', 'warehouse_id', 'supplier_id',
+                   'quantity', 'transaction_type', 'reason', 'reference_document',
+                   'stock_before_transaction', 'stock_after_transaction', 'created_by', 'created_at')
+NULL = r'\N'
+FETCH_ROWS = 10_000
+RESTORE_BATCH_ROWS = 5000
+MONTH_PARTITION = re.compile(r'p(\d{4})(\d{2})')
+
+
+def add_months(month: datetime.date, n: int) -> datetime.date:
+    m = month.month - 1 + n
+    return datetime.date(month.year + m // 12, m % 12 + 1, 1)
+
+
+def _partitions():
+    """[(name, upper bound or None for MAXVALUE, estimated rows)] in partition order"""
+    rows = db.session.execute(text("""
+        SELECT PARTITION_NAME, PARTITION_DESCRIPTION, TABLE_ROWS
+        FROM information_schema.PARTITIONS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'inventory_transactions'
+        ORDER BY PARTITION_ORDINAL_POSITION
+    """)).all()
+    if not rows or rows[0][0] is None:
+        sys.exit("❌ inventory_transactions chưa được phân vùng "
+                 "(chạy migrations/partition_inventory_transactions.sql)")
+    return [(name, None if desc == 'MAXVALUE' else int(desc), n) for name, desc, n in rows]
+
+
+def _bound(month: datetime.date) -> int:
+    """Partition bound for the month's first second, in the server time zone like UNIX_TIMESTAMP(created_at)"""
+    return db.session.execute(text('SELECT UNIX_TIMESTAMP(:d)'), {'d': month}).scalar()
+
+
+def _month_of(name: str):
+    m = MONTH_PARTITION.fullmatch(name)
+    return datetime.date(int(m.group(1)), int(m.group(2)), 1) if m else None
+
+
+def status():
+    archived = db.session.execute(text(
+        'SELECT month, row_count, file_name, restored_at FROM ledger_archive ORDER BY month'
+    )).all()
+    for month, n, file_name, restored_at in archived:
+        restored = f", đã nạp lại {restored_at}" if restored_at else ''
+        print(f"   {month:%Y-%m}  lưu trữ   {n:>12,} dòng  {file_name}{restored}")
+    for name, _, n in _partitions():
+        print(f"   {name:<8} partition {n:>12,} dòng (ước tính)")
+    db.session.commit()
+
+
+def ensure(ahead: int):
+    first = db.session.execute(text('SELECT MIN(created_at) FROM inventory_transactions')).scalar()
+    this_month = datetime.date.today().replace(day=1)
+    first = first.date().replace(day=1) if first else this_month
+    # One boundary at the start of every month after `first`, up to `ahead` months from now
+    last = add_months(this_month, ahead)
+    months, m = [], add_months(first, 1)
+    while m <= add_months(last, 1):
+        months.append(m)
+        m = add_months(m, 1)
+    bounds = {m: _bound(m) for m in months}
+
+    changed = 0
+    lower = None
+    for name, upper, _ in _partitions():
+        inside = [m for m in months
+                  if (lower is None or bounds[m] > lower) and (upper is None or bounds[m] < upper)]
+        if inside:
+            specs = [f"PARTITION p{add_months(m, -1):%Y%m} VALUES LESS THAN ({bounds[m]})" for m in inside]
+            specs.append(f"PARTITION {name} VALUES LESS THAN ({'MAXVALUE' if upper is None else upper})")
+            db.session.execute(text(
+                f"ALTER TABLE inventory_transactions REORGANIZE PARTITION {name} INTO ({', '.join(specs)})"
+            ))
+            db.session.commit()
+            changed += len(inside)
+            print(f"✅ Tách {name}: {', '.join(f'p{add_months(m, -1):%Y%m}' for m in inside)}")
+        lower = upper
+    db.session.commit()
+    if not changed:
+        print(f"Đã đủ partition đến tháng {last:%Y-%m}")
+
+
+def _check_rollup(name: str, month_end: datetime.date):
+    """The checkpoint is built from txn_daily_rollup: refuse to archive if it disagrees with the ledger"""
+    count, first = db.session.execute(text(
+        f'SELECT COUNT(*), MIN(created_at) FROM inventory_transactions PARTITION ({name})'
+    )).one()
+    if not count:
+        return 0
+    rolled = db.session.execute(text(
+        'SELECT COALESCE(SUM(txn_count), 0) FROM txn_daily_rollup WHERE day >= :d1 AND day <= :d2'
+    ), {'d1': first.date(), 'd2': month_end}).scalar()
+    if rolled != count:
+        sys.exit(f"❌ {name}: sổ có {count} giao dịch nhưng txn_daily_rollup có {rolled}; "
+                 f"chạy rebuild_ledger_tables.py trước khi lưu trữ")
+    return count
+
+
+def _export(name: str, path: str) -> int:
+    """Stream the partition to a gzip CSV through a server-side cursor; returns the row count"""
+    raw = db.engine.raw_connection()
+    written = 0
+    try:
+        cur = raw.cursor(pymysql.cursors.SSCursor)
+        cur.execute(f"SELECT {', '.join(ARCHIVE_COLUMNS)} FROM inventory_transactions PARTITION ({name}) "
+                    f"ORDER BY transaction_id")
+        with gzip.open(path, 'wt', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(ARCHIVE_COLUMNS)
+            while rows := cur.fetchmany(FETCH_ROWS):
+                writer.writerows([NULL if v is None else v for v in row] for row in rows)
+                written += len(rows)
+        cur.close()
+    finally:
+        raw.close()
+    return written
+
+
+def _read_archive(path: str):
+    with gzip.open(path, 'rt', encoding='utf-8', newline='') as f:
+        reader = csv.reader(f)
+        if tuple(next(reader)) != ARCHIVE_COLUMNS:
+            sys.exit(f"❌ {path}: tiêu đề cột không khớp")
+        for row in reader:
+            yield [None if v == NULL else v for v in row]
+
+
+def _sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def archive(keep_months: int):
+    archive_dir = current_app.config['LEDGER_ARCHIVE_DIR']
+    os.makedirs(archive_dir, exist_ok=True)
+    cutoff = add_months(datetime.date.today().replace(day=1), -keep_months)
+    done = 0
+    # Oldest first and never pmax, so archived months always form a prefix of the ledger
+    for name, _, _ in _partitions()[:-1]:
+        month = _month_of(name)
+        if month is None or month >= cutoff:
+            break
+        month_end = add_months(month, 1) - datetime.timedelta(days=1)
+        expected = _check_rollup(name, month_end)
+        db.session.execute(text('CALL sp_create_stock_checkpoint(:d)'), {'d': month_end})
+        db.session.commit()
+
+        file_name = f'inventory_transactions_{month:%Y%m}.csv.gz'
+        path = os.path.join(archive_dir, file_name)
+        written = _export(name, path + '.tmp')
+        reread = sum(1 for _ in _read_archive(path + '.tmp'))
+        if not written == reread == expected:
+            sys.exit(f"❌ {name}: partition {expected} dòng, đã ghi {written}, đọc lại {reread}; giữ nguyên partition")
+        os.replace(path + '.tmp', path)
+
+        # Recorded before the drop: sp_rebuild_stock_balances skips ledger rows up to the archived month
+        db.session.execute(text("""
+            INSERT INTO ledger_archive (month, partition_name, file_name, row_count, sha256)
+            VALUES (:month, :name, :file_name, :n, :sha)
+            ON DUPLICATE KEY UPDATE file_name = VALUES(file_name), row_count = VALUES(row_count),
+              sha256 = VALUES(sha256), archived_at = CURRENT_TIMESTAMP
+        """), {'month': month, 'name': name, 'file_name': file_name, 'n': written, 'sha': _sha256(path)})
+        db.session.commit()
+        db.session.execute(text(f'ALTER TABLE inventory_transactions DROP PARTITION {name}'))
+        db.session.commit()
+        # Touch the row once the rows are gone: its trigger bumps table_versions('ledger_archive'),
+        # which the /reports/txns and /stock-as-of ETags include (the ledger head did not move)
+        db.session.execute(text('UPDATE ledger_archive SET archived_at = CURRENT_TIMESTAMP WHERE month = :m'),
+                           {'m': month})
+        db.session.commit()
+        done += 1
+        print(f"✅ Đã lưu trữ {month:%Y-%m}: {written:,} dòng -> {path}")
+    if not done:
+        print(f"Không có tháng nào trước {cutoff:%Y-%m} cần lưu trữ")
+
+
+def restore(month: datetime.date):
+    row = db.session.execute(text(
+        'SELECT file_name, row_count, sha256 FROM ledger_archive WHERE month = :m'
+    ), {'m': month}).one_or_none()
+    if row is None:
+        sys.exit(f"❌ Tháng {month:%Y-%m} chưa được lưu trữ")
+    path = os.path.join(current_app.config['LEDGER_ARCHIVE_DIR'], row.file_name)
+    if not os.path.exists(path) or _sha256(path) != row.sha256:
+        sys.exit(f"❌ {path}: không tìm thấy hoặc sai checksum")
+
+    # REPLACE keeps restoring the same month idempotent
+    sql = text(f"REPLACE INTO inventory_transactions_archive ({', '.join(ARCHIVE_COLUMNS)}) "
+               f"VALUES ({', '.join(':' + c for c in ARCHIVE_COLUMNS)})")
+    loaded, batch = 0, []
+    for values in _read_archive(path):
+        batch.append(dict(zip(ARCHIVE_COLUMNS, values)))
+        if len(batch) == RESTORE_BATCH_ROWS:
+            db.session.execute(sql, batch)
+            loaded += len(batch)
+            batch = []
+    if batch:
+        db.session.execute(sql, batch)
+        loaded += len(batch)
+    db.session.execute(text('UPDATE ledger_archive SET restored_at = CURRENT_TIMESTAMP WHERE month = :m'),
+                       {'m': month})
+    db.session.commit()
+    print(f"✅ Đã nạp lại {month:%Y-%m}: {loaded:,} dòng vào inventory_transactions_archive")
+
+
+def _month_arg(value: str) -> datetime.date:
+    try:
+        return datetime.datetime.strptime(value, '%Y-%m').date()
+    except ValueError:
+        raise argparse.ArgumentTypeError('expected YYYY-MM')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Quản lý partition theo tháng và lưu trữ sổ giao dịch')
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('status', help='list partitions and archived months')
+    p = sub.add_parser('ensure', help='create the monthly partitions ahead of time')
+    p.add_argument('--ahead', type=int, help='months ahead (default: LEDGER_PARTITIONS_AHEAD)')
+    p = sub.add_parser('archive', help='archive and drop closed months')
+    p.add_argument('--keep-months', type=int, help='months kept online (default: LEDGER_KEEP_MONTHS)')
+    p = sub.add_parser('restore', help='load an archived month into inventory_transactions_archive')
+    p.add_argument('month', type=_month_arg, help='YYYY-MM')
+    args = parser.parse_args(argv)
+
+    app = create_app()
+    with app.app_context():
+        if args.command == 'status':
+            status()
+        elif args.command == 'ensure':
+            ensure(app.config['LEDGER_PARTITIONS_AHEAD'] if args.ahead is None else args.ahead)
+        elif args.command == 'archive':
+            keep = app.config['LEDGER_KEEP_MONTHS'] if args.keep_months is None else args.keep_months
+            if keep < 1:
+                parser.error('--keep-months must be at least 1 (only closed months can be archived)')
+            archive(keep)
+        else:
+            restore(args.month)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,229 @@
+"""
+Request, SQL and connection-pool metrics in Prometheus text format (/api/metrics)
+
+Per process: each worker exposes its own series, so scrape every worker (or
+sum them) when running several. /api/metrics answers 404 unless METRICS_TOKEN is set,
+and then only to `Authorization: Bearer <METRICS_TOKEN>`; /api/ready stays open. Collected via Flask before/after_request hooks,
+SQLAlchemy engine events and a QueuePool subclass that times checkouts.
+"""
+import hmac
+import threading
+import time
+
+from flask import Response, abort, g, has_request_context, jsonify, request
+from sqlalchemy import event, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import Pool, QueuePool
+
+from extensions import db
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SQL_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+POOL_WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 30)
+SQL_VERBS = {'SELECT', 'INSERT', 'UPDATE', 'DELETE', 'CALL', 'SHOW', 'SET'}
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values) -> str:
+    if not names:
+        return ''
+    return '{' + ','.join(f'{n}="{_escape(v)}"' for n, v in zip(names, values)) + '}'
+
+
+class Counter:
+    def __init__(self, name: str, doc: str, labels=()):
+        self.name, self.doc, self.label_names = name, doc, tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        yield f'# HELP {self.name} {self.doc}'
+        yield f'# TYPE {self.name} counter'
+        for labels, value in sorted(self._values.items()):
+            yield f'{self.name}{_labels(self.label_names, labels)} {value}'
+
+
+class Histogram:
+    def __init__(self, name: str, doc: str, labels=(), buckets=LATENCY_BUCKETS):
+        self.name, self.doc, self.label_names = name, doc, tuple(labels)
+        self.buckets = tuple(buckets)
+        self._values = {}  # labels -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels):
+        with self._lock:
+            row = self._values.get(labels)
+            if row is None:
+                row = self._values[labels] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    row[i] += 1
+                    break
+            else:
+                row[len(self.buckets)] += 1
+            row[-1] += value
+
+    def render(self):
+        yield f'# HELP {self.name} {self.doc}'
+        yield f'# TYPE {self.name} histogram'
+        names = self.label_names + ('le',)
+        for labels, row in sorted(self._values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), row):
+                cumulative += count
+                yield f'{self.name}_bucket{_labels(names, labels + (bound,))} {cumulative}'
+            yield f'{self.name}_sum{_labels(self.label_names, labels)} {row[-1]}'
+            yield f'{self.name}_count{_labels(self.label_names, labels)} {cumulative}'
+
+
+REQUESTS = Counter('http_requests_total', 'HTTP requests by endpoint, method and status',
+                   ('endpoint', 'method', 'status'))
+REQUEST_SECONDS = Histogram('http_request_duration_seconds', 'HTTP request latency',
+                            ('endpoint', 'method'))
+REQUEST_SQL_STATEMENTS = Histogram('http_request_sql_statements', 'SQL statements issued per request',
+                                   ('endpoint',), SQL_COUNT_BUCKETS)
+REQUEST_SQL_SECONDS = Histogram('http_request_sql_duration_seconds', 'Time spent in SQL per request',
+                                ('endpoint',))
+SQL_SECONDS = Histogram('sql_statement_duration_seconds', 'SQL statement latency by verb', ('verb',))
+SQL_ERRORS = Counter('sql_statement_errors_total', 'SQL statements that raised, by verb', ('verb',))
+POOL_CHECKOUTS = Counter('db_pool_checkouts_total', 'Connections checked out of the pool')
+POOL_TIMEOUTS = Counter('db_pool_timeouts_total', 'Checkouts that gave up after pool_timeout')
+POOL_WAIT_SECONDS = Histogram('db_pool_wait_seconds', 'Time spent waiting for a pooled connection',
+                              buckets=POOL_WAIT_BUCKETS)
+
+_COLLECTORS = (REQUESTS, REQUEST_SECONDS, REQUEST_SQL_STATEMENTS, REQUEST_SQL_SECONDS,
+               SQL_SECONDS, SQL_ERRORS, POOL_CHECKOUTS, POOL_TIMEOUTS, POOL_WAIT_SECONDS)
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited for a connection"""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            conn = super()._do_get()
+        except Exception:
+            POOL_TIMEOUTS.inc()
+            raise
+        POOL_WAIT_SECONDS.observe(time.perf_counter() - start)
+        return conn
+
+
+def _verb(statement: str) -> str:
+    head = statement.lstrip().split(None, 1)
+    verb = head[0].upper() if head else ''
+    return verb if verb in SQL_VERBS else 'OTHER'
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('metrics_query_start', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['metrics_query_start'].pop()
+    SQL_SECONDS.observe(elapsed, _verb(statement))
+    if has_request_context() and 'metrics_start' in g:
+        g.metrics_sql_count += 1
+        g.metrics_sql_seconds += elapsed
+
+
+def _handle_error(context):
+    starts = context.connection.info.get('metrics_query_start') if context.connection else None
+    if starts:
+        starts.pop()
+    SQL_ERRORS.inc(_verb(context.statement or ''))
+
+
+def _checkout(dbapi_conn, conn_record, conn_proxy):
+    POOL_CHECKOUTS.inc()
+
+
+def pool_stats():
+    """Current pool occupancy; capacity is None for pools without a fixed size"""
+    pool = db.engine.pool
+    if not isinstance(pool, QueuePool):
+        return {'size': None, 'checked_out': None, 'overflow': None, 'capacity': None}
+    max_overflow = pool._max_overflow  # -1 = unbounded
+    return {
+        'size': pool.size(),
+        'checked_out': pool.checkedout(),
+        'overflow': max(pool.overflow(), 0),
+        'capacity': pool.size() + max_overflow if max_overflow >= 0 else None,
+    }
+
+
+def render() -> str:
+    lines = []
+    for collector in _COLLECTORS:
+        lines.extend(collector.render())
+    stats = pool_stats()
+    for key, doc in (('size', 'Configured pool size'),
+                     ('checked_out', 'Connections currently checked out'),
+                     ('overflow', 'Connections open beyond pool size'),
+                     ('capacity', 'Pool size plus max_overflow')):
+        if stats[key] is not None:
+            lines += [f'# HELP db_pool_{key} {doc}', f'# TYPE db_pool_{key} gauge', f'db_pool_{key} {stats[key]}']
+    return '\n'.join(lines) + '\n'
+
+
+def init_app(app):
+    """Install request hooks, engine listeners and the /api/metrics and /api/ready endpoints.
+
+    Must run before db.init_app so the timed pool class is used for MySQL engines.
+    """
+    if app.config['SQLALCHEMY_DATABASE_URI'].startswith('mysql'):
+        app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', {}).setdefault('poolclass', TimedQueuePool)
+
+    @app.before_request
+    def _start_timer():
+        g.metrics_start = time.perf_counter()
+        g.metrics_sql_count = 0
+        g.metrics_sql_seconds = 0.0
+
+    @app.after_request
+    def _record(resp):
+        if 'metrics_start' in g:
+            endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+            REQUESTS.inc(endpoint, request.method, str(resp.status_code))
+            REQUEST_SECONDS.observe(time.perf_counter() - g.metrics_start, endpoint, request.method)
+            REQUEST_SQL_STATEMENTS.observe(g.metrics_sql_count, endpoint)
+            REQUEST_SQL_SECONDS.observe(g.metrics_sql_seconds, endpoint)
+        return resp
+
+    @app.get('/api/metrics')
+    def metrics():
+        token = app.config['METRICS_TOKEN']
+        if not token:
+            abort(404)
+        # Compare bytes: headers are decoded as latin-1, and compare_digest raises on non-ASCII str
+        if not hmac.compare_digest(request.headers.get('Authorization', '').encode('latin-1'),
+                                   f'Bearer {token}'.encode()):
+            return jsonify(message='invalid metrics token'), 401
+        return Response(render(), mimetype='text/plain; version=0.0.4')
+
+    @app.get('/api/ready')
+    def ready():
+        # Not ready while the pool is (nearly) exhausted: new requests would queue on checkout
+        stats = pool_stats()
+        if stats['capacity'] and stats['checked_out'] >= stats['capacity'] * app.config['READY_POOL_SATURATION']:
+            return jsonify(status='saturated', pool=stats), 503
+        try:
+            db.session.execute(text('SELECT 1'))
+        except Exception as e:
+            return jsonify(status='database unavailable', error=str(e)), 503
+        return jsonify(status='ready', pool=stats)
+
+    # Class-level listeners cover every engine/pool, including ones created later
+    for target, name, fn in ((Engine, 'before_cursor_execute', _before_cursor_execute),
+                             (Engine, 'after_cursor_execute', _after_cursor_execute),
+                             (Engine, 'handle_error', _handle_error),
+                             (Pool, 'checkout', _checkout)):
+        if not event.contains(target, name, fn):
+            event.listen(target, name, fn)
@@ -0,0 +1,113 @@
+"""
+SQL migrations for databases created before the current warehouse_db_enhanced.sql
+
+Each file in this directory is a plain MySQL script (DELIMITER blocks allowed), so it
+can still be run by hand with the mysql client. `python -m migrations` applies the
+files listed in MIGRATIONS that the database has not recorded in schema_migrations,
+in order. A fresh warehouse_db_enhanced.sql already records all of them.
+"""
+import hashlib
+import os
+import re
+
+from sqlalchemy import text
+
+from extensions import db
+
+MIGRATIONS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Apply order (a migration may depend on any earlier one); add new files at the end
+MIGRATIONS = (
+    'remove_price_update_delivery.sql',
+    'add_stock_balances.sql',
+    'stock_balance_row_lock.sql',
+    'add_txn_daily_rollup.sql',
+    'add_rollup_qty_moved.sql',
+    'add_table_versions.sql',
+    'add_stock_checkpoints.sql',
+    'partition_inventory_transactions.sql',
+    'add_ledger_date_indexes.sql',
+    'add_ledger_archive_version.sql',
+)
+
+_DELIMITER = re.compile(r'^\s*DELIMITER\s+(\S+)\s*$', re.IGNORECASE)
+_COMMENT_LINE = re.compile(r'^\s*(--|#)')
+# The target database comes from DATABASE_URL, not from the script
+_USE = re.compile(r'^USE\s+\S+$', re.IGNORECASE)
+
+
+def split_statements(sql: str):
+    """Statements of a mysql-client script: honours DELIMITER, drops comment lines and USE"""
+    delimiter, buf = ';', []
+    for line in sql.splitlines(keepends=True):
+        m = _DELIMITER.match(line)
+        if m:
+            delimiter = m.group(1)
+            continue
+        buf.append(line)
+        if not _COMMENT_LINE.match(line) and line.rstrip().endswith(delimiter):
+            yield from _statement(''.join(buf).rstrip()[:-len(delimiter)])
+            buf = []
+    yield from _statement(''.join(buf))
+
+
+def _statement(chunk: str):
+    body = '\n'.join(l for l in chunk.splitlines() if not _COMMENT_LINE.match(l)).strip()
+    if body and not _USE.match(body):
+        yield body
+
+
+def checksum(name: str) -> str:
+    with open(os.path.join(MIGRATIONS_DIR, name), 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def ensure_table():
+    db.session.execute(text("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+          migration        VARCHAR(255) PRIMARY KEY COMMENT 'Tên file migration',
+          checksum         CHAR(64) NULL COMMENT 'SHA-256 của file khi áp dụng',
+          applied_at       TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP COMMENT 'Thời điểm áp dụng'
+        ) ENGINE=InnoDB COMMENT='Lịch sử áp dụng migration'
+    """))
+    db.session.commit()
+
+
+def applied():
+    """{migration: checksum or None} recorded in schema_migrations"""
+    rows = db.session.execute(text('SELECT migration, checksum FROM schema_migrations')).all()
+    db.session.commit()
+    return dict(rows)
+
+
+def record(name: str, digest):
+    db.session.execute(text("""
+        INSERT INTO schema_migrations (migration, checksum) VALUES (:m, :c)
+        ON DUPLICATE KEY UPDATE checksum = VALUES(checksum), applied_at = CURRENT_TIMESTAMP
+    """), {'m': name, 'c': digest})
+    db.session.commit()
+
+
+def apply(name: str, echo=print):
+    """Run one migration statement by statement on a raw connection, then record it.
+    MySQL DDL commits implicitly, so a failure leaves the earlier statements applied."""
+    with open(os.path.join(MIGRATIONS_DIR, name), encoding='utf-8') as f:
+        statements = list(split_statements(f.read()))
+    raw = db.engine.raw_connection()
+    try:
+        cur = raw.cursor()
+        for statement in statements:
+            # No parameters: PyMySQL leaves the '%' in DATE_FORMAT patterns alone
+            cur.execute(statement)
+            while True:
+                if cur.description and statement.lstrip().upper().startswith('SELECT'):
+                    for row in cur.fetchall():
+                        echo('      ' + ' | '.join(str(v) for v in row))
+                if not cur.nextset():
+                    break
+        raw.commit()
+        cur.close()
+    finally:
+        raw.close()
+    record(name, checksum(name))
+    return len(statements)
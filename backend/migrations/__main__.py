@@ -0,0 +1,68 @@
+"""
+Apply the pending SQL migrations to the DATABASE_URL database (run from backend/)
+
+    python -m migrations                       # apply pending migrations in order
+    python -m migrations --status              # applied / pending / changed since applied
+    python -m migrations --fake-through add_stock_checkpoints.sql
+                                               # record up to that file as applied without running it
+                                               # (databases created from an older schema file)
+"""
+import argparse
+import os
+import sys
+
+from app import create_app
+from migrations import MIGRATIONS, MIGRATIONS_DIR, applied, apply, checksum, ensure_table, record
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m migrations', description='Áp dụng các migration SQL còn thiếu')
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument('--status', action='store_true')
+    group.add_argument('--fake-through', metavar='FILE', choices=MIGRATIONS)
+    args = parser.parse_args(argv)
+
+    unlisted = sorted(set(f for f in os.listdir(MIGRATIONS_DIR) if f.endswith('.sql')) - set(MIGRATIONS))
+    if unlisted:
+        print(f"⚠️  Chưa có trong MIGRATIONS (sẽ không được áp dụng): {', '.join(unlisted)}")
+
+    app = create_app()
+    with app.app_context():
+        ensure_table()
+        done = applied()
+
+        if args.status:
+            for name in MIGRATIONS:
+                if name not in done:
+                    state = 'chưa áp dụng'
+                elif done[name] and done[name] != checksum(name):
+                    state = 'đã áp dụng, file đã thay đổi sau đó'
+                else:
+                    state = 'đã áp dụng'
+                print(f"   {name:<45} {state}")
+            return 0
+
+        if args.fake_through:
+            for name in MIGRATIONS[:MIGRATIONS.index(args.fake_through) + 1]:
+                if name not in done:
+                    record(name, None)
+                    print(f"✅ Đánh dấu đã áp dụng: {name}")
+            return 0
+
+        pending = [name for name in MIGRATIONS if name not in done]
+        if not pending:
+            print("Không có migration nào cần áp dụng")
+        for name in pending:
+            print(f"-> {name}")
+            try:
+                n = apply(name)
+            except Exception as e:
+                print(f"❌ {name} thất bại: {e}", file=sys.stderr)
+                print("   Các câu lệnh trước đó đã được áp dụng (DDL tự commit); sửa lỗi rồi chạy lại "
+                      "hoặc hoàn tất thủ công và dùng --fake-through", file=sys.stderr)
+                return 1
+            print(f"✅ {name}: {n} câu lệnh")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,47 @@
+-- Migration: Bump table_versions('ledger_archive') on every write to ledger_archive
+-- The 'ledger' validator of conditional GET only reads the head of inventory_transactions.
+-- ledger_partitions.py archive (DROP PARTITION of the oldest month) and restore (filling
+-- inventory_transactions_archive) leave that head unchanged, so /reports/txns and
+-- /reports/stock-as-of also list 'ledger_archive' as a source. Both commands write a
+-- ledger_archive row after changing the data, which moves this version.
+-- Requires add_table_versions.sql and partition_inventory_transactions.sql.
+
+USE warehouse_db;
+
+-- Step 1: Triggers
+DROP TRIGGER IF EXISTS trg_ledger_archive_version_insert;
+DROP TRIGGER IF EXISTS trg_ledger_archive_version_update;
+DROP TRIGGER IF EXISTS trg_ledger_archive_version_delete;
+
+DELIMITER $$
+
+CREATE TRIGGER trg_ledger_archive_version_insert
+AFTER INSERT ON ledger_archive
+FOR EACH ROW
+BEGIN
+  INSERT INTO table_versions (table_name, version) VALUES ('ledger_archive', 1)
+  ON DUPLICATE KEY UPDATE version = version + 1, updated_at = CURRENT_TIMESTAMP;
+END$$
+
+CREATE TRIGGER trg_ledger_archive_version_update
+AFTER UPDATE ON ledger_archive
+FOR EACH ROW
+BEGIN
+  INSERT INTO table_versions (table_name, version) VALUES ('ledger_archive', 1)
+  ON DUPLICATE KEY UPDATE version = version + 1, updated_at = CURRENT_TIMESTAMP;
+END$$
+
+CREATE TRIGGER trg_ledger_archive_version_delete
+AFTER DELETE ON ledger_archive
+FOR EACH ROW
+BEGIN
+  INSERT INTO table_versions (table_name, version) VALUES ('ledger_archive', 1)
+  ON DUPLICATE KEY UPDATE version = version + 1, updated_at = CURRENT_TIMESTAMP;
+END$$
+
+DELIMITER ;
+
+-- Verification query
+SELECT TRIGGER_NAME, EVENT_MANIPULATION
+FROM information_schema.TRIGGERS
+WHERE TRIGGER_SCHEMA = DATABASE() AND EVENT_OBJECT_TABLE = 'ledger_archive';
@@ -0,0 +1,30 @@
+-- Migration: Composite (filter, created_at) indexes on inventory_transactions
+-- /api/reports/txns filters by product_id and/or warehouse_id over a created_at range and
+-- pages with ORDER BY created_at DESC, transaction_id DESC. With single-column indexes the
+-- server reads every matching row and filesorts it before LIMIT. An index ending in
+-- created_at (InnoDB appends the primary key, which starts with transaction_id) returns rows
+-- already in page order, so a page reads only `limit` rows.
+-- The three replaced indexes are prefixes of the new ones, so inserts maintain as many
+-- indexes as before.
+-- Requires partition_inventory_transactions.sql (the ledger foreign keys no longer need
+-- the single-column indexes).
+
+USE warehouse_db;
+
+-- Step 1: Per (product, warehouse) history, newest first
+ALTER TABLE inventory_transactions
+  DROP INDEX idx_it_product_warehouse,
+  ADD INDEX idx_it_pair_date (product_id, warehouse_id, created_at);
+
+-- Step 2: Per product and per warehouse history, newest first
+ALTER TABLE inventory_transactions
+  DROP INDEX idx_it_product,
+  ADD INDEX idx_it_product_date (product_id, created_at),
+  DROP INDEX idx_it_warehouse,
+  ADD INDEX idx_it_warehouse_date (warehouse_id, created_at);
+
+-- Verification query
+SELECT INDEX_NAME, GROUP_CONCAT(COLUMN_NAME ORDER BY SEQ_IN_INDEX) AS columns
+FROM information_schema.STATISTICS
+WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'inventory_transactions'
+GROUP BY INDEX_NAME;
@@ -0,0 +1,84 @@
+-- Migration: Add materialized stock_balances table
+-- Replaces the CROSS JOIN + full-ledger aggregation in v_current_stock
+-- with a per-(product, warehouse) balance maintained by trigger.
+
+USE warehouse_db;
+
+-- Step 1: Create stock_balances
+CREATE TABLE IF NOT EXISTS stock_balances (
+  product_id       INT NOT NULL COMMENT 'Mã sản phẩm',
+  warehouse_id     INT NOT NULL COMMENT 'Mã kho',
+  qty_on_hand      BIGINT NOT NULL DEFAULT 0 COMMENT 'Tồn kho hiện tại',
+  last_updated     TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP COMMENT 'Thời điểm giao dịch cuối',
+  PRIMARY KEY (product_id, warehouse_id),
+  CONSTRAINT fk_sb_product
+    FOREIGN KEY (product_id) REFERENCES products(product_id)
+      ON UPDATE CASCADE ON DELETE RESTRICT,
+  CONSTRAINT fk_sb_warehouse
+    FOREIGN KEY (warehouse_id) REFERENCES warehouses(warehouse_id)
+      ON UPDATE CASCADE ON DELETE RESTRICT,
+  INDEX idx_sb_warehouse (warehouse_id)
+) ENGINE=InnoDB COMMENT='Bảng tồn kho hiện tại (materialized từ inventory_transactions)';
+
+-- Step 2: Trigger + rebuild procedure
+DROP TRIGGER IF EXISTS trg_it_after_insert;
+DROP PROCEDURE IF EXISTS sp_rebuild_stock_balances;
+
+DELIMITER $$
+
+CREATE TRIGGER trg_it_after_insert
+AFTER INSERT ON inventory_transactions
+FOR EACH ROW
+BEGIN
+  -- Cập nhật tồn kho hiện tại trong cùng giao dịch với bản ghi sổ
+  INSERT INTO stock_balances (product_id, warehouse_id, qty_on_hand, last_updated)
+  VALUES (NEW.product_id, NEW.warehouse_id, NEW.stock_after_transaction, NEW.created_at)
+  ON DUPLICATE KEY UPDATE
+    qty_on_hand = NEW.stock_after_transaction,
+    last_updated = NEW.created_at;
+END$$
+
+-- Tính lại toàn bộ stock_balances từ sổ inventory_transactions
+CREATE PROCEDURE sp_rebuild_stock_balances ()
+BEGIN
+  DELETE FROM stock_balances;
+
+  INSERT INTO stock_balances (product_id, warehouse_id, qty_on_hand, last_updated)
+  SELECT
+    product_id,
+    warehouse_id,
+    SUM(CASE WHEN transaction_type = 'OUT' THEN -quantity ELSE quantity END),
+    MAX(created_at)
+  FROM inventory_transactions
+  GROUP BY product_id, warehouse_id;
+END$$
+
+DELIMITER ;
+
+-- Step 3: Backfill from the existing ledger
+CALL sp_rebuild_stock_balances();
+
+-- Step 4: Point the report views at stock_balances
+CREATE OR REPLACE VIEW v_current_stock AS
+SELECT 
+  p.product_id,
+  p.sku,
+  p.product_name,
+  w.warehouse_id,
+  w.warehouse_code,
+  w.warehouse_name,
+  sb.qty_on_hand AS stock_quantity,
+  p.unit,
+  p.min_stock_level,
+  sb.last_updated
+FROM stock_balances sb
+JOIN products p ON p.product_id = sb.product_id
+JOIN warehouses w ON w.warehouse_id = sb.warehouse_id;
+
+CREATE OR REPLACE VIEW v_low_stock AS
+SELECT *
+FROM v_current_stock
+WHERE stock_quantity <= min_stock_level;
+
+-- Verification query
+SELECT COUNT(*) AS balance_rows, SUM(qty_on_hand) AS total_on_hand FROM stock_balances;
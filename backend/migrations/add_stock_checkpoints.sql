@@ -0,0 +1,80 @@
+-- Migration: Add stock_checkpoints for point-in-time (as-of) stock queries
+-- Closing balances per (product, warehouse) at each checkpoint date (month ends by default).
+-- /api/reports/stock-as-of reads the latest checkpoint <= the requested date and adds the
+-- daily movements from txn_daily_rollup after it.
+-- Requires add_txn_daily_rollup.sql to have been applied first.
+
+USE warehouse_db;
+
+-- Step 1: Create stock_checkpoints
+CREATE TABLE IF NOT EXISTS stock_checkpoints (
+  checkpoint_date  DATE NOT NULL COMMENT 'Ngày chốt (tồn cuối ngày)',
+  product_id       INT NOT NULL COMMENT 'Mã sản phẩm',
+  warehouse_id     INT NOT NULL COMMENT 'Mã kho',
+  qty_on_hand      BIGINT NOT NULL DEFAULT 0 COMMENT 'Tồn kho cuối ngày chốt',
+  PRIMARY KEY (checkpoint_date, product_id, warehouse_id),
+  CONSTRAINT fk_sc_product
+    FOREIGN KEY (product_id) REFERENCES products(product_id)
+      ON UPDATE CASCADE ON DELETE RESTRICT,
+  CONSTRAINT fk_sc_warehouse
+    FOREIGN KEY (warehouse_id) REFERENCES warehouses(warehouse_id)
+      ON UPDATE CASCADE ON DELETE RESTRICT,
+  INDEX idx_sc_warehouse_date (warehouse_id, checkpoint_date)
+) ENGINE=InnoDB COMMENT='Tồn kho chốt định kỳ cho truy vấn tồn tại một thời điểm';
+
+-- Step 2: Checkpoint procedures
+DROP PROCEDURE IF EXISTS sp_create_stock_checkpoint;
+DROP PROCEDURE IF EXISTS sp_rebuild_stock_checkpoints;
+
+DELIMITER $$
+
+-- Chốt tồn cuối ngày p_date: lần chốt trước đó + biến động từng ngày sau nó (txn_daily_rollup)
+CREATE PROCEDURE sp_create_stock_checkpoint (
+  IN p_date DATE
+)
+BEGIN
+  DECLARE v_prev DATE;
+
+  SELECT MAX(checkpoint_date) INTO v_prev
+  FROM stock_checkpoints
+  WHERE checkpoint_date < p_date;
+
+  DELETE FROM stock_checkpoints WHERE checkpoint_date = p_date;
+  INSERT INTO stock_checkpoints (checkpoint_date, product_id, warehouse_id, qty_on_hand)
+  SELECT p_date, x.product_id, x.warehouse_id, SUM(x.qty)
+  FROM (
+    SELECT product_id, warehouse_id, qty_on_hand AS qty
+    FROM stock_checkpoints
+    WHERE checkpoint_date = v_prev
+    UNION ALL
+    SELECT product_id, warehouse_id, qty_in - qty_out + qty_adjust
+    FROM txn_daily_rollup
+    WHERE day > COALESCE(v_prev, '1000-01-01') AND day <= p_date
+  ) x
+  GROUP BY x.product_id, x.warehouse_id;
+END$$
+
+-- Tính lại toàn bộ stock_checkpoints: chốt cuối mỗi tháng đã kết thúc
+CREATE PROCEDURE sp_rebuild_stock_checkpoints ()
+BEGIN
+  DECLARE v_date DATE;
+
+  DELETE FROM stock_checkpoints;
+  SELECT LAST_DAY(MIN(day)) INTO v_date FROM txn_daily_rollup;
+  WHILE v_date IS NOT NULL AND v_date < CURDATE() DO
+    CALL sp_create_stock_checkpoint(v_date);
+    SET v_date = LAST_DAY(v_date + INTERVAL 1 DAY);
+  END WHILE;
+END$$
+
+DELIMITER ;
+
+-- Step 3: Backfill month-end checkpoints from the existing rollup
+CALL sp_rebuild_stock_checkpoints();
+
+-- Verification query
+SELECT checkpoint_date, COUNT(*) AS pairs, SUM(qty_on_hand) AS qty_total
+FROM stock_checkpoints
+GROUP BY checkpoint_date
+ORDER BY checkpoint_date DESC
+LIMIT 12;
@@ -0,0 +1,164 @@
+-- Migration: Add table_versions and the triggers that bump it
+-- Backs conditional GET (ETag / 304) on list and report endpoints (backend/conditional.py).
+-- Each write to products, suppliers, warehouses, product_supplier or users increments
+-- that table's version in the same transaction.
+
+USE warehouse_db;
+
+-- Step 1: Create table
+CREATE TABLE IF NOT EXISTS table_versions (
+  table_name       VARCHAR(64) PRIMARY KEY COMMENT 'Tên bảng',
+  version          BIGINT NOT NULL DEFAULT 0 COMMENT 'Số lần ghi',
+  updated_at       TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP COMMENT 'Thời điểm ghi cuối'
+) ENGINE=InnoDB COMMENT='Phiên bản dữ liệu theo bảng (validator cho conditional GET)';
+
+-- Step 2: Triggers
+DROP TRIGGER IF EXISTS trg_products_version_insert;
+DROP TRIGGER IF EXISTS trg_products_version_update;
+DROP TRIGGER IF EXISTS trg_products_version_delete;
+DROP TRIGGER IF EXISTS trg_suppliers_version_insert;
+DROP TRIGGER IF EXISTS trg_suppliers_version_update;
+DROP TRIGGER IF EXISTS trg_suppliers_version_delete;
+DROP TRIGGER IF EXISTS trg_warehouses_version_insert;
+DROP TRIGGER IF EXISTS trg_warehouses_version_update;
+DROP TRIGGER IF EXISTS trg_warehouses_version_delete;
+DROP TRIGGER IF EXISTS trg_ps_version_insert;
+DROP TRIGGER IF EXISTS trg_ps_version_update;
+DROP TRIGGER IF EXISTS trg_ps_version_delete;
+DROP TRIGGER IF EXISTS trg_users_version_insert;
+DROP TRIGGER IF EXISTS trg_users_version_update;
+DROP TRIGGER IF EXISTS trg_users_version_delete;
+
+DELIMITER $$
+
+CREATE TRIGGER trg_products_version_insert
+AFTER INSERT ON products
+FOR EACH ROW
+BEGIN
+  INSERT INTO table_versions (table_name, version) VALUES ('products', 1)
+  ON DUPLICATE KEY UPDATE version = version + 1, updated_at = CURRENT_TIMESTAMP;
+END$$
+
+CREATE TRIGGER trg_products_version_update
+AFTER UPDATE ON products
+FOR EACH ROW
+BEGIN
+  INSERT INTO table_versions (table_name, version) VALUES ('products', 1)
+  ON DUPLICATE KEY UPDATE version = version + 1, updated_at = CURRENT_TIMESTAMP;
+END$$
+
+CREATE TRIGGER trg_products_version_delete
+AFTER DELETE ON products
+FOR EACH ROW
+BEGIN
+  INSERT INTO table_versions (table_name, version) VALUES ('products', 1)
+  ON DUPLICATE KEY UPDATE version = version + 1, updated_at = CURRENT_TIMESTAMP;
+END$$
+
+CREATE TRIGGER trg_suppliers_version_insert
+AFTER INSERT ON suppliers
+FOR EACH ROW
+BEGIN
+  INSERT INTO table_versions (table_name, version) VALUES ('suppliers', 1)
+  ON DUPLICATE KEY UPDATE version = version + 1, updated_at = CURRENT_TIMESTAMP;
+END$$
+
+CREATE TRIGGER trg_suppliers_version_update
+AFTER UPDATE ON suppliers
+FOR EACH ROW
+BEGIN
+  INSERT INTO table_versions (table_name, version) VALUES ('suppliers', 1)
+  ON DUPLICATE KEY UPDATE version = version + 1, updated_at = CURRENT_TIMESTAMP;
+END$$
+
+CREATE TRIGGER trg_suppliers_version_delete
+AFTER DELETE ON suppliers
+FOR EACH ROW
+BEGIN
+  INSERT INTO table_versions (table_name, version) VALUES ('suppliers', 1)
+  ON DUPLICATE KEY UPDATE version = version + 1, updated_at = CURRENT_TIMESTAMP;
+END$$
+
+CREATE TRIGGER trg_warehouses_version_insert
+AFTER INSERT ON warehouses
+FOR EACH ROW
+BEGIN
+  INSERT INTO table_versions (table_name, version) VALUES ('warehouses', 1)
+  ON DUPLICATE KEY UPDATE version = version + 1, updated_at = CURRENT_TIMESTAMP;
+END$$
+
+CREATE TRIGGER trg_warehouses_version_update
+AFTER UPDATE ON warehouses
+FOR EACH ROW
+BEGIN
+  INSERT INTO table_versions (table_name, version) VALUES ('warehouses', 1)
+  ON DUPLICATE KEY UPDATE version = version + 1, updated_at = CURRENT_TIMESTAMP;
+END$$
+
+CREATE TRIGGER trg_warehouses_version_delete
+AFTER DELETE ON warehouses
+FOR EACH ROW
+BEGIN
+  INSERT INTO table_versions (table_name, version) VALUES ('warehouses', 1)
+  ON DUPLICATE KEY UPDATE version = version + 1, updated_at = CURRENT_TIMESTAMP;
+END$$
+
+CREATE TRIGGER trg_ps_version_insert
+AFTER INSERT ON product_supplier
+FOR EACH ROW
+BEGIN
+  INSERT INTO table_versions (table_name, version) VALUES ('product_supplier', 1)
+  ON DUPLICATE KEY UPDATE version = version + 1, updated_at = CURRENT_TIMESTAMP;
+END$$
+
+CREATE TRIGGER trg_ps_version_update
+AFTER UPDATE ON product_supplier
+FOR EACH ROW
+BEGIN
+  INSERT INTO table_versions (table_name, version) VALUES ('product_supplier', 1)
+  ON DUPLICATE KEY UPDATE version = version + 1, updated_at = CURRENT_TIMESTAMP;
+END$$
+
+CREATE TRIGGER trg_ps_version_delete
+AFTER DELETE ON product_supplier
+FOR EACH ROW
+BEGIN
+  INSERT INTO table_versions (table_name, version) VALUES ('product_supplier', 1)
+  ON DUPLICATE KEY UPDATE version = version + 1, updated_at = CURRENT_TIMESTAMP;
+END$$
+
+CREATE TRIGGER trg_users_version_insert
+AFTER INSERT ON users
+FOR EACH ROW
+BEGIN
+  INSERT INTO table_versions (table_name, version) VALUES ('users', 1)
+  ON DUPLICATE KEY UPDATE version = version + 1, updated_at = CURRENT_TIMESTAMP;
+END$$
+
+CREATE TRIGGER trg_users_version_update
+AFTER UPDATE ON users
+FOR EACH ROW
+BEGIN
+  -- Bỏ qua đổi mật khẩu/email/trạng thái: danh sách chỉ hiển thị username, full_name
+  IF NOT (OLD.username <=> NEW.username AND OLD.full_name <=> NEW.full_name) THEN
+    INSERT INTO table_versions (table_name, version) VALUES ('users', 1)
+    ON DUPLICATE KEY UPDATE version = version + 1, updated_at = CURRENT_TIMESTAMP;
+  END IF;
+END$$
+
+CREATE TRIGGER trg_users_version_delete
+AFTER DELETE ON users
+FOR EACH ROW
+BEGIN
+  INSERT INTO table_versions (table_name, version) VALUES ('users', 1)
+  ON DUPLICATE KEY UPDATE version = version + 1, updated_at = CURRENT_TIMESTAMP;
+END$$
+
+DELIMITER ;
+
+-- Step 3: Seed one row per table so the first validators are stable
+INSERT IGNORE INTO table_versions (table_name, version) VALUES
+  ('products', 0), ('suppliers', 0), ('warehouses', 0), ('product_supplier', 0), ('users', 0);
+
+-- Verification query
+SELECT table_name, version, updated_at FROM table_versions ORDER BY table_name;
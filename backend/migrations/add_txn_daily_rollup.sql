@@ -0,0 +1,101 @@
+-- Migration: Add txn_daily_rollup for daily/weekly/monthly in-out reports
+-- trg_it_after_insert now also adds each ledger row into its (day, product, warehouse) bucket.
+-- Requires add_stock_balances.sql to have been applied first.
+
+USE warehouse_db;
+
+-- Step 1: Create txn_daily_rollup
+CREATE TABLE IF NOT EXISTS txn_daily_rollup (
+  day              DATE NOT NULL COMMENT 'Ngày giao dịch',
+  product_id       INT NOT NULL COMMENT 'Mã sản phẩm',
+  warehouse_id     INT NOT NULL COMMENT 'Mã kho',
+  qty_in           BIGINT NOT NULL DEFAULT 0 COMMENT 'Tổng số lượng nhập',
+  qty_out          BIGINT NOT NULL DEFAULT 0 COMMENT 'Tổng số lượng xuất',
+  qty_adjust       BIGINT NOT NULL DEFAULT 0 COMMENT 'Tổng điều chỉnh (có dấu)',
+  txn_count        INT NOT NULL DEFAULT 0 COMMENT 'Số giao dịch',
+  txn_in_count     INT NOT NULL DEFAULT 0 COMMENT 'Số giao dịch nhập',
+  txn_out_count    INT NOT NULL DEFAULT 0 COMMENT 'Số giao dịch xuất',
+  txn_adjust_count INT NOT NULL DEFAULT 0 COMMENT 'Số giao dịch điều chỉnh',
+  PRIMARY KEY (day, product_id, warehouse_id),
+  CONSTRAINT fk_tdr_product
+    FOREIGN KEY (product_id) REFERENCES products(product_id)
+      ON UPDATE CASCADE ON DELETE RESTRICT,
+  CONSTRAINT fk_tdr_warehouse
+    FOREIGN KEY (warehouse_id) REFERENCES warehouses(warehouse_id)
+      ON UPDATE CASCADE ON DELETE RESTRICT,
+  INDEX idx_tdr_product_day (product_id, day),
+  INDEX idx_tdr_warehouse_day (warehouse_id, day)
+) ENGINE=InnoDB COMMENT='Bảng tổng hợp giao dịch theo ngày';
+
+-- Step 2: Trigger + rebuild procedure
+DROP TRIGGER IF EXISTS trg_it_after_insert;
+DROP PROCEDURE IF EXISTS sp_rebuild_txn_daily_rollup;
+
+DELIMITER $$
+
+CREATE TRIGGER trg_it_after_insert
+AFTER INSERT ON inventory_transactions
+FOR EACH ROW
+BEGIN
+  -- Cập nhật tồn kho hiện tại trong cùng giao dịch với bản ghi sổ
+  INSERT INTO stock_balances (product_id, warehouse_id, qty_on_hand, last_updated)
+  VALUES (NEW.product_id, NEW.warehouse_id, NEW.stock_after_transaction, NEW.created_at)
+  ON DUPLICATE KEY UPDATE
+    qty_on_hand = NEW.stock_after_transaction,
+    last_updated = NEW.created_at;
+
+  -- Cộng dồn vào bảng tổng hợp theo ngày
+  INSERT INTO txn_daily_rollup (
+    day, product_id, warehouse_id, qty_in, qty_out, qty_adjust,
+    txn_count, txn_in_count, txn_out_count, txn_adjust_count
+  ) VALUES (
+    DATE(NEW.created_at), NEW.product_id, NEW.warehouse_id,
+    IF(NEW.transaction_type = 'IN', NEW.quantity, 0),
+    IF(NEW.transaction_type = 'OUT', NEW.quantity, 0),
+    IF(NEW.transaction_type = 'ADJUST', NEW.quantity, 0),
+    1,
+    IF(NEW.transaction_type = 'IN', 1, 0),
+    IF(NEW.transaction_type = 'OUT', 1, 0),
+    IF(NEW.transaction_type = 'ADJUST', 1, 0)
+  )
+  ON DUPLICATE KEY UPDATE
+    qty_in = qty_in + VALUES(qty_in),
+    qty_out = qty_out + VALUES(qty_out),
+    qty_adjust = qty_adjust + VALUES(qty_adjust),
+    txn_count = txn_count + 1,
+    txn_in_count = txn_in_count + VALUES(txn_in_count),
+    txn_out_count = txn_out_count + VALUES(txn_out_count),
+    txn_adjust_count = txn_adjust_count + VALUES(txn_adjust_count);
+END$$
+
+-- Tính lại toàn bộ txn_daily_rollup từ sổ inventory_transactions
+CREATE PROCEDURE sp_rebuild_txn_daily_rollup ()
+BEGIN
+  DELETE FROM txn_daily_rollup;
+
+  INSERT INTO txn_daily_rollup (
+    day, product_id, warehouse_id, qty_in, qty_out, qty_adjust,
+    txn_count, txn_in_count, txn_out_count, txn_adjust_count
+  )
+  SELECT
+    DATE(created_at),
+    product_id,
+    warehouse_id,
+    SUM(CASE WHEN transaction_type = 'IN' THEN quantity ELSE 0 END),
+    SUM(CASE WHEN transaction_type = 'OUT' THEN quantity ELSE 0 END),
+    SUM(CASE WHEN transaction_type = 'ADJUST' THEN quantity ELSE 0 END),
+    COUNT(*),
+    SUM(transaction_type = 'IN'),
+    SUM(transaction_type = 'OUT'),
+    SUM(transaction_type = 'ADJUST')
+  FROM inventory_transactions
+  GROUP BY DATE(created_at), product_id, warehouse_id;
+END$$
+
+DELIMITER ;
+
+-- Step 3: Backfill from the existing ledger
+CALL sp_rebuild_txn_daily_rollup();
+
+-- Verification query
+SELECT COUNT(*) AS rollup_rows, SUM(txn_count) AS txn_total FROM txn_daily_rollup;
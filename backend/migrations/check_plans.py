@@ -0,0 +1,178 @@
+"""
+EXPLAIN the SQL issued by the GET endpoints in routes/ and report full scans and filesorts
+
+    python -m migrations.check_plans                 # after applying migrations / changing queries
+    python -m migrations.check_plans --min-rows 100
+
+Every URL from _urls() is requested in-process as a manager. The filter variants cover the
+optional WHERE branches. Each SELECT an endpoint runs is EXPLAINed with its real parameters
+(see bench.endpoints). A plan step is reported when its estimated rows reach --min-rows and it
+either scans a whole table or index (type ALL/index) or sorts rows itself (Using filesort).
+Findings for endpoints listed in EXPECTED are printed but allowed, because those endpoints
+return a whole table or group by a computed bucket. Any other finding makes the exit code 1.
+GET routes in routes/ that _urls() does not request are listed at the end.
+"""
+import argparse
+import datetime
+import os
+import sys
+
+os.environ.setdefault('SQL_DEBUG', '0')
+
+from flask_jwt_extended import create_access_token
+from sqlalchemy import text
+
+from app import create_app
+from bench.endpoints import FULL_SCAN_MIN_ROWS, FULL_SCAN_TYPES, StatementLog, explain
+from extensions import db
+from sql_debug import fingerprint
+
+# path -> why a scan/filesort there is by design
+EXPECTED = {
+    '/api/reports/current-stock': 'returns every stock row',
+    '/api/reports/low-stock': 'predicate compares two columns of every stock row',
+    '/api/reports/monthly-in-out': 'groups rollup days by month (computed bucket)',
+    '/api/reports/weekly-in-out': 'groups rollup days by ISO week (computed bucket)',
+    '/api/reports/daily-in-out': 'sorts the grouped result',
+    '/api/reports/dashboard': 'current-stock and monthly totals',
+    '/api/reports/stock-as-of': 'returns every pair of the checkpoint',
+    '/api/products/': 'returns the catalog',
+    '/api/catalog/products-min': 'returns the catalog',
+    '/api/catalog/products/search': 'first call loads the in-process search index',
+    '/api/catalog/suppliers': 'returns the catalog',
+    '/api/catalog/warehouses': 'returns the catalog',
+    '/api/suppliers/': 'returns the catalog',
+    '/api/users/': 'returns every user',
+    '/api/warehouses/': 'returns every warehouse',
+    '/api/relationships/product-supplier-warehouse': 'returns every link',
+    '/api/relationships/supplier-warehouses': 'returns every link',
+    '/api/relationships/warehouse-managers': 'returns every warehouse',
+    '/api/exports/current-stock': 'returns every stock row, sorted by SKU',
+    '/api/exports/low-stock': 'predicate compares two columns of every stock row',
+    '/api/exports/monthly-in-out': 'groups rollup days by month (computed bucket)',
+}
+# GET routes that run no report SQL worth checking
+SKIPPED = {'auth.sso_login', 'auth.sso_callback', 'auth.sso_github_login', 'auth.sso_github_callback',
+           'products.get_product_image', 'exports.job_status', 'exports.job_download'}
+
+
+def _urls(pid, wid, sid):
+    today = datetime.date.today()
+    year_ago = today - datetime.timedelta(days=365)
+    month_ago = today - datetime.timedelta(days=30)
+    return [
+        '/api/auth/me',
+        '/api/reports/current-stock',
+        '/api/reports/low-stock',
+        '/api/reports/monthly-in-out',
+        f'/api/reports/monthly-in-out?from={year_ago}&to={today}',
+        '/api/reports/weekly-in-out',
+        '/api/reports/daily-in-out',
+        '/api/reports/dashboard',
+        '/api/reports/top-moving',
+        f'/api/reports/top-moving?warehouse_id={wid}&days=90',
+        f'/api/reports/stock-as-of?date={month_ago}',
+        f'/api/reports/stock-as-of?date={month_ago}&warehouse_id={wid}',
+        f'/api/reports/stock-as-of?date={month_ago}&product_id={pid}',
+        '/api/reports/txns',
+        f'/api/reports/txns?from={year_ago}&to={today}',
+        f'/api/reports/txns?product_id={pid}&from={year_ago}',
+        f'/api/reports/txns?warehouse_id={wid}&from={year_ago}',
+        f'/api/reports/txns?product_id={pid}&warehouse_id={wid}&from={year_ago}&to={today}',
+        '/api/exports/current-stock',
+        '/api/exports/low-stock',
+        f'/api/exports/monthly-in-out?from={year_ago}&to={today}',
+        f'/api/exports/txns?product_id={pid}&from={year_ago}',
+        '/api/stock/recent?type=IN',
+        '/api/stock/recent?type=OUT&limit=100',
+        f'/api/stock/levels?product_id={pid}&warehouse_id={wid}',
+        '/api/products/',
+        '/api/products/?limit=100',
+        f'/api/products/?default_warehouse_id={wid}&limit=100',
+        '/api/products/?q=a&limit=100',
+        f'/api/product-supplier/supplier/{sid}/products',
+        '/api/catalog/products-min',
+        '/api/catalog/products/search?q=a',
+        '/api/catalog/suppliers',
+        '/api/catalog/warehouses',
+        '/api/relationships/product-supplier-warehouse',
+        '/api/relationships/supplier-warehouses',
+        '/api/relationships/warehouse-managers',
+        '/api/suppliers/',
+        '/api/users/',
+        '/api/warehouses/',
+    ]
+
+
+def _findings(plan, min_rows):
+    for step in plan:
+        rows = step['rows'] or 0
+        if rows < min_rows:
+            continue
+        if step['type'] in FULL_SCAN_TYPES:
+            yield f"full scan of {step['table']} (type {step['type']}, ~{rows} rows)"
+        if 'filesort' in (step['Extra'] or ''):
+            yield f"filesort on {step['table']} (~{rows} rows, key {step['key']})"
+
+
+def run(min_rows):
+    app = create_app()
+    failures = 0
+    with app.app_context():
+        manager_id = db.session.execute(text("""
+            SELECT u.user_id FROM users u JOIN roles r ON r.role_id = u.role_id
+            WHERE r.role_name = 'manager' AND u.status = 'active' ORDER BY u.user_id LIMIT 1
+        """)).scalar()
+        pid, wid = db.session.execute(text(
+            'SELECT product_id, warehouse_id FROM stock_balances ORDER BY qty_on_hand DESC LIMIT 1'
+        )).one()
+        sid = db.session.execute(text('SELECT MIN(supplier_id) FROM product_supplier')).scalar() or 0
+        db.session.commit()
+        headers = {'Authorization': 'Bearer ' + create_access_token(
+            identity=str(manager_id), additional_claims={'role': 'manager'})}
+        client = app.test_client()
+        adapter = app.url_map.bind('localhost')
+
+        covered = set()
+        for url in _urls(pid, wid, sid):
+            path = url.split('?', 1)[0]
+            covered.add(adapter.match(path, method='GET')[0])
+            with StatementLog() as log:
+                resp = client.get(url, headers=headers)
+            if resp.status_code >= 400:
+                print(f"⚠️  {url} -> {resp.status_code}")
+                continue
+            seen = set()
+            for statement in log.statements:
+                fp = fingerprint(statement)
+                if not fp.upper().startswith(('SELECT', 'WITH')) or fp in seen:
+                    continue
+                seen.add(fp)
+                for finding in _findings(explain(statement), min_rows):
+                    if path in EXPECTED:
+                        print(f"   {url}: {finding} (expected: {EXPECTED[path]})")
+                    else:
+                        failures += 1
+                        print(f"❌ {url}: {finding}\n      {fp[:160]}")
+
+        missing = sorted(
+            rule.endpoint for rule in app.url_map.iter_rules()
+            if 'GET' in rule.methods and app.view_functions[rule.endpoint].__module__.startswith('routes.')
+            and rule.endpoint not in covered and rule.endpoint not in SKIPPED
+        )
+        if missing:
+            print(f"⚠️  GET routes chưa được kiểm tra: {', '.join(missing)}")
+    print(f"\n❌ {failures} truy vấn quét toàn bảng hoặc filesort" if failures
+          else '\n✅ Không có truy vấn quét toàn bảng/filesort ngoài danh sách EXPECTED')
+    return 1 if failures else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m migrations.check_plans',
+                                     description='EXPLAIN các truy vấn của routes/')
+    parser.add_argument('--min-rows', type=int, default=FULL_SCAN_MIN_ROWS,
+                        help=f'ignore plan steps estimated below this many rows (default {FULL_SCAN_MIN_ROWS})')
+    return run(parser.parse_args(argv).min_rows)
+
+if __name__ == '__main__':
+    sys.exit(main())
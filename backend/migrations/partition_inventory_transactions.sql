@@ -0,0 +1,246 @@
+-- Migration: Partition inventory_transactions by month and add ledger archiving
+-- The ledger becomes RANGE-partitioned on UNIX_TIMESTAMP(created_at), one partition per
+-- month (p<YYYYMM>) plus pmax. ledger_partitions.py creates the monthly partitions ahead of
+-- time and archives closed months to compressed files before dropping their partition.
+--
+-- InnoDB partitioned tables cannot have foreign keys, and every unique key must include
+-- the partitioning column, so this migration also:
+--   - drops fk_it_product/fk_it_warehouse (still enforced via stock_balances' foreign keys)
+--   - drops fk_it_supplier/fk_it_user (now checked in trg_it_before_insert, with
+--     trg_suppliers_ledger_set_null / trg_users_ledger_restrict for deletes)
+--   - changes the primary key to (transaction_id, created_at)
+--   - replaces UNIQUE(transaction_code) with the transaction_codes registry
+--
+-- Requires add_stock_checkpoints.sql to have been applied first.
+-- Rebuilds the table; run it in a maintenance window, then:
+--   python ledger_partitions.py ensure
+
+USE warehouse_db;
+
+-- Step 1: Registry, archive catalog and restore target
+CREATE TABLE IF NOT EXISTS transaction_codes (
+  transaction_code VARCHAR(50) PRIMARY KEY COMMENT 'Mã giao dịch (code)'
+) ENGINE=InnoDB COMMENT='Sổ đăng ký mã giao dịch';
+
+CREATE TABLE IF NOT EXISTS ledger_archive (
+  month            DATE PRIMARY KEY COMMENT 'Tháng đã lưu trữ (ngày 1)',
+  partition_name   VARCHAR(64) NOT NULL COMMENT 'Partition đã xóa',
+  file_name        VARCHAR(255) NOT NULL COMMENT 'File lưu trữ (.csv.gz)',
+  row_count        BIGINT NOT NULL COMMENT 'Số dòng',
+  sha256           CHAR(64) NOT NULL COMMENT 'Checksum file',
+  archived_at      TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP COMMENT 'Thời điểm lưu trữ',
+  restored_at      TIMESTAMP NULL COMMENT 'Lần nạp lại gần nhất vào inventory_transactions_archive'
+) ENGINE=InnoDB COMMENT='Danh mục các tháng sổ giao dịch đã lưu trữ';
+
+CREATE TABLE IF NOT EXISTS inventory_transactions_archive (
+  transaction_id           BIGINT PRIMARY KEY COMMENT 'Mã giao dịch',
+  transaction_code         VARCHAR(50) NOT NULL COMMENT 'Mã giao dịch (code)',
+  product_id               INT NOT NULL COMMENT 'Mã sản phẩm',
+  warehouse_id             INT NOT NULL COMMENT 'Mã kho',
+  supplier_id              INT NULL COMMENT 'Mã nhà cung cấp',
+  quantity                 BIGINT NOT NULL COMMENT 'Số lượng',
+  transaction_type         ENUM('IN','OUT','ADJUST') NOT NULL COMMENT 'Loại giao dịch',
+  reason                   VARCHAR(255) NULL COMMENT 'Lý do',
+  reference_document       VARCHAR(100) NULL COMMENT 'Tài liệu tham chiếu',
+  stock_before_transaction BIGINT DEFAULT 0 COMMENT 'Tồn kho trước khi giao dịch',
+  stock_after_transaction  BIGINT DEFAULT 0 COMMENT 'Tồn kho sau khi giao dịch',
+  created_by               INT NOT NULL COMMENT 'Người tạo giao dịch',
+  created_at               TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP COMMENT 'Ngày tạo',
+  INDEX idx_ita_date (created_at),
+  INDEX idx_ita_product_date (product_id, created_at),
+  INDEX idx_ita_warehouse_date (warehouse_id, created_at)
+) ENGINE=InnoDB ROW_FORMAT=COMPRESSED COMMENT='Giao dịch của các tháng đã lưu trữ, nạp lại theo yêu cầu';
+
+INSERT IGNORE INTO transaction_codes (transaction_code)
+SELECT transaction_code FROM inventory_transactions;
+
+-- Step 2: Drop the foreign keys and reshape the keys for partitioning
+ALTER TABLE inventory_transactions
+  DROP FOREIGN KEY fk_it_product,
+  DROP FOREIGN KEY fk_it_warehouse,
+  DROP FOREIGN KEY fk_it_supplier,
+  DROP FOREIGN KEY fk_it_user;
+
+ALTER TABLE inventory_transactions
+  DROP PRIMARY KEY,
+  ADD PRIMARY KEY (transaction_id, created_at),
+  DROP INDEX transaction_code,
+  ADD INDEX idx_it_code (transaction_code);
+
+-- Step 3: Partition (a single pmax; ledger_partitions.py ensure splits it into months)
+ALTER TABLE inventory_transactions
+PARTITION BY RANGE (UNIX_TIMESTAMP(created_at)) (
+  PARTITION pmax VALUES LESS THAN MAXVALUE
+);
+
+-- Step 4: Triggers replacing the foreign keys and the unique code
+DROP TRIGGER IF EXISTS trg_it_before_insert;
+DROP TRIGGER IF EXISTS trg_suppliers_ledger_set_null;
+DROP TRIGGER IF EXISTS trg_users_ledger_restrict;
+
+DELIMITER $$
+
+CREATE TRIGGER trg_it_before_insert
+BEFORE INSERT ON inventory_transactions
+FOR EACH ROW
+BEGIN
+  DECLARE v_stock_current BIGINT DEFAULT 0;
+  DECLARE v_stock_new BIGINT DEFAULT 0;
+  DECLARE v_message VARCHAR(500);
+  
+  -- Bảng phân vùng không có khóa ngoại: kiểm tra nhà cung cấp và người tạo tại đây
+  -- (sản phẩm/kho đã được khóa ngoại của stock_balances kiểm tra ở lệnh INSERT bên dưới)
+  IF NEW.supplier_id IS NOT NULL
+     AND NOT EXISTS (SELECT 1 FROM suppliers WHERE supplier_id = NEW.supplier_id) THEN
+    SIGNAL SQLSTATE '23000'
+      SET MESSAGE_TEXT = 'Nhà cung cấp không tồn tại', MYSQL_ERRNO = 1452;
+  END IF;
+  IF NOT EXISTS (SELECT 1 FROM users WHERE user_id = NEW.created_by) THEN
+    SIGNAL SQLSTATE '23000'
+      SET MESSAGE_TEXT = 'Người tạo giao dịch không tồn tại', MYSQL_ERRNO = 1452;
+  END IF;
+  
+  -- Đảm bảo có dòng tồn kho và khóa nó đến hết giao dịch,
+  -- để các giao dịch đồng thời trên cùng (sản phẩm, kho) chạy tuần tự
+  INSERT INTO stock_balances (product_id, warehouse_id, qty_on_hand)
+  VALUES (NEW.product_id, NEW.warehouse_id, 0)
+  ON DUPLICATE KEY UPDATE qty_on_hand = qty_on_hand;
+  
+  -- Lấy tồn kho hiện tại theo khóa chính (không quét sổ giao dịch)
+  SELECT qty_on_hand INTO v_stock_current
+  FROM stock_balances
+  WHERE product_id = NEW.product_id AND warehouse_id = NEW.warehouse_id
+  FOR UPDATE;
+  
+  -- Tính toán tồn kho sau giao dịch
+  IF NEW.transaction_type = 'IN' THEN
+    SET v_stock_new = v_stock_current + NEW.quantity;
+  ELSEIF NEW.transaction_type = 'OUT' THEN
+    IF v_stock_current < NEW.quantity THEN
+      SET v_message = CONCAT('Không đủ tồn kho. Tồn hiện tại: ', v_stock_current);
+      SIGNAL SQLSTATE '45000' SET MESSAGE_TEXT = v_message;
+    END IF;
+    SET v_stock_new = v_stock_current - NEW.quantity;
+  ELSEIF NEW.transaction_type = 'ADJUST' THEN
+    SET v_stock_new = v_stock_current + NEW.quantity;
+    IF v_stock_new < 0 THEN
+      SIGNAL SQLSTATE '45000' SET MESSAGE_TEXT = 'Điều chỉnh sẽ làm tồn kho âm';
+    END IF;
+  END IF;
+  
+  -- Gán giá trị tồn kho trước/sau
+  SET NEW.stock_before_transaction = v_stock_current;
+  SET NEW.stock_after_transaction = v_stock_new;
+  
+  -- Tạo mã giao dịch tự động nếu chưa có
+  IF NEW.transaction_code IS NULL OR NEW.transaction_code = '' THEN
+    SET NEW.transaction_code = CONCAT(
+      NEW.transaction_type, '-',
+      DATE_FORMAT(NOW(), '%Y%m%d%H%i%s'), '-',
+      LPAD(FLOOR(RAND()*1000), 3, '0')
+    );
+  END IF;
+  
+  -- Mã giao dịch duy nhất trên mọi partition: trùng mã sẽ lỗi khóa chính (1062) tại đây
+  INSERT INTO transaction_codes (transaction_code) VALUES (NEW.transaction_code);
+END$$
+
+-- Thay cho khóa ngoại của inventory_transactions (bảng phân vùng)
+-- supplier_id: ON DELETE SET NULL
+CREATE TRIGGER trg_suppliers_ledger_set_null
+AFTER DELETE ON suppliers
+FOR EACH ROW
+BEGIN
+  UPDATE inventory_transactions SET supplier_id = NULL WHERE supplier_id = OLD.supplier_id;
+END$$
+
+-- created_by: ON DELETE RESTRICT
+CREATE TRIGGER trg_users_ledger_restrict
+BEFORE DELETE ON users
+FOR EACH ROW
+BEGIN
+  IF EXISTS (SELECT 1 FROM inventory_transactions WHERE created_by = OLD.user_id) THEN
+    SIGNAL SQLSTATE '23000'
+      SET MESSAGE_TEXT = 'Người dùng đã tạo giao dịch, không thể xóa', MYSQL_ERRNO = 1451;
+  END IF;
+END$$
+
+DELIMITER ;
+
+-- Step 5: Rebuild procedures that start after the archived months
+DROP PROCEDURE IF EXISTS sp_rebuild_stock_balances;
+DROP PROCEDURE IF EXISTS sp_rebuild_txn_daily_rollup;
+
+DELIMITER $$
+
+-- Tính lại toàn bộ stock_balances từ sổ inventory_transactions
+-- (nếu đã lưu trữ: lần chốt cuối tháng lưu trữ gần nhất + phần sổ còn lại)
+CREATE PROCEDURE sp_rebuild_stock_balances ()
+BEGIN
+  DECLARE v_cp DATE;
+  DECLARE v_from DATE;
+
+  SELECT LAST_DAY(MAX(month)) INTO v_cp FROM ledger_archive;
+  SET v_from = COALESCE(v_cp + INTERVAL 1 DAY, '1000-01-01');
+
+  DELETE FROM stock_balances;
+
+  INSERT INTO stock_balances (product_id, warehouse_id, qty_on_hand, last_updated)
+  SELECT
+    x.product_id,
+    x.warehouse_id,
+    SUM(x.qty),
+    MAX(x.at)
+  FROM (
+    SELECT product_id, warehouse_id, qty_on_hand AS qty, TIMESTAMP(checkpoint_date, '23:59:59') AS at
+    FROM stock_checkpoints
+    WHERE checkpoint_date = v_cp
+    UNION ALL
+    SELECT product_id, warehouse_id,
+      CASE WHEN transaction_type = 'OUT' THEN -quantity ELSE quantity END,
+      created_at
+    FROM inventory_transactions
+    WHERE created_at >= v_from
+  ) x
+  GROUP BY x.product_id, x.warehouse_id;
+END$$
+
+-- Tính lại txn_daily_rollup từ sổ inventory_transactions
+-- (các ngày thuộc tháng đã lưu trữ không còn trong sổ nên được giữ nguyên)
+CREATE PROCEDURE sp_rebuild_txn_daily_rollup ()
+BEGIN
+  DECLARE v_from DATE;
+
+  SELECT LAST_DAY(MAX(month)) + INTERVAL 1 DAY INTO v_from FROM ledger_archive;
+  SET v_from = COALESCE(v_from, '1000-01-01');
+
+  DELETE FROM txn_daily_rollup WHERE day >= v_from;
+
+  INSERT INTO txn_daily_rollup (
+    day, product_id, warehouse_id, qty_in, qty_out, qty_adjust, qty_moved,
+    txn_count, txn_in_count, txn_out_count, txn_adjust_count
+  )
+  SELECT
+    DATE(created_at),
+    product_id,
+    warehouse_id,
+    SUM(CASE WHEN transaction_type = 'IN' THEN quantity ELSE 0 END),
+    SUM(CASE WHEN transaction_type = 'OUT' THEN quantity ELSE 0 END),
+    SUM(CASE WHEN transaction_type = 'ADJUST' THEN quantity ELSE 0 END),
+    SUM(ABS(quantity)),
+    COUNT(*),
+    SUM(transaction_type = 'IN'),
+    SUM(transaction_type = 'OUT'),
+    SUM(transaction_type = 'ADJUST')
+  FROM inventory_transactions
+  WHERE created_at >= v_from
+  GROUP BY DATE(created_at), product_id, warehouse_id;
+END$$
+
+DELIMITER ;
+
+-- Verification query
+SELECT PARTITION_NAME, PARTITION_DESCRIPTION, TABLE_ROWS
+FROM information_schema.PARTITIONS
+WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'inventory_transactions'
+ORDER BY PARTITION_ORDINAL_POSITION;
@@ -0,0 +1,89 @@
+-- Migration: Read previous stock from stock_balances with a row lock
+-- trg_it_before_insert no longer scans inventory_transactions per insert,
+-- and sp_stock_out no longer repeats that lookup before inserting.
+-- Requires add_stock_balances.sql to have been applied first.
+
+USE warehouse_db;
+
+DROP TRIGGER IF EXISTS trg_it_before_insert;
+DROP PROCEDURE IF EXISTS sp_stock_out;
+
+DELIMITER $$
+
+CREATE TRIGGER trg_it_before_insert
+BEFORE INSERT ON inventory_transactions
+FOR EACH ROW
+BEGIN
+  DECLARE v_stock_current BIGINT DEFAULT 0;
+  DECLARE v_stock_new BIGINT DEFAULT 0;
+  DECLARE v_message VARCHAR(500);
+  
+  -- Đảm bảo có dòng tồn kho và khóa nó đến hết giao dịch,
+  -- để các giao dịch đồng thời trên cùng (sản phẩm, kho) chạy tuần tự
+  INSERT INTO stock_balances (product_id, warehouse_id, qty_on_hand)
+  VALUES (NEW.product_id, NEW.warehouse_id, 0)
+  ON DUPLICATE KEY UPDATE qty_on_hand = qty_on_hand;
+  
+  -- Lấy tồn kho hiện tại theo khóa chính (không quét sổ giao dịch)
+  SELECT qty_on_hand INTO v_stock_current
+  FROM stock_balances
+  WHERE product_id = NEW.product_id AND warehouse_id = NEW.warehouse_id
+  FOR UPDATE;
+  
+  -- Tính toán tồn kho sau giao dịch
+  IF NEW.transaction_type = 'IN' THEN
+    SET v_stock_new = v_stock_current + NEW.quantity;
+  ELSEIF NEW.transaction_type = 'OUT' THEN
+    IF v_stock_current < NEW.quantity THEN
+      SET v_message = CONCAT('Không đủ tồn kho. Tồn hiện tại: ', v_stock_current);
+      SIGNAL SQLSTATE '45000' SET MESSAGE_TEXT = v_message;
+    END IF;
+    SET v_stock_new = v_stock_current - NEW.quantity;
+  ELSEIF NEW.transaction_type = 'ADJUST' THEN
+    SET v_stock_new = v_stock_current + NEW.quantity;
+    IF v_stock_new < 0 THEN
+      SIGNAL SQLSTATE '45000' SET MESSAGE_TEXT = 'Điều chỉnh sẽ làm tồn kho âm';
+    END IF;
+  END IF;
+  
+  -- Gán giá trị tồn kho trước/sau
+  SET NEW.stock_before_transaction = v_stock_current;
+  SET NEW.stock_after_transaction = v_stock_new;
+  
+  -- Tạo mã giao dịch tự động nếu chưa có
+  IF NEW.transaction_code IS NULL OR NEW.transaction_code = '' THEN
+    SET NEW.transaction_code = CONCAT(
+      NEW.transaction_type, '-',
+      DATE_FORMAT(NOW(), '%Y%m%d%H%i%s'), '-',
+      LPAD(FLOOR(RAND()*1000), 3, '0')
+    );
+  END IF;
+END$$
+
+CREATE PROCEDURE sp_stock_out (
+  IN p_product_id INT,
+  IN p_warehouse_id INT,
+  IN p_quantity BIGINT,
+  IN p_created_by INT,
+  IN p_reason VARCHAR(255),
+  IN p_reference_document VARCHAR(100)
+)
+BEGIN
+  IF p_quantity <= 0 THEN
+    SIGNAL SQLSTATE '45000' SET MESSAGE_TEXT = 'Số lượng phải lớn hơn 0';
+  END IF;
+  
+  -- Kiểm tra tồn kho do trg_it_before_insert thực hiện trên dòng stock_balances đã khóa
+  INSERT INTO inventory_transactions (
+    product_id, warehouse_id, quantity, transaction_type,
+    reason, reference_document, created_by
+  ) VALUES (
+    p_product_id, p_warehouse_id, p_quantity, 'OUT',
+    p_reason, p_reference_document, p_created_by
+  );
+END$$
+
+DELIMITER ;
+
+-- Verification query
+SHOW CREATE TRIGGER trg_it_before_insert;
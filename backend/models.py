@@ -4,7 +4,7 @@ from __future__ import annotations
 Enhanced Models - Mapped to new schema with XXX_id naming convention
 Corresponds to warehouse_db_enhanced.sql
 """
-from datetime import datetime
+from datetime import date, datetime
 from typing_extensions import Optional, List
 
 from sqlalchemy import Enum, ForeignKey, DECIMAL, BigInteger
@@ -119,10 +119,12 @@ class ProductSupplier(db.Model):
 
 
 class InventoryTransaction(db.Model):
+    """Sổ giao dịch, phân vùng theo tháng: khóa ngoại chỉ khai báo cho ORM (trigger kiểm tra trong DB),
+    transaction_code duy nhất nhờ bảng transaction_codes"""
     __tablename__ = 'inventory_transactions'
     
     transaction_id: Mapped[int] = mapped_column(primary_key=True, comment='Mã giao dịch')
-    transaction_code: Mapped[str] = mapped_column(db.String(50), unique=True, nullable=False, comment='Mã giao dịch (code)')
+    transaction_code: Mapped[str] = mapped_column(db.String(50), index=True, nullable=False, comment='Mã giao dịch (code)')
     product_id: Mapped[int] = mapped_column(ForeignKey('products.product_id'), nullable=False, comment='Mã sản phẩm')
     warehouse_id: Mapped[int] = mapped_column(ForeignKey('warehouses.warehouse_id'), nullable=False, comment='Mã kho')
     supplier_id: Mapped[Optional[int]] = mapped_column(ForeignKey('suppliers.supplier_id'), comment='Mã nhà cung cấp')
@@ -140,3 +142,57 @@ class InventoryTransaction(db.Model):
     warehouse = relationship('Warehouse', back_populates='transactions')
     supplier = relationship('Supplier', back_populates='transactions')
     creator = relationship('User', foreign_keys=[created_by], back_populates='created_transactions')
+
+
+class StockBalance(db.Model):
+    """Tồn kho hiện tại theo (sản phẩm, kho) - do trg_it_after_insert duy trì"""
+    __tablename__ = 'stock_balances'
+    
+    product_id: Mapped[int] = mapped_column(ForeignKey('products.product_id'), primary_key=True, comment='Mã sản phẩm')
+    warehouse_id: Mapped[int] = mapped_column(ForeignKey('warehouses.warehouse_id'), primary_key=True, comment='Mã kho')
+    qty_on_hand: Mapped[int] = mapped_column(BigInteger, default=0, nullable=False, comment='Tồn kho hiện tại')
+    last_updated: Mapped[datetime] = mapped_column(db.TIMESTAMP, default=datetime.utcnow, nullable=False, comment='Thời điểm giao dịch cuối')
+    
+    # Relationships
+    product = relationship('Product')
+    warehouse = relationship('Warehouse')
+
+
+class TxnDailyRollup(db.Model):
+    """Tổng hợp giao dịch theo (ngày, sản phẩm, kho) - do trg_it_after_insert cộng dồn"""
+    __tablename__ = 'txn_daily_rollup'
+    
+    day: Mapped[date] = mapped_column(db.Date, primary_key=True, comment='Ngày giao dịch')
+    product_id: Mapped[int] = mapped_column(ForeignKey('products.product_id'), primary_key=True, comment='Mã sản phẩm')
+    warehouse_id: Mapped[int] = mapped_column(ForeignKey('warehouses.warehouse_id'), primary_key=True, comment='Mã kho')
+    qty_in: Mapped[int] = mapped_column(BigInteger, default=0, nullable=False, comment='Tổng số lượng nhập')
+    qty_out: Mapped[int] = mapped_column(BigInteger, default=0, nullable=False, comment='Tổng số lượng xuất')
+    qty_adjust: Mapped[int] = mapped_column(BigInteger, default=0, nullable=False, comment='Tổng điều chỉnh (có dấu)')
+    qty_moved: Mapped[int] = mapped_column(BigInteger, default=0, nullable=False, comment='Tổng |số lượng| luân chuyển')
+    txn_count: Mapped[int] = mapped_column(db.Integer, default=0, nullable=False, comment='Số giao dịch')
+    txn_in_count: Mapped[int] = mapped_column(db.Integer, default=0, nullable=False, comment='Số giao dịch nhập')
+    txn_out_count: Mapped[int] = mapped_column(db.Integer, default=0, nullable=False, comment='Số giao dịch xuất')
+    txn_adjust_count: Mapped[int] = mapped_column(db.Integer, default=0, nullable=False, comment='Số giao dịch điều chỉnh')
+
+
+class StockCheckpoint(db.Model):
+    """Tồn kho chốt cuối ngày theo (ngày chốt, sản phẩm, kho) - do sp_create_stock_checkpoint tạo"""
+    __tablename__ = 'stock_checkpoints'
+    
+    checkpoint_date: Mapped[date] = mapped_column(db.Date, primary_key=True, comment='Ngày chốt (tồn cuối ngày)')
+    product_id: Mapped[int] = mapped_column(ForeignKey('products.product_id'), primary_key=True, comment='Mã sản phẩm')
+    warehouse_id: Mapped[int] = mapped_column(ForeignKey('warehouses.warehouse_id'), primary_key=True, comment='Mã kho')
+    qty_on_hand: Mapped[int] = mapped_column(BigInteger, default=0, nullable=False, comment='Tồn kho cuối ngày chốt')
+
+
+class LedgerArchive(db.Model):
+    """Tháng sổ giao dịch đã lưu trữ ra file và xóa partition - do ledger_partitions.py ghi"""
+    __tablename__ = 'ledger_archive'
+    
+    month: Mapped[date] = mapped_column(db.Date, primary_key=True, comment='Tháng đã lưu trữ (ngày 1)')
+    partition_name: Mapped[str] = mapped_column(db.String(64), nullable=False, comment='Partition đã xóa')
+    file_name: Mapped[str] = mapped_column(db.String(255), nullable=False, comment='File lưu trữ (.csv.gz)')
+    row_count: Mapped[int] = mapped_column(BigInteger, nullable=False, comment='Số dòng')
+    sha256: Mapped[str] = mapped_column(db.String(64), nullable=False, comment='Checksum file')
+    archived_at: Mapped[datetime] = mapped_column(db.TIMESTAMP, default=datetime.utcnow, nullable=False, comment='Thời điểm lưu trữ')
+    restored_at: Mapped[Optional[datetime]] = mapped_column(db.TIMESTAMP, comment='Lần nạp lại gần nhất vào inventory_transactions_archive')
@@ -0,0 +1,146 @@
+"""
+Rolling window of per-product daily movement backing /api/reports/top-moving
+
+Day buckets come from txn_daily_rollup.qty_moved (sum of |quantity|). Closed
+days are loaded once per process; today's bucket is re-read whenever the
+ledger's MAX(transaction_id) moves, so writes from any path (procedures,
+batch endpoint, other workers) are picked up. Window totals per
+(days, warehouse_id) and their top-N lists are maintained incrementally:
+posting adds today's delta, and day rollover subtracts the expired day.
+Both caches are LRU-bounded (MAX_CACHED_TOTALS / MAX_CACHED_TOPS) so the set of
+(days, warehouse_id, n) keys clients ask for cannot grow memory or the per-write
+update cost without limit.
+"""
+import datetime
+import heapq
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import text
+
+from extensions import db
+
+MAX_WINDOW_DAYS = 90
+# Re-read today's bucket at least this often even if no new transaction_id was seen
+# (a transaction with a lower id can commit after a higher one)
+TODAY_REFRESH_SECONDS = 5
+# Window totals / top-N lists kept per process; each cached total is updated on every new posting
+MAX_CACHED_TOTALS = 32
+MAX_CACHED_TOPS = 128
+
+
+class MovementWindow:
+    def __init__(self, max_days: int = MAX_WINDOW_DAYS):
+        self.max_days = max_days
+        self._lock = threading.Lock()
+        self._today = None
+        self._watermark = None
+        self._refreshed_at = 0.0
+        self._buckets = {}  # day -> {(product_id, warehouse_id): moved}
+        self._totals = OrderedDict()  # (days, warehouse_id|None) -> {product_id: moved}, LRU order
+        self._top = OrderedDict()     # (days, warehouse_id|None, n) -> [(moved, product_id), ...]
+
+    def top(self, n: int, days: int, warehouse_id=None):
+        """Top-n products by movement over [today - days, today], optionally for one warehouse"""
+        with self._lock:
+            self._sync()
+            top_key = (days, warehouse_id, n)
+            if top_key not in self._top:
+                totals = self._cached(self._totals, (days, warehouse_id), MAX_CACHED_TOTALS,
+                                      lambda: self._sum_buckets(days, warehouse_id))
+                self._cached(self._top, top_key, MAX_CACHED_TOPS,
+                             lambda: heapq.nlargest(n, ((v, pid) for pid, v in totals.items() if v > 0)))
+            else:
+                self._top.move_to_end(top_key)
+            return list(self._top[top_key])
+
+    # ---------------------
+    # Internals (caller holds self._lock)
+    # ---------------------
+    @staticmethod
+    def _cached(cache: OrderedDict, key, limit: int, build):
+        if key in cache:
+            cache.move_to_end(key)
+        else:
+            cache[key] = build()
+            if len(cache) > limit:
+                cache.popitem(last=False)
+        return cache[key]
+
+    def _sync(self):
+        today = datetime.date.today()
+        if self._today is None:
+            self._load_all(today)
+        elif self._today != today:
+            self._roll_to(today)
+        watermark = db.session.execute(text('SELECT MAX(transaction_id) FROM inventory_transactions')).scalar()
+        now = time.monotonic()
+        if watermark != self._watermark or now - self._refreshed_at > TODAY_REFRESH_SECONDS:
+            self._replace_day(today, self._load_days(today, today).get(today, {}))
+            self._watermark = watermark
+            self._refreshed_at = now
+
+    def _load_days(self, first: datetime.date, last: datetime.date):
+        rows = db.session.execute(text("""
+            SELECT day, product_id, warehouse_id, qty_moved
+            FROM txn_daily_rollup
+            WHERE day >= :first AND day <= :last AND qty_moved > 0
+        """), {'first': first, 'last': last})
+        days = {}
+        for r in rows:
+            days.setdefault(r.day, {})[(r.product_id, r.warehouse_id)] = int(r.qty_moved)
+        return days
+
+    def _load_all(self, today: datetime.date):
+        self._buckets = self._load_days(today - datetime.timedelta(days=self.max_days), today)
+        self._totals.clear()
+        self._top.clear()
+        self._today = today
+        self._watermark = None
+
+    def _roll_to(self, today: datetime.date):
+        if (today - self._today).days > self.max_days or today < self._today:
+            self._load_all(today)
+            return
+        # Finalize the previous "today" and any days in between, then expire old days
+        last = self._today
+        for day, bucket in self._load_days(last, today - datetime.timedelta(days=1)).items():
+            self._replace_day(day, bucket)
+        for (days, wid), totals in self._totals.items():
+            for offset in range((today - last).days):
+                expired = last - datetime.timedelta(days=days - offset)
+                self._add(totals, self._buckets.get(expired, {}), wid, -1)
+        cutoff = today - datetime.timedelta(days=self.max_days)
+        for day in [d for d in self._buckets if d < cutoff]:
+            del self._buckets[day]
+        self._top.clear()
+        self._today = today
+
+    def _replace_day(self, day: datetime.date, bucket: dict):
+        old = self._buckets.get(day, {})
+        if old == bucket:
+            return
+        for (days, wid), totals in self._totals.items():
+            if day >= self._today - datetime.timedelta(days=days):
+                self._add(totals, old, wid, -1)
+                self._add(totals, bucket, wid, 1)
+        self._buckets[day] = bucket
+        self._top.clear()
+
+    def _sum_buckets(self, days: int, warehouse_id):
+        first = self._today - datetime.timedelta(days=days)
+        totals = {}
+        for day, bucket in self._buckets.items():
+            if day >= first:
+                self._add(totals, bucket, warehouse_id, 1)
+        return totals
+
+    @staticmethod
+    def _add(totals: dict, bucket: dict, warehouse_id, sign: int):
+        for (pid, wid), moved in bucket.items():
+            if warehouse_id is None or wid == warehouse_id:
+                totals[pid] = totals.get(pid, 0) + sign * moved
+
+
+movement_window = MovementWindow()
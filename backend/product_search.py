@@ -0,0 +1,186 @@
+"""
+In-process typeahead index over product SKU and name backing /api/catalog/products/search
+
+Text is folded to lowercase ASCII (Vietnamese diacritics stripped, đ -> d), split
+into alphanumeric tokens and kept in a sorted term list, so a query token matches
+every term it prefixes via bisect. A query matches a product when each of its
+tokens prefixes one of the product's terms. The whole SKU is indexed as well,
+both as typed ("sp-001") and compacted ("sp001").
+
+products.py keeps this worker's index current on create/update/delete. Each
+search passes the products counter from table_versions (bumped by triggers on every
+insert, update and delete, from any worker); the index is reloaded when it differs
+from the counter it was built at, so renames and deletes elsewhere show up on the
+next search. A local write passes the counter it produced (written_version()), and
+the index adopts it when it is the next value, so its own writes cost no reload.
+"""
+import bisect
+import re
+import threading
+import unicodedata
+
+from sqlalchemy import text
+
+from extensions import db
+
+# Upper bound on products examined for token matches per query
+SCAN_LIMIT = 5000
+
+_TOKEN_RE = re.compile(r'[0-9a-z]+')
+# Combining diacritical marks left over after NFD, plus đ/Đ which do not decompose
+_FOLD_TABLE = {c: None for c in range(0x300, 0x370)}
+_FOLD_TABLE.update({ord('đ'): 'd', ord('Đ'): 'd'})
+
+
+def fold(s: str) -> str:
+    """Lowercase, accent-insensitive form: 'Đường Kính' -> 'duong kinh'"""
+    s = s or ''
+    if s.isascii():
+        return s.lower().strip()
+    return unicodedata.normalize('NFD', s).translate(_FOLD_TABLE).lower().strip()
+
+
+def _doc(sku: str, name: str, unit: str):
+    """(sku, name, unit, folded sku, folded name, terms) as stored in the index"""
+    fsku, fname = fold(sku), fold(name)
+    sku_tokens = _TOKEN_RE.findall(fsku)
+    terms = set(sku_tokens) | set(_TOKEN_RE.findall(fname))
+    terms.add(fsku)
+    terms.add(''.join(sku_tokens))
+    terms.discard('')
+    return sku, name, unit, fsku, fname, tuple(terms)
+
+
+def written_version() -> int:
+    """products counter as left by this transaction's write; call after flush, before commit.
+    The trigger's upsert locked the row, so no other writer can move it until we commit."""
+    return db.session.execute(text(
+        "SELECT version FROM table_versions WHERE table_name = 'products'"
+    )).scalar() or 0
+
+
+class ProductSearchIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._docs = {}      # product_id -> (sku, name, unit, folded sku, folded name, terms)
+        self._postings = {}  # term -> {product_id}
+        self._terms = []     # sorted distinct terms
+        self._skus = []      # sorted [(folded sku, product_id)]
+        self._names = []     # sorted [(folded name, product_id)]
+        self._loaded = False
+        self._version = None  # table_versions 'products' counter the index was built at
+
+    def search(self, q: str, version: int, k: int = 10):
+        """Top-k products for query q as [(product_id, sku, name, unit), ...]
+
+        version is the current table_versions counter for products; the index is
+        reloaded first when it was built at another one.
+
+        Ranked in tiers: exact/prefix SKU, then name prefix, then token matches
+        (whole-word terms before longer ones); each tier stops once k are found.
+        """
+        fq = fold(q)
+        tokens = sorted(set(_TOKEN_RE.findall(fq)), key=len, reverse=True)
+        if not tokens:
+            return []
+        with self._lock:
+            if not self._loaded or version != self._version:
+                self._load_all(version)
+            found = {}
+            self._scan_prefix(self._skus, fq, found, k)
+            self._scan_prefix(self._names, fq, found, k)
+            # Token matches: walk the longest token's term range, filter on the rest
+            first, rest = tokens[0], tokens[1:]
+            examined = 0
+            i = bisect.bisect_left(self._terms, first)
+            while len(found) < k and examined < SCAN_LIMIT and i < len(self._terms) \
+                    and self._terms[i].startswith(first):
+                for pid in self._postings[self._terms[i]]:
+                    if pid in found:
+                        continue
+                    examined += 1
+                    if all(any(t.startswith(tok) for t in self._docs[pid][5]) for tok in rest):
+                        found[pid] = None
+                        if len(found) >= k:
+                            break
+                i += 1
+            return [(pid, *self._docs[pid][:3]) for pid in found]
+
+    def upsert(self, product_id: int, sku: str, name: str, unit: str, version: int):
+        """Apply a local write; version is written_version() from the writing transaction"""
+        with self._lock:
+            if not self._loaded:
+                return  # built lazily on first search
+            self._remove(product_id)
+            self._add(product_id, sku, name, unit)
+            self._advance(version)
+
+    def remove(self, product_id: int, version: int):
+        with self._lock:
+            if self._loaded:
+                self._remove(product_id)
+                self._advance(version)
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded = False
+
+    # ---------------------
+    # Internals (caller holds self._lock)
+    # ---------------------
+    def _advance(self, version: int):
+        # One row written, one bump: anything else means writes this index has not seen,
+        # so keep the old counter and let the next search reload
+        if version == self._version + 1:
+            self._version = version
+
+    @staticmethod
+    def _scan_prefix(keys: list, prefix: str, found: dict, k: int):
+        i = bisect.bisect_left(keys, (prefix,))
+        while len(found) < k and i < len(keys) and keys[i][0].startswith(prefix):
+            found.setdefault(keys[i][1])
+            i += 1
+
+    def _load_all(self, version):
+        # version was read before the rows: a write in between only causes one more reload
+        rows = db.session.execute(text('SELECT product_id, sku, product_name, unit FROM products')).all()
+        self._docs = {}
+        self._postings = {}
+        for pid, sku, name, unit in rows:
+            doc = self._docs[pid] = _doc(sku, name, unit)
+            for t in doc[5]:
+                self._postings.setdefault(t, set()).add(pid)
+        self._terms = sorted(self._postings)
+        self._skus = sorted((d[3], pid) for pid, d in self._docs.items())
+        self._names = sorted((d[4], pid) for pid, d in self._docs.items())
+        self._version = version
+        self._loaded = True
+
+    def _add(self, product_id, sku, name, unit):
+        doc = self._docs[product_id] = _doc(sku, name, unit)
+        for t in doc[5]:
+            posting = self._postings.get(t)
+            if posting is None:
+                posting = self._postings[t] = set()
+                bisect.insort(self._terms, t)
+            posting.add(product_id)
+        bisect.insort(self._skus, (doc[3], product_id))
+        bisect.insort(self._names, (doc[4], product_id))
+
+    def _remove(self, product_id):
+        doc = self._docs.pop(product_id, None)
+        if doc is None:
+            return
+        for t in doc[5]:
+            posting = self._postings[t]
+            posting.discard(product_id)
+            if not posting:
+                del self._postings[t]
+                del self._terms[bisect.bisect_left(self._terms, t)]
+        for keys, key in ((self._skus, (doc[3], product_id)), (self._names, (doc[4], product_id))):
+            i = bisect.bisect_left(keys, key)
+            if i < len(keys) and keys[i] == key:
+                del keys[i]
+
+
+product_index = ProductSearchIndex()
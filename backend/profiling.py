@@ -0,0 +1,195 @@
+"""
+Opt-in per-request profiling: ?profile=1 on any endpoint (managers only)
+
+Requires PROFILING_ENABLED. A sampler thread snapshots only the request's
+thread every PROFILE_INTERVAL_MS, so other requests are not instrumented. While
+a SQL statement is executing, its fingerprint is added as a leaf frame, so
+database time shows up next to the Python frames that issued it. The profile
+is written to PROFILE_DIR and named in the X-Profile response header. Managers
+fetch it from /api/profiles/<name>.
+
+?profile_format=speedscope (default) writes a file for https://www.speedscope.app;
+?profile_format=collapsed writes "frame;frame;frame weight" lines for flamegraph.pl.
+"""
+import datetime
+import json
+import os
+import re
+import sys
+import threading
+import time
+
+from flask import abort, g, has_request_context, jsonify, request, send_from_directory
+from flask_jwt_extended import jwt_required, verify_jwt_in_request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from authz import require_manager
+from sql_debug import fingerprint
+
+FORMATS = {'speedscope': '.speedscope.json', 'collapsed': '.collapsed.txt'}
+SQL_FRAME_CHARS = 120
+_NAME_RE = re.compile(r'^[\w.-]+$')
+
+
+class _Sampler(threading.Thread):
+    """Samples one thread's Python stack; weights are wall-clock ms between samples"""
+
+    def __init__(self, thread_id: int, interval: float):
+        super().__init__(daemon=True, name='request-profiler')
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stopped = threading.Event()
+        self.stacks = {}     # tuple of (name, file, line) root -> leaf -> weight in ms
+        self.current_sql = None
+        self.sql = []        # (fingerprint, ms) per statement, in order
+
+    def run(self):
+        last = time.perf_counter()
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            now = time.perf_counter()
+            if frame is None or self.stopped.is_set():
+                continue  # no frame, or the request thread is already in stop()
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append((code.co_name, code.co_filename, code.co_firstlineno))
+                frame = frame.f_back
+            stack.reverse()
+            if self.current_sql:
+                stack.append((f'SQL {self.current_sql[:SQL_FRAME_CHARS]}', '<db>', 0))
+            key = tuple(stack)
+            self.stacks[key] = self.stacks.get(key, 0.0) + (now - last) * 1000
+            last = now
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+
+def _collapsed(sampler: _Sampler) -> str:
+    lines = []
+    for stack, ms in sampler.stacks.items():
+        names = ';'.join(f'{name} ({os.path.basename(file)}:{line})' if line else name
+                         for name, file, line in stack)
+        lines.append(f'{names} {max(1, round(ms))}')
+    return '\n'.join(lines) + '\n'
+
+
+def _speedscope(sampler: _Sampler, name: str) -> str:
+    frames, index = [], {}
+    samples, weights = [], []
+    for stack, ms in sampler.stacks.items():
+        ids = []
+        for frame in stack:
+            if frame not in index:
+                index[frame] = len(frames)
+                fname, file, line = frame
+                frames.append({'name': fname, 'file': file, 'line': line} if line else {'name': fname})
+            ids.append(index[frame])
+        samples.append(ids)
+        weights.append(round(ms, 3))
+    return json.dumps({
+        '$schema': 'https://www.speedscope.app/file-format-schema.json',
+        'exporter': 'warehouse-backend profiling.py',
+        'name': name,
+        'activeProfileIndex': 0,
+        'shared': {'frames': frames},
+        'profiles': [{
+            'type': 'sampled',
+            'name': name,
+            'unit': 'milliseconds',
+            'startValue': 0,
+            'endValue': round(sum(weights), 3),
+            'samples': samples,
+            'weights': weights,
+        }],
+        # Not part of the speedscope schema (ignored by the viewer): per-statement timings
+        'sql_statements': [{'statement': fp, 'ms': round(ms, 3)} for fp, ms in sampler.sql],
+    })
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    sampler = _active_sampler()
+    if sampler is not None:
+        sampler.current_sql = fingerprint(statement)
+        conn.info.setdefault('profile_start', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    sampler = _active_sampler()
+    starts = conn.info.get('profile_start')
+    if sampler is not None and starts:
+        sampler.sql.append((sampler.current_sql, (time.perf_counter() - starts.pop()) * 1000))
+        sampler.current_sql = None
+
+
+def _handle_error(context):
+    sampler = _active_sampler()
+    starts = context.connection.info.get('profile_start') if context.connection else None
+    if sampler is not None and starts:
+        starts.pop()
+        sampler.current_sql = None
+
+
+def _active_sampler():
+    return g.get('profiler') if has_request_context() else None
+
+
+def init_app(app):
+    profile_dir = app.config['PROFILE_DIR']
+
+    @app.before_request
+    def _maybe_start():
+        if request.args.get('profile') != '1' or not app.config['PROFILING_ENABLED']:
+            return
+        fmt = request.args.get('profile_format', 'speedscope')
+        if fmt not in FORMATS:
+            return jsonify(message=f'profile_format must be one of {", ".join(FORMATS)}'), 400
+        verify_jwt_in_request(optional=True)
+        if not require_manager():
+            return jsonify(message='profiling is limited to managers'), 403
+        g.profile_format = fmt
+        g.profiler = _Sampler(threading.get_ident(), app.config['PROFILE_INTERVAL_MS'] / 1000)
+        g.profiler.start()
+
+    @app.after_request
+    def _maybe_finish(resp):
+        sampler = g.get('profiler')
+        if sampler is None:
+            return resp
+        sampler.stop()  # idempotent; the stacks must be final before they are written
+        endpoint = (request.url_rule.rule if request.url_rule else request.path).strip('/').replace('/', '_')
+        stamp = datetime.datetime.now().strftime('%Y%m%d-%H%M%S-%f')
+        name = re.sub(r'[^\w.-]', '', f'{stamp}-{endpoint}') + FORMATS[g.profile_format]
+        os.makedirs(profile_dir, exist_ok=True)
+        body = _collapsed(sampler) if g.profile_format == 'collapsed' else _speedscope(sampler, name)
+        with open(os.path.join(profile_dir, name), 'w', encoding='utf-8') as f:
+            f.write(body)
+        resp.headers['X-Profile'] = name
+        resp.headers['X-Profile-SQL'] = f'count={len(sampler.sql)}; ms={sum(ms for _, ms in sampler.sql):.1f}'
+        return resp
+
+    # after_request is skipped when the view raises (and DEBUG propagates the exception):
+    # stop the sampler here so it never outlives its request
+    @app.teardown_request
+    def _stop_sampler(exc):
+        sampler = g.pop('profiler', None)
+        if sampler is not None:
+            sampler.stop()
+
+    @app.get('/api/profiles/<name>')
+    @jwt_required()
+    def get_profile(name: str):
+        if not app.config['PROFILING_ENABLED'] or not require_manager():
+            abort(404)
+        if not _NAME_RE.match(name):
+            abort(404)
+        return send_from_directory(profile_dir, name)
+
+    for name, fn in (('before_cursor_execute', _before_cursor_execute),
+                     ('after_cursor_execute', _after_cursor_execute),
+                     ('handle_error', _handle_error)):
+        if not event.contains(Engine, name, fn):
+            event.listen(Engine, name, fn)
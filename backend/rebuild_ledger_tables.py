@@ -0,0 +1,36 @@
+"""
+Script to recompute the tables derived from the inventory_transactions ledger
+Run this after bulk-loading transactions or if derived data is suspected to drift
+
+    python rebuild_ledger_tables.py                  # everything
+    python rebuild_ledger_tables.py stock_balances   # one table
+"""
+import sys
+from sqlalchemy import text
+from extensions import db
+from app import create_app
+
+# table -> rebuild procedure (see warehouse_db_enhanced.sql), in dependency order
+REBUILD_PROCS = {
+    'stock_balances': 'sp_rebuild_stock_balances',
+    'txn_daily_rollup': 'sp_rebuild_txn_daily_rollup',
+    'stock_checkpoints': 'sp_rebuild_stock_checkpoints',  # built from txn_daily_rollup
+}
+
+
+def rebuild(tables):
+    app = create_app()
+    with app.app_context():
+        for table in tables:
+            with db.session.begin():
+                db.session.execute(text(f'CALL {REBUILD_PROCS[table]}()'))
+            n = db.session.execute(text(f'SELECT COUNT(*) FROM {table}')).scalar()
+            db.session.commit()
+            print(f"✅ Đã tính lại {table}: {n} dòng")
+
+if __name__ == '__main__':
+    targets = sys.argv[1:] or list(REBUILD_PROCS)
+    unknown = [t for t in targets if t not in REBUILD_PROCS]
+    if unknown:
+        sys.exit(f"Không hỗ trợ: {', '.join(unknown)}. Chọn trong: {', '.join(REBUILD_PROCS)}")
+    rebuild(targets)
@@ -1,42 +1,88 @@
-from flask import Blueprint, jsonify
+from flask import Blueprint, current_app, jsonify, request
 from flask_jwt_extended import jwt_required
 from models import Warehouse, Supplier, Product
+from cache import catalog_cache
+from product_search import product_index
+from conditional import conditional, table_version
+
+SEARCH_LIMIT_DEFAULT = 10
+SEARCH_LIMIT_MAX = 50
 
 bp = Blueprint('catalog', __name__)
 
 
-@bp.get('/warehouses')
-@jwt_required()
-def warehouses():
+def _cached_items(entity: str, build_items):
+    """JSON {"items": [...]} for entity, served pre-serialized while its version holds"""
+    body, _ = catalog_cache.get_or_build(entity, lambda: current_app.json.dumps({'items': build_items()}),
+                                         extra_version=table_version(entity))
+    return current_app.response_class(body, mimetype='application/json')
+
+
+def _warehouse_items():
     items = Warehouse.query.order_by(Warehouse.warehouse_code.asc()).all()
-    return jsonify(items=[{
+    return [{
         'id': w.warehouse_id,
         'code': w.warehouse_code,
         'name': w.warehouse_name,
         'location': w.location,
         'status': w.status,
-    } for w in items])
+    } for w in items]
 
 
-@bp.get('/suppliers')
-@jwt_required()
-def suppliers():
+def _supplier_items():
     items = Supplier.query.order_by(Supplier.supplier_name.asc()).all()
-    return jsonify(items=[{
+    return [{
         'id': s.supplier_id,
         'name': s.supplier_name,
         'contact': s.contact_person,
         'phone': s.phone,
-    } for s in items])
+    } for s in items]
 
 
-@bp.get('/products-min')
-@jwt_required()
-def products_min():
+def _product_min_items():
     items = Product.query.order_by(Product.sku.asc()).all()
-    return jsonify(items=[{
+    return [{
         'id': p.product_id,
         'sku': p.sku,
         'name': p.product_name,
         'unit': p.unit,
-    } for p in items])
+    } for p in items]
+
+
+@bp.get('/warehouses')
+@jwt_required()
+@conditional('warehouses')
+def warehouses():
+    return _cached_items('warehouses', _warehouse_items)
+
+
+@bp.get('/suppliers')
+@jwt_required()
+@conditional('suppliers')
+def suppliers():
+    return _cached_items('suppliers', _supplier_items)
+
+
+@bp.get('/products-min')
+@jwt_required()
+@conditional('products')
+def products_min():
+    return _cached_items('products', _product_min_items)
+
+
+@bp.get('/products/search')
+@jwt_required()
+def products_search():
+    """Typeahead over SKU and name; prefix, token and accent-insensitive"""
+    q = (request.args.get('q') or '').strip()
+    try:
+        limit = int(request.args.get('limit', SEARCH_LIMIT_DEFAULT))
+    except (TypeError, ValueError):
+        return jsonify(message='limit must be an integer'), 400
+    limit = max(1, min(limit, SEARCH_LIMIT_MAX))
+    return jsonify(items=[{
+        'id': pid,
+        'sku': sku,
+        'name': name,
+        'unit': unit,
+    } for pid, sku, name, unit in product_index.search(q, table_version('products'), limit)])
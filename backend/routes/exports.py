@@ -0,0 +1,376 @@
+"""
+CSV / XLSX downloads of the report endpoints
+
+    GET /api/exports/<report>?format=csv|xlsx[&gzip=1][&async=1]   + the report's own filters
+
+Rows come from a server-side cursor and are written out as they arrive, so memory stays
+flat whatever the row count. When the row count estimated from stock_balances or
+txn_daily_rollup exceeds EXPORT_ASYNC_ROWS (or with async=1), the export is written to
+EXPORT_DIR by a background job instead: the response is 202 with a status_url to poll
+and a download_url that serves the file once the job is done. Job state is a JSON file
+next to the export, so any worker on the host can answer.
+"""
+import binascii
+import csv
+import datetime
+import io
+import json
+import os
+import re
+import tempfile
+import time
+import uuid
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import Blueprint, Response, current_app, jsonify, request, send_file, stream_with_context, url_for
+from flask_jwt_extended import get_jwt_identity, jwt_required
+from openpyxl import Workbook
+
+from authz import require_manager
+from extensions import db
+from routes.reports import IN_OUT_REPORTS, _parse_date, in_out_query, txns_query
+
+bp = Blueprint('exports', __name__)
+
+CSV_FLUSH_ROWS = 500
+YIELD_PER = 1000
+_JOB_ID_RE = re.compile(r'^[0-9a-f]{32}$')
+_executor = None
+
+
+def _pair_filters(where: list, params: dict):
+    """warehouse_id / product_id from the query string"""
+    wid = request.args.get('warehouse_id', type=int)
+    pid = request.args.get('product_id', type=int)
+    if wid:
+        where.append('warehouse_id = :wid')
+        params['wid'] = wid
+    if pid:
+        where.append('product_id = :pid')
+        params['pid'] = pid
+
+
+def _stock_query(view: str):
+    where, params = [], {}
+    _pair_filters(where, params)
+    where_sql = (' WHERE ' + ' AND '.join(where)) if where else ''
+    return f"""
+        SELECT sku, product_name, warehouse_code, warehouse_name, stock_quantity, unit,
+               min_stock_level, last_updated
+        FROM {view}{where_sql}
+        ORDER BY sku, warehouse_code
+        """, params
+
+
+def _in_out_export_query(report: str):
+    sql, params = in_out_query(report)
+    label = IN_OUT_REPORTS[report][1]
+    return f"""
+        SELECT r.{label}, p.sku, p.product_name, w.warehouse_code,
+               r.qty_in, r.qty_out, r.txn_count, r.txn_in_count, r.txn_out_count
+        FROM ({sql}) r
+        JOIN products p ON p.product_id = r.product_id
+        JOIN warehouses w ON w.warehouse_id = r.warehouse_id
+        ORDER BY r.{label} DESC, p.sku, w.warehouse_code
+        """, params
+
+
+# report -> builds (sql, params) from the request args; raises ValueError on bad input
+REPORTS = {
+    'current-stock': lambda: _stock_query('v_current_stock'),
+    'low-stock': lambda: _stock_query('v_low_stock'),
+    **{name: (lambda name=name: _in_out_export_query(name)) for name in IN_OUT_REPORTS},
+    'txns': txns_query,
+}
+
+
+def _estimate_rows(report: str) -> int:
+    """Upper bound on the export's row count, read from stock_balances or txn_daily_rollup
+    without running the report. The rollup keeps archived months, so it also bounds archived=1."""
+    where, params = [], {}
+    if report in ('current-stock', 'low-stock'):
+        count, table = 'COUNT(*)', 'stock_balances'
+        _pair_filters(where, params)
+    elif report in IN_OUT_REPORTS:
+        # One output row per (bucket, product, warehouse): at most one per rollup row
+        count, table = 'COUNT(*)', 'txn_daily_rollup'
+        params = dict(in_out_query(report)[1])
+        where += ['day >= :from', 'day <= :to']
+    else:
+        count, table = 'COALESCE(SUM(txn_count), 0)', 'txn_daily_rollup'
+        date_from, date_to = request.args.get('from'), request.args.get('to')
+        if date_from:
+            where.append('day >= :from')
+            params['from'] = _parse_date(date_from)
+        if date_to:
+            where.append('day <= :to')
+            params['to'] = _parse_date(date_to)
+        if not date_from and not date_to and request.args.get('archived') != '1':
+            # Same default window as /reports/txns
+            where.append('day >= CURRENT_DATE - INTERVAL 30 DAY')
+        _pair_filters(where, params)
+    where_sql = (' WHERE ' + ' AND '.join(where)) if where else ''
+    return int(db.session.execute(db.text(f'SELECT {count} FROM {table}{where_sql}'), params).scalar())
+
+
+FORMATS = {
+    'csv': ('.csv', 'text/csv; charset=utf-8'),
+    'xlsx': ('.xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+}
+
+
+def _rows(sql: str, params: dict):
+    """(column names, row iterator) read through a server-side cursor"""
+    conn = db.session.connection().execution_options(stream_results=True, yield_per=YIELD_PER)
+    result = conn.execute(db.text(sql), params)
+    return list(result.keys()), iter(result)
+
+
+def _csv_chunks(columns, rows, gz: bool):
+    """Encoded CSV (UTF-8 with BOM so Excel detects the encoding), CSV_FLUSH_ROWS rows per chunk"""
+    packer = zlib.compressobj(6, zlib.DEFLATED, 31) if gz else None  # wbits 31: gzip container
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+
+    def drain():
+        data = buf.getvalue().encode('utf-8')
+        buf.seek(0)
+        buf.truncate()
+        return packer.compress(data) if packer else data
+
+    buf.write('\ufeff')
+    writer.writerow(columns)
+    for n, row in enumerate(rows, 1):
+        writer.writerow(row)
+        if n % CSV_FLUSH_ROWS == 0:
+            chunk = drain()
+            if chunk:
+                yield chunk
+    yield drain() + (packer.flush() if packer else b'')
+
+
+def _write_xlsx(columns, rows, path: str) -> int:
+    """Write-only workbook: rows are serialized as they are appended, not kept in memory"""
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet()
+    ws.append(columns)
+    n = 0
+    for row in rows:
+        ws.append(list(row))
+        n += 1
+    wb.save(path)
+    return n
+
+
+class _Counter:
+    """Row iterator that counts what it has handed out"""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.n = 0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        row = next(self.rows)
+        self.n += 1
+        return row
+
+
+def _write_file(fmt: str, gz: bool, columns, rows, path: str) -> int:
+    if fmt == 'xlsx':
+        return _write_xlsx(columns, rows, path)
+    counted = _Counter(rows)
+    with open(path, 'wb') as f:
+        for chunk in _csv_chunks(columns, counted, gz):
+            f.write(chunk)
+    return counted.n
+
+
+def _file_name(report: str, fmt: str, gz: bool) -> str:
+    ext = FORMATS[fmt][0] + ('.gz' if gz else '')
+    return f"{report}_{datetime.datetime.now():%Y%m%d_%H%M%S}{ext}"
+
+
+def _mimetype(fmt: str, gz: bool) -> str:
+    return 'application/gzip' if gz else FORMATS[fmt][1]
+
+
+def _export_dir() -> str:
+    path = current_app.config['EXPORT_DIR']
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+# --- background jobs -------------------------------------------------------
+
+def _job_path(job_id: str) -> str:
+    return os.path.join(_export_dir(), f'{job_id}.json')
+
+
+def _save_job(job: dict):
+    """Replace the job file atomically so readers never see a partial write"""
+    fd, tmp = tempfile.mkstemp(dir=_export_dir(), suffix='.tmp')
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        json.dump(job, f)
+    os.replace(tmp, _job_path(job['id']))
+
+
+def _load_job(job_id: str):
+    if not _JOB_ID_RE.match(job_id):
+        return None
+    try:
+        with open(_job_path(job_id), encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _sweep(max_age_hours: float):
+    """Delete export files and job records older than EXPORT_MAX_AGE_HOURS"""
+    cutoff = time.time() - max_age_hours * 3600
+    with os.scandir(_export_dir()) as entries:
+        for entry in entries:
+            if entry.is_file() and entry.stat().st_mtime < cutoff:
+                try:
+                    os.remove(entry.path)
+                except OSError:
+                    pass
+
+
+def _run_job(app, job: dict, sql: str, params: dict):
+    with app.app_context():
+        path = os.path.join(_export_dir(), job['file'])
+        try:
+            job['status'] = 'running'
+            _save_job(job)
+            columns, rows = _rows(sql, params)
+            job['rows'] = _write_file(job['format'], job['gzip'], columns, rows, path)
+            job['status'] = 'done'
+        except Exception as e:
+            current_app.logger.exception('export job %s failed', job['id'])
+            job['status'] = 'failed'
+            job['error'] = str(e)
+            if os.path.exists(path):
+                os.remove(path)
+        job['finished_at'] = datetime.datetime.now().isoformat(timespec='seconds')
+        _save_job(job)
+
+
+def _submit(job: dict, sql: str, params: dict):
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=current_app.config['EXPORT_JOB_WORKERS'],
+                                       thread_name_prefix='export-job')
+    _sweep(current_app.config['EXPORT_MAX_AGE_HOURS'])
+    _save_job(job)
+    _executor.submit(_run_job, current_app._get_current_object(), job, sql, params)
+
+
+def _job_view(job: dict) -> dict:
+    view = {k: job.get(k) for k in ('id', 'report', 'format', 'status', 'rows', 'error',
+                                    'created_at', 'finished_at')}
+    view['status_url'] = url_for('exports.job_status', job_id=job['id'])
+    if job['status'] == 'done':
+        view['download_url'] = url_for('exports.job_download', job_id=job['id'])
+    return view
+
+
+def _owned_job(job_id: str):
+    job = _load_job(job_id)
+    if job is None or (job['user_id'] != str(get_jwt_identity()) and not require_manager()):
+        return None
+    return job
+
+
+# --- routes ----------------------------------------------------------------
+
+@bp.get('/<report>')
+@jwt_required()
+def export_report(report: str):
+    """
+    Export a report as CSV (default) or XLSX with the report's own filters:
+    - current-stock, low-stock: warehouse_id, product_id
+    - monthly-in-out, weekly-in-out, daily-in-out: from, to
+    - txns: from, to, warehouse_id, product_id, archived
+    gzip=1 compresses CSV. Exports estimated above EXPORT_ASYNC_ROWS rows, or with async=1, run as a job.
+    """
+    if report not in REPORTS:
+        return jsonify(message=f"unknown report, expected one of: {', '.join(REPORTS)}"), 404
+    fmt = request.args.get('format', 'csv')
+    if fmt not in FORMATS:
+        return jsonify(message='format must be csv or xlsx'), 400
+    gz = fmt == 'csv' and request.args.get('gzip') == '1'
+    try:
+        sql, params = REPORTS[report]()
+    except (ValueError, binascii.Error):
+        return jsonify(message='invalid date or cursor'), 400
+
+    offload = (request.args.get('async') == '1'
+               or _estimate_rows(report) > current_app.config['EXPORT_ASYNC_ROWS'])
+
+    name = _file_name(report, fmt, gz)
+    if offload:
+        job_id = uuid.uuid4().hex
+        job = {
+            'id': job_id,
+            'user_id': str(get_jwt_identity()),
+            'report': report,
+            'format': fmt,
+            'gzip': gz,
+            'file': job_id + name[name.index('.'):],
+            'download_name': name,
+            'status': 'queued',
+            'rows': None,
+            'error': None,
+            'created_at': datetime.datetime.now().isoformat(timespec='seconds'),
+            'finished_at': None,
+        }
+        _submit(job, sql, params)
+        return jsonify(_job_view(job)), 202
+
+    if fmt == 'xlsx':
+        # openpyxl needs a file to save to; below the threshold the workbook is small
+        fd, path = tempfile.mkstemp(dir=_export_dir(), suffix='.xlsx')
+        os.close(fd)
+        try:
+            columns, rows = _rows(sql, params)
+            _write_xlsx(columns, rows, path)
+        except Exception:
+            os.remove(path)
+            raise
+        resp = send_file(path, mimetype=_mimetype(fmt, gz), as_attachment=True, download_name=name)
+        resp.call_on_close(lambda: os.remove(path))
+        return resp
+
+    def generate():
+        columns, rows = _rows(sql, params)
+        yield from _csv_chunks(columns, rows, gz)
+    return Response(stream_with_context(generate()), mimetype=_mimetype(fmt, gz),
+                    headers={'Content-Disposition': f'attachment; filename="{name}"'})
+
+
+@bp.get('/jobs/<job_id>')
+@jwt_required()
+def job_status(job_id: str):
+    job = _owned_job(job_id)
+    if job is None:
+        return jsonify(message='not found'), 404
+    return jsonify(_job_view(job))
+
+
+@bp.get('/jobs/<job_id>/download')
+@jwt_required()
+def job_download(job_id: str):
+    job = _owned_job(job_id)
+    if job is None:
+        return jsonify(message='not found'), 404
+    if job['status'] != 'done':
+        return jsonify(_job_view(job)), 409
+    path = os.path.join(_export_dir(), job['file'])
+    if not os.path.exists(path):
+        return jsonify(message='export expired'), 410
+    return send_file(path, mimetype=_mimetype(job['format'], job['gzip']), as_attachment=True,
+                     download_name=job['download_name'])
@@ -2,26 +2,19 @@
 Routes for managing Product-Supplier-Warehouse relationships
 """
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask_jwt_extended import jwt_required
 from extensions import db
-from models import ProductSupplier, Product, Supplier, Warehouse, User, Role
-from sqlalchemy.exc import IntegrityError
+from models import ProductSupplier, Product, Supplier, Warehouse
+from authz import require_manager
+from cache import relationships_cache
+from conditional import conditional
+from sqlalchemy import select, text
+from sqlalchemy.orm import joinedload
 from decimal import Decimal
 
 bp = Blueprint('product_supplier', __name__)
 
 
-def require_manager() -> bool:
-    ident = get_jwt_identity()
-    if not ident:
-        return False
-    u = User.query.get(int(ident))
-    if not u:
-        return False
-    r = Role.query.get(u.role_id)
-    return bool(r and r.role_name == 'manager')
-
-
 @bp.post('/supplier/<int:supplier_id>/products')
 @jwt_required()
 def add_products_to_supplier(supplier_id: int):
@@ -39,9 +32,9 @@ def add_products_to_supplier(supplier_id: int):
     if not products:
         return jsonify(message='Cần ít nhất 1 sản phẩm'), 400
     
-    added = []
+    # Normalize ids first so every lookup below is one IN query
+    parsed = []
     errors = []
-    
     for item in products:
         product_id = item.get('product_id')
         warehouse_id = item.get('warehouse_id')
@@ -49,62 +42,68 @@ def add_products_to_supplier(supplier_id: int):
         if not product_id:
             errors.append({'item': item, 'error': 'product_id bắt buộc'})
             continue
-        
-        product = Product.query.get(product_id)
-        if not product:
-            errors.append({'item': item, 'error': f'Sản phẩm {product_id} không tồn tại'})
+        try:
+            pid = int(product_id)
+            wid = int(warehouse_id) if warehouse_id else None
+        except (TypeError, ValueError):
+            errors.append({'item': item, 'error': 'product_id/warehouse_id không hợp lệ'})
             continue
-        
-        warehouse = None
-        if warehouse_id:
-            warehouse = Warehouse.query.get(warehouse_id)
-            if not warehouse:
-                errors.append({'item': item, 'error': f'Kho {warehouse_id} không tồn tại'})
-                continue
-        
-        # Check if relationship already exists
-        existing = ProductSupplier.query.filter_by(
-            product_id=product_id,
-            supplier_id=supplier_id,
-            warehouse_id=warehouse_id
-        ).first()
-        
-        if existing:
-            # Update existing relationship
-            existing.delivery_date = item.get('delivery_date')
-            existing.status = item.get('status', 'active')
-            added.append({
-                'product_id': product_id,
-                'product_name': product.product_name,
-                'warehouse_id': warehouse_id,
-                'warehouse_name': warehouse.warehouse_name if warehouse else None,
-                'action': 'updated'
-            })
-        else:
-            # Create new relationship
-            try:
-                ps = ProductSupplier(
-                    product_id=product_id,
-                    supplier_id=supplier_id,
-                    warehouse_id=warehouse_id,
-                    delivery_date=item.get('delivery_date'),
-                    status=item.get('status', 'active')
-                )
-                db.session.add(ps)
-                added.append({
-                    'product_id': product_id,
-                    'product_name': product.product_name,
-                    'warehouse_id': warehouse_id,
-                    'warehouse_name': warehouse.warehouse_name if warehouse else None,
-                    'action': 'created'
-                })
-            except IntegrityError as e:
-                db.session.rollback()
-                errors.append({'item': item, 'error': str(e)})
-                continue
+        parsed.append((item, pid, wid))
+    
+    product_ids = {pid for _, pid, _ in parsed}
+    warehouse_ids = {wid for _, _, wid in parsed if wid}
+    product_names = dict(db.session.execute(
+        select(Product.product_id, Product.product_name).where(Product.product_id.in_(product_ids))
+    ).all()) if product_ids else {}
+    warehouse_names = dict(db.session.execute(
+        select(Warehouse.warehouse_id, Warehouse.warehouse_name).where(Warehouse.warehouse_id.in_(warehouse_ids))
+    ).all()) if warehouse_ids else {}
+    # Existing relationships for this supplier (primary key is product_id, supplier_id)
+    existing = set(db.session.execute(
+        select(ProductSupplier.product_id).where(
+            ProductSupplier.supplier_id == supplier_id,
+            ProductSupplier.product_id.in_(product_ids)
+        )
+    ).scalars()) if product_ids else set()
+    
+    added = []
+    rows = []
+    for item, pid, wid in parsed:
+        if pid not in product_names:
+            errors.append({'item': item, 'error': f'Sản phẩm {item.get("product_id")} không tồn tại'})
+            continue
+        if wid and wid not in warehouse_names:
+            errors.append({'item': item, 'error': f'Kho {item.get("warehouse_id")} không tồn tại'})
+            continue
+        added.append({
+            'product_id': item.get('product_id'),
+            'product_name': product_names[pid],
+            'warehouse_id': item.get('warehouse_id'),
+            'warehouse_name': warehouse_names.get(wid),
+            'action': 'updated' if pid in existing else 'created'
+        })
+        existing.add(pid)  # a repeated product later in the payload updates the same row
+        rows.append({
+            'product_id': pid,
+            'supplier_id': supplier_id,
+            'warehouse_id': wid,
+            'delivery_date': item.get('delivery_date'),
+            'status': item.get('status', 'active'),
+        })
     
     try:
+        if rows:
+            # executemany: PyMySQL sends this as one multi-row INSERT ... ON DUPLICATE KEY UPDATE
+            db.session.execute(text("""
+                INSERT INTO product_supplier (product_id, supplier_id, warehouse_id, delivery_date, status)
+                VALUES (:product_id, :supplier_id, :warehouse_id, :delivery_date, :status)
+                ON DUPLICATE KEY UPDATE
+                  warehouse_id = VALUES(warehouse_id),
+                  delivery_date = VALUES(delivery_date),
+                  status = VALUES(status)
+            """), rows)
         db.session.commit()
+        relationships_cache.invalidate()
         return jsonify(
             message=f'Đã thêm {len(added)} quan hệ',
             added=added,
@@ -117,13 +116,17 @@ def add_products_to_supplier(supplier_id: int):
 
 @bp.get('/supplier/<int:supplier_id>/products')
 @jwt_required()
+@conditional('product_supplier', 'products', 'suppliers', 'warehouses')
 def get_supplier_products(supplier_id: int):
     """Get all products associated with a supplier"""
     supplier = Supplier.query.get(supplier_id)
     if not supplier:
         return jsonify(message='Nhà cung cấp không tồn tại'), 404
     
-    relationships = ProductSupplier.query.filter_by(
+    relationships = ProductSupplier.query.options(
+        joinedload(ProductSupplier.product),
+        joinedload(ProductSupplier.warehouse)
+    ).filter_by(
         supplier_id=supplier_id
     ).all()
     
@@ -163,6 +166,7 @@ def remove_product_from_supplier(supplier_id: int, product_id: int):
     
     db.session.delete(ps)
     db.session.commit()
+    relationships_cache.invalidate()
     
     return jsonify(message='Đã xóa quan hệ')
 
@@ -192,5 +196,6 @@ def update_supplier_product(supplier_id: int, product_id: int):
         ps.status = data['status']
     
     db.session.commit()
+    relationships_cache.invalidate()
     
     return jsonify(message='Đã cập nhật quan hệ')
@@ -1,24 +1,19 @@
 from flask import Blueprint, request, jsonify, send_from_directory
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask_jwt_extended import jwt_required
 from extensions import db
-from models import Product, Role, User
+from models import Product
+from authz import require_manager
+from product_search import product_index, written_version
+from cache import catalog_cache
+from conditional import conditional
+from sqlalchemy import or_
 from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload
 import os
 
 bp = Blueprint('products', __name__)
 
 
-def require_manager() -> bool:
-    ident = get_jwt_identity()
-    if not ident:
-        return False
-    u = User.query.get(int(ident))
-    if not u:
-        return False
-    r = Role.query.get(u.role_id)
-    return bool(r and r.role_name == 'manager')
-
-
 def _product_to_dict(p: Product):
     # image served via API to avoid DB schema changes
     img_url = f"/api/products/{p.product_id}/image"
@@ -37,11 +32,54 @@ def _product_to_dict(p: Product):
     }
 
 
+PRODUCTS_PAGE_MAX = 1000
+
+
+def _like_escape(s: str) -> str:
+    return s.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
 @bp.get('/')
 @jwt_required()
+@conditional('products', 'warehouses')
 def list_products():
-    q = Product.query.order_by(Product.product_id.desc()).all()
-    return jsonify(items=[_product_to_dict(p) for p in q])
+    """
+    List products, newest first. Optional filters:
+    - category, status, default_warehouse_id
+    - q: SKU prefix or name substring
+    - limit (max 1000) + cursor: keyset pages on product_id; pass next_cursor back as cursor
+    Without limit the whole (filtered) list is returned.
+    """
+    q = Product.query.options(joinedload(Product.default_warehouse))
+    category = request.args.get('category')
+    status = request.args.get('status')
+    wid = request.args.get('default_warehouse_id', type=int)
+    search = (request.args.get('q') or '').strip()
+    if category:
+        q = q.filter(Product.category == category)
+    if status:
+        q = q.filter(Product.status == status)
+    if wid:
+        q = q.filter(Product.default_warehouse_id == wid)
+    if search:
+        esc = _like_escape(search)
+        q = q.filter(or_(
+            Product.sku.like(f'{esc}%', escape='\\'),
+            Product.product_name.like(f'%{esc}%', escape='\\'),
+        ))
+    q = q.order_by(Product.product_id.desc())
+
+    limit = request.args.get('limit', type=int)
+    if not limit:
+        return jsonify(items=[_product_to_dict(p) for p in q.all()])
+
+    limit = min(max(limit, 1), PRODUCTS_PAGE_MAX)
+    cursor = request.args.get('cursor', type=int)
+    if cursor:
+        q = q.filter(Product.product_id < cursor)
+    rows = q.limit(limit + 1).all()
+    next_cursor = rows[limit - 1].product_id if len(rows) > limit else None
+    return jsonify(items=[_product_to_dict(p) for p in rows[:limit]], next_cursor=next_cursor)
 
 
 @bp.post('/')
@@ -67,7 +105,11 @@ def create_product():
             default_warehouse_id=data.get('default_warehouse_id'),
         )
         db.session.add(p)
+        db.session.flush()
+        version = written_version()
         db.session.commit()
+        catalog_cache.bump('products')
+        product_index.upsert(p.product_id, p.sku, p.product_name, p.unit, version)
         return jsonify(item=_product_to_dict(p)), 201
     except IntegrityError:
         db.session.rollback()
@@ -99,7 +141,11 @@ def update_product(pid):
                 setattr(p, backend_field, val if val else None)
             else:
                 setattr(p, backend_field, val)
+    db.session.flush()
+    version = written_version()
     db.session.commit()
+    catalog_cache.bump('products')
+    product_index.upsert(p.product_id, p.sku, p.product_name, p.unit, version)
     return jsonify(item=_product_to_dict(p))
 
 
@@ -112,7 +158,11 @@ def delete_product(pid):
     if not p:
         return jsonify(message='not found'), 404
     db.session.delete(p)
+    db.session.flush()
+    version = written_version()
     db.session.commit()
+    catalog_cache.bump('products')
+    product_index.remove(pid, version)
     return jsonify(message='deleted')
 
 
@@ -6,12 +6,15 @@ from flask_jwt_extended import jwt_required
 from extensions import db
 from models import Product, Supplier, Warehouse, User, ProductSupplier
 from sqlalchemy.orm import joinedload
+from cache import relationships_cache
+from conditional import conditional, table_version
 
 bp = Blueprint('relationships', __name__)
 
 
 @bp.get('/product-supplier-warehouse')
 @jwt_required()
+@conditional('product_supplier', 'products', 'suppliers', 'warehouses')
 def product_supplier_warehouse():
     """Get all product-supplier-warehouse relationships"""
     relationships = db.session.query(ProductSupplier).options(
@@ -39,6 +42,7 @@ def product_supplier_warehouse():
 
 @bp.get('/warehouse-managers')
 @jwt_required()
+@conditional('warehouses', 'users')
 def warehouse_managers():
     """Get warehouse-manager relationships"""
     warehouses = Warehouse.query.options(
@@ -64,34 +68,42 @@ def warehouse_managers():
 
 @bp.get('/supplier-warehouses')
 @jwt_required()
+@conditional('product_supplier', 'suppliers', 'warehouses')
 def supplier_warehouses():
     """Get supplier-warehouse relationships (through product_supplier)"""
-    # Get unique supplier-warehouse pairs from product_supplier
-    relationships = db.session.query(
+    # Keyed on the table versions so a cached body always matches the ETag
+    key = ('supplier-warehouses',) + tuple(table_version(t) for t in ('product_supplier', 'suppliers', 'warehouses'))
+    return jsonify(items=relationships_cache.get_or_set(key, _supplier_warehouse_items))
+
+
+def _supplier_warehouse_items():
+    # One grouped query joined to suppliers/warehouses for names
+    rows = db.session.query(
         ProductSupplier.supplier_id,
+        Supplier.supplier_name,
         ProductSupplier.warehouse_id,
+        Warehouse.warehouse_code,
+        Warehouse.warehouse_name,
         db.func.count(ProductSupplier.product_id).label('product_count')
+    ).join(
+        Supplier, Supplier.supplier_id == ProductSupplier.supplier_id
+    ).join(
+        Warehouse, Warehouse.warehouse_id == ProductSupplier.warehouse_id
     ).filter(
-        ProductSupplier.status == 'active',
-        ProductSupplier.warehouse_id.isnot(None)
+        ProductSupplier.status == 'active'
     ).group_by(
         ProductSupplier.supplier_id,
-        ProductSupplier.warehouse_id
+        Supplier.supplier_name,
+        ProductSupplier.warehouse_id,
+        Warehouse.warehouse_code,
+        Warehouse.warehouse_name
     ).all()
     
-    items = []
-    for rel in relationships:
-        supplier = Supplier.query.get(rel.supplier_id)
-        warehouse = Warehouse.query.get(rel.warehouse_id)
-        if supplier and warehouse:
-            items.append({
-                'supplier_id': rel.supplier_id,
-                'supplier_name': supplier.supplier_name,
-                'warehouse_id': rel.warehouse_id,
-                'warehouse_code': warehouse.warehouse_code,
-                'warehouse_name': warehouse.warehouse_name,
-                'product_count': rel.product_count,
-            })
-    
-    return jsonify(items=items)
-
+    return [{
+        'supplier_id': r.supplier_id,
+        'supplier_name': r.supplier_name,
+        'warehouse_id': r.warehouse_id,
+        'warehouse_code': r.warehouse_code,
+        'warehouse_name': r.warehouse_name,
+        'product_count': r.product_count,
+    } for r in rows]
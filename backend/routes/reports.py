@@ -1,14 +1,18 @@
-from flask import Blueprint, request, jsonify
+import base64
+import binascii
+import datetime
+from flask import Blueprint, Response, current_app, request, jsonify, stream_with_context
 from flask_jwt_extended import jwt_required
 from extensions import db
+from models import Product, Warehouse
+from movement_window import movement_window, MAX_WINDOW_DAYS
+from conditional import conditional
 
 bp = Blueprint('reports', __name__)
 
 
-@bp.get('/current-stock')
-@jwt_required()
-def current_stock():
-    rows = db.session.execute(db.text('SELECT * FROM v_current_stock')).mappings().all()
+def _stock_items(view: str):
+    rows = db.session.execute(db.text(f'SELECT * FROM {view}')).mappings().all()
     items = []
     for r in rows:
         d = dict(r)
@@ -18,140 +22,264 @@ def current_stock():
         if 'reorder_level' not in d:
             d['reorder_level'] = d.get('min_stock_level')
         items.append(d)
-    return jsonify(items=items)
+    return items
+
+
+def _is_low(item: dict) -> bool:
+    # Same predicate as v_low_stock
+    return item['stock_quantity'] <= item['min_stock_level']
+
+
+@bp.get('/current-stock')
+@jwt_required()
+@conditional('ledger', 'products', 'warehouses')
+def current_stock():
+    return jsonify(items=_stock_items('v_current_stock'))
 
 
 @bp.get('/low-stock')
 @jwt_required()
+@conditional('ledger', 'products', 'warehouses')
 def low_stock():
-    rows = db.session.execute(db.text('SELECT * FROM v_low_stock')).mappings().all()
+    return jsonify(items=_stock_items('v_low_stock'))
+
+
+def _parse_date(value: str):
+    return datetime.datetime.strptime(value, '%Y-%m-%d').date()
+
+
+@bp.get('/stock-as-of')
+@jwt_required()
+@conditional('ledger', 'ledger_archive', 'products', 'warehouses')
+def stock_as_of():
+    """
+    Closing stock at the end of `date` (YYYY-MM-DD), optionally for one warehouse_id / product_id.
+    Latest stock_checkpoints row <= date plus the daily movements (txn_daily_rollup) after it,
+    so the work is bounded by the checkpoint interval, not by how old the date is.
+    """
+    try:
+        as_of = _parse_date(request.args.get('date', ''))
+    except ValueError:
+        return jsonify(message='date (YYYY-MM-DD) is required'), 400
+    wid = request.args.get('warehouse_id', type=int)
+    pid = request.args.get('product_id', type=int)
+
+    checkpoint = db.session.execute(db.text(
+        'SELECT MAX(checkpoint_date) FROM stock_checkpoints WHERE checkpoint_date <= :as_of'
+    ), {'as_of': as_of}).scalar()
+    params = {'cp': checkpoint or datetime.date.min, 'as_of': as_of}
+    filters = ''
+    if wid:
+        filters += ' AND warehouse_id = :wid'
+        params['wid'] = wid
+    if pid:
+        filters += ' AND product_id = :pid'
+        params['pid'] = pid
+    rows = db.session.execute(db.text(f"""
+        SELECT
+          p.product_id, p.sku, p.product_name,
+          w.warehouse_id, w.warehouse_code, w.warehouse_name,
+          SUM(x.qty) AS stock_quantity,
+          p.unit, p.min_stock_level
+        FROM (
+          SELECT product_id, warehouse_id, qty_on_hand AS qty
+          FROM stock_checkpoints
+          WHERE checkpoint_date = :cp{filters}
+          UNION ALL
+          SELECT product_id, warehouse_id, qty_in - qty_out + qty_adjust
+          FROM txn_daily_rollup
+          WHERE day > :cp AND day <= :as_of{filters}
+        ) x
+        JOIN products p ON p.product_id = x.product_id
+        JOIN warehouses w ON w.warehouse_id = x.warehouse_id
+        GROUP BY p.product_id, w.warehouse_id
+        ORDER BY p.sku, w.warehouse_code
+    """), params).mappings().all()
     items = []
     for r in rows:
         d = dict(r)
-        if 'qty_on_hand' not in d:
-            d['qty_on_hand'] = d.get('stock_quantity')
-        if 'reorder_level' not in d:
-            d['reorder_level'] = d.get('min_stock_level')
+        d['stock_quantity'] = int(d['stock_quantity'])
+        d['qty_on_hand'] = d['stock_quantity']
+        d['reorder_level'] = d['min_stock_level']
         items.append(d)
-    return jsonify(items=items)
+    return jsonify(as_of=as_of.isoformat(),
+                   checkpoint_date=checkpoint.isoformat() if checkpoint else None,
+                   replayed_days=(as_of - checkpoint).days if checkpoint else None,
+                   items=items)
 
 
-@bp.get('/monthly-in-out')
-@jwt_required()
-def monthly_in_out():
+def _rollup_in_out_sql(bucket_sql: str, label: str):
+    """Aggregate txn_daily_rollup into buckets over the inclusive day range [:from, :to]"""
+    return f"""
+        SELECT
+          {bucket_sql} AS {label},
+          product_id,
+          warehouse_id,
+          SUM(qty_in) AS qty_in,
+          SUM(qty_out) AS qty_out,
+          SUM(txn_count) AS txn_count,
+          SUM(txn_in_count) AS txn_in_count,
+          SUM(txn_out_count) AS txn_out_count
+        FROM txn_daily_rollup
+        WHERE day >= :from AND day <= :to
+        GROUP BY {label}, product_id, warehouse_id
+        ORDER BY {label} DESC
+        """
+
+
+def _rollup_in_out(bucket_sql: str, label: str, date_from, date_to):
+    rows = db.session.execute(db.text(_rollup_in_out_sql(bucket_sql, label)),
+                              {'from': date_from, 'to': date_to}).mappings().all()
+    return [dict(r) for r in rows]
+
+
+def _day_range(default_from):
+    """Read from/to (YYYY-MM-DD, inclusive) from the query string; open ends fall back to defaults"""
     date_from = request.args.get('from')
     date_to = request.args.get('to')
+    if not date_from and not date_to:
+        return default_from, datetime.date.today()
+    return (_parse_date(date_from) if date_from else datetime.date.min,
+            _parse_date(date_to) if date_to else datetime.date.max)
 
-    where = []
-    params = {}
-    if date_from:
-        where.append("DATE(created_at) >= :from")
-        params['from'] = date_from
-    if date_to:
-        where.append("DATE(created_at) <= :to")
-        params['to'] = date_to
 
+# report -> (bucket expression, label, default first day given today)
+IN_OUT_REPORTS = {
     # Default to current month if no date filters
-    if not date_from and not date_to:
-        import datetime
-        now = datetime.datetime.now()
-        current_month_start = now.replace(day=1).strftime('%Y-%m-%d')
-        next_month = now.replace(day=28) + datetime.timedelta(days=4)
-        current_month_end = (next_month - datetime.timedelta(days=next_month.day)).strftime('%Y-%m-%d')
-        where.append("DATE(created_at) >= :from")
-        where.append("DATE(created_at) <= :to")
-        params['from'] = current_month_start
-        params['to'] = current_month_end
+    'monthly-in-out': ("DATE_FORMAT(day, '%Y-%m')", 'ym', lambda today: today.replace(day=1)),
+    # Aggregate by ISO week; label as YYYY-WW (ISO year-week). Default: last 12 weeks
+    'weekly-in-out': ("DATE_FORMAT(day, '%x-%v')", 'yw',
+                      lambda today: today - datetime.timedelta(days=today.weekday(), weeks=11)),
+    # Default: last 30 days
+    'daily-in-out': ('day', 'yd', lambda today: today - datetime.timedelta(days=29)),
+}
 
-    where_sql = (" WHERE " + " AND ".join(where)) if where else ""
-    sql = db.text(
-        f"""
-        SELECT
-          DATE_FORMAT(created_at, '%Y-%m') AS ym,
-          product_id,
-          warehouse_id,
-          SUM(CASE WHEN transaction_type = 'IN' THEN quantity ELSE 0 END) AS qty_in,
-          SUM(CASE WHEN transaction_type = 'OUT' THEN quantity ELSE 0 END) AS qty_out,
-          COUNT(*) AS txn_count,
-          SUM(CASE WHEN transaction_type = 'IN' THEN 1 ELSE 0 END) AS txn_in_count,
-          SUM(CASE WHEN transaction_type = 'OUT' THEN 1 ELSE 0 END) AS txn_out_count
-        FROM inventory_transactions
-        {where_sql}
-        GROUP BY ym, product_id, warehouse_id
-        ORDER BY ym DESC
-        """
-    )
-    rows = db.session.execute(sql, params)
-    return jsonify(items=[dict(r) for r in rows.mappings().all()])
+
+def in_out_query(report: str):
+    """(sql, params) of an IN_OUT_REPORTS report for the request's from/to; ValueError on a bad date"""
+    bucket_sql, label, default_from = IN_OUT_REPORTS[report]
+    date_from, date_to = _day_range(default_from(datetime.date.today()))
+    return _rollup_in_out_sql(bucket_sql, label), {'from': date_from, 'to': date_to}
+
+
+def _in_out_response(report: str):
+    try:
+        sql, params = in_out_query(report)
+    except ValueError:
+        return jsonify(message='invalid date'), 400
+    return jsonify(items=[dict(r) for r in db.session.execute(db.text(sql), params).mappings()])
+
+
+@bp.get('/monthly-in-out')
+@jwt_required()
+@conditional('ledger', 'today')
+def monthly_in_out():
+    return _in_out_response('monthly-in-out')
 
 
 @bp.get('/top-moving')
 @jwt_required()
+@conditional('ledger', 'products', 'today')
 def top_moving():
-    # Calculate top moving products from transactions in last 30 days
-    sql = db.text("""
-        SELECT
-          p.product_id,
-          p.sku,
-          p.product_name AS name,
-          SUM(ABS(CASE WHEN it.transaction_type IN ('IN','OUT','ADJUST') THEN it.quantity ELSE 0 END)) AS total_movement_30d
-        FROM inventory_transactions it
-        JOIN products p ON p.product_id = it.product_id
-        WHERE it.created_at >= (CURRENT_DATE - INTERVAL 30 DAY)
-        GROUP BY p.product_id, p.sku, p.product_name
-        ORDER BY total_movement_30d DESC
-        LIMIT 10
-    """)
-    rows = db.session.execute(sql).mappings().all()
-    return jsonify(items=[dict(r) for r in rows])
+    """
+    Top moving products by SUM(|quantity|) over the last `days` days (default 30, max 90).
+    Optional: limit (default 10, max 100), warehouse_id.
+    Served from the in-process rolling window in movement_window.py.
+    """
+    n = request.args.get('limit', 10, type=int)
+    days = request.args.get('days', 30, type=int)
+    wid = request.args.get('warehouse_id', type=int)
+    if not 1 <= n <= 100 or not 1 <= days <= MAX_WINDOW_DAYS:
+        return jsonify(message=f'limit must be 1..100 and days 1..{MAX_WINDOW_DAYS}'), 400
+    if wid is not None and db.session.get(Warehouse, wid) is None:
+        return jsonify(message='unknown warehouse_id'), 400
+    return jsonify(items=_top_moving_items(n, days, wid))
 
 
-@bp.get('/weekly-in-out')
-@jwt_required()
-def weekly_in_out():
-    # Aggregate by ISO week using created_at; label as YYYY-WW (ISO year-week)
-    sql = db.text(
-        """
-        SELECT
-          DATE_FORMAT(created_at, '%x-%v') AS yw,
-          product_id,
-          warehouse_id,
-          SUM(CASE WHEN transaction_type = 'IN' THEN quantity ELSE 0 END) AS qty_in,
-          SUM(CASE WHEN transaction_type = 'OUT' THEN quantity ELSE 0 END) AS qty_out,
-          COUNT(*) AS txn_count
-        FROM inventory_transactions
-        GROUP BY yw, product_id, warehouse_id
-        ORDER BY yw DESC
-        """
-    )
-    rows = db.session.execute(sql).mappings().all()
-    return jsonify(items=[dict(r) for r in rows])
+def _top_moving_items(n: int, days: int, wid=None):
+    top = movement_window.top(n, days, wid)
+    ids = [pid for _, pid in top]
+    products = {p.product_id: p for p in Product.query.filter(Product.product_id.in_(ids))} if ids else {}
+    items = []
+    for moved, pid in top:
+        p = products.get(pid)
+        if not p:
+            continue
+        items.append({
+            'product_id': pid,
+            'sku': p.sku,
+            'name': p.product_name,
+            f'total_movement_{days}d': moved,
+        })
+    return items
 
 
-@bp.get('/txns')
+@bp.get('/dashboard')
 @jwt_required()
-def txns_detail():
+@conditional('ledger', 'products', 'warehouses', 'today')
+def dashboard():
     """
-    Return detailed inventory transactions with optional filters:
-    - from: YYYY-MM-DD (inclusive)
-    - to: YYYY-MM-DD (inclusive)
-    - warehouse_id: int
-    - product_id: int
-    Defaults to last 30 days if no date filters provided.
+    Everything loadDashboard needs in one payload: the stock snapshot is read once
+    and low-stock is derived from it in memory.
     """
+    stock = _stock_items('v_current_stock')
+    today = datetime.date.today()
+    return jsonify(
+        product_count=db.session.execute(db.text('SELECT COUNT(*) FROM products')).scalar(),
+        current_stock=stock,
+        low_stock=[d for d in stock if _is_low(d)],
+        monthly=_rollup_in_out("DATE_FORMAT(day, '%Y-%m')", 'ym', today.replace(day=1), today),
+        top_moving=_top_moving_items(10, 30),
+    )
+
+
+@bp.get('/weekly-in-out')
+@jwt_required()
+@conditional('ledger', 'today')
+def weekly_in_out():
+    return _in_out_response('weekly-in-out')
+
+
+TXNS_PAGE_DEFAULT = 500
+TXNS_PAGE_MAX = 5000
+
+
+def _date_range(col: str, date_from, date_to, where: list, params: dict):
+    """Add a sargable half-open [from, to + 1 day) filter on a timestamp column"""
+    if date_from:
+        where.append(f"{col} >= :from")
+        params['from'] = _parse_date(date_from)
+    if date_to:
+        where.append(f"{col} < :to_excl")
+        params['to_excl'] = _parse_date(date_to) + datetime.timedelta(days=1)
+
+
+def _encode_cursor(created_at, txn_id) -> str:
+    raw = f"{created_at.isoformat()}|{txn_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def _decode_cursor(cursor: str):
+    raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+    ts, txn_id = raw.split('|', 1)
+    return datetime.datetime.fromisoformat(ts), int(txn_id)
+
+
+def txns_query():
+    """(sql, params) of /txns for the request's filters; ValueError/binascii.Error on a bad date or cursor"""
     date_from = request.args.get('from')
     date_to = request.args.get('to')
     wid = request.args.get('warehouse_id', type=int)
     pid = request.args.get('product_id', type=int)
+    cursor = request.args.get('cursor')
+    archived = request.args.get('archived') == '1'
 
     where = []
     params = {}
-    if date_from:
-        where.append("DATE(t.created_at) >= :from")
-        params['from'] = date_from
-    if date_to:
-        where.append("DATE(t.created_at) <= :to")
-        params['to'] = date_to
+    _date_range('t.created_at', date_from, date_to, where, params)
+    if cursor:
+        params['c_at'], params['c_id'] = _decode_cursor(cursor)
+        where.append("(t.created_at < :c_at OR (t.created_at = :c_at AND t.transaction_id < :c_id))")
     if wid:
         where.append("t.warehouse_id = :wid")
         params['wid'] = wid
@@ -160,12 +288,12 @@ def txns_detail():
         params['pid'] = pid
 
     # Default: last 30 days if no date filter
-    if not date_from and not date_to:
+    if not date_from and not date_to and not archived:
         where.append("t.created_at >= DATE_SUB(CURRENT_TIMESTAMP, INTERVAL 30 DAY)")
 
     where_sql = (" WHERE " + " AND ".join(where)) if where else ""
-    sql = db.text(
-        f"""
+    # Users who created only archived transactions may have been deleted since
+    sql = f"""
         SELECT
           t.transaction_id AS id,
           t.created_at,
@@ -178,36 +306,58 @@ def txns_detail():
           w.warehouse_code,
           u.username AS created_by,
           s.supplier_name
-        FROM inventory_transactions t
+        FROM {'inventory_transactions_archive' if archived else 'inventory_transactions'} t
         JOIN products p ON p.product_id = t.product_id
         JOIN warehouses w ON w.warehouse_id = t.warehouse_id
         LEFT JOIN suppliers s ON s.supplier_id = t.supplier_id
-        JOIN users u ON u.user_id = t.created_by
+        {'LEFT JOIN' if archived else 'JOIN'} users u ON u.user_id = t.created_by
         {where_sql}
         ORDER BY t.created_at DESC, t.transaction_id DESC
-        LIMIT 500
         """
-    )
-    rows = db.session.execute(sql, params).mappings().all()
-    return jsonify(items=[dict(r) for r in rows])
+    return sql, params
+
+
+@bp.get('/txns')
+@jwt_required()
+@conditional('ledger', 'ledger_archive', 'products', 'warehouses', 'suppliers', 'users')
+def txns_detail():
+    """
+    Return detailed inventory transactions with optional filters:
+    - from: YYYY-MM-DD (inclusive)
+    - to: YYYY-MM-DD (inclusive)
+    - warehouse_id: int
+    - product_id: int
+    - limit: page size (default 500, max 5000)
+    - cursor: next_cursor from the previous page (keyset on created_at, transaction_id)
+    - format=ndjson: stream every matching row, one JSON object per line
+    - archived=1: read the months restored with `ledger_partitions.py restore`
+    Defaults to last 30 days if no date filters provided (except for archived=1).
+    """
+    stream = request.args.get('format') == 'ndjson'
+    limit = min(max(request.args.get('limit', TXNS_PAGE_DEFAULT, type=int), 1), TXNS_PAGE_MAX)
+    try:
+        sql, params = txns_query()
+    except (ValueError, binascii.Error):
+        return jsonify(message='invalid date or cursor'), 400
+
+    if stream:
+        def generate():
+            # Server-side cursor (PyMySQL SSCursor): rows are fetched as they are written out
+            conn = db.session.connection().execution_options(stream_results=True, yield_per=1000)
+            for r in conn.execute(db.text(sql), params).mappings():
+                yield current_app.json.dumps(dict(r)) + "\n"
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+    params['limit'] = limit + 1
+    rows = db.session.execute(db.text(sql + " LIMIT :limit"), params).mappings().all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = _encode_cursor(rows[-1]['created_at'], rows[-1]['id']) if has_more else None
+    return jsonify(items=[dict(r) for r in rows], next_cursor=next_cursor)
 
 
 @bp.get('/daily-in-out')
 @jwt_required()
+@conditional('ledger', 'today')
 def daily_in_out():
-    sql = db.text(
-        """
-        SELECT
-          DATE(created_at) AS yd,
-          product_id,
-          warehouse_id,
-          SUM(CASE WHEN transaction_type = 'IN' THEN quantity ELSE 0 END) AS qty_in,
-          SUM(CASE WHEN transaction_type = 'OUT' THEN quantity ELSE 0 END) AS qty_out,
-          COUNT(*) AS txn_count
-        FROM inventory_transactions
-        GROUP BY yd, product_id, warehouse_id
-        ORDER BY yd DESC
-        """
-    )
-    rows = db.session.execute(sql).mappings().all()
-    return jsonify(items=[dict(r) for r in rows])
+    return _in_out_response('daily-in-out')
@@ -1,7 +1,11 @@
+import uuid
+from datetime import datetime
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from sqlalchemy import text
+from sqlalchemy import text, select, tuple_
+from sqlalchemy.exc import DBAPIError
 from extensions import db
+from models import Product, Warehouse, Supplier, StockBalance
 
 bp = Blueprint('stock', __name__)
 
@@ -66,9 +70,32 @@ def recent_transactions():
     return jsonify(items=items)
 
 
+# MySQL error codes raised on the stock write path
+ER_SIGNAL_EXCEPTION = 1644  # SIGNAL SQLSTATE '45000' from trigger/procedure
+ER_LOCK_WAIT_TIMEOUT = 1205
+ER_LOCK_DEADLOCK = 1213
+
+
+def _db_error_response(e: DBAPIError):
+    args = getattr(e.orig, 'args', ()) or ()
+    code = args[0] if args else None
+    msg = args[1] if len(args) > 1 else str(e.orig)
+    if code == ER_SIGNAL_EXCEPTION:
+        return jsonify(message=msg), 400
+    if code in (ER_LOCK_WAIT_TIMEOUT, ER_LOCK_DEADLOCK):
+        reason = 'deadlock' if code == ER_LOCK_DEADLOCK else 'lock_wait_timeout'
+        return jsonify(message='stock row is busy, please retry', reason=reason), 409
+    raise e
+
+
 def _call_proc(proc_sql: str, params: dict):
-    with db.session.begin():
-        db.session.execute(text(proc_sql), params)
+    """Run a stock procedure in its own transaction; returns an error response or None"""
+    try:
+        with db.session.begin():
+            db.session.execute(text(proc_sql), params)
+    except DBAPIError as e:
+        return _db_error_response(e)
+    return None
 
 
 @bp.post('/in')
@@ -79,7 +106,7 @@ def stock_in():
     quantity = data.get('quantity')
     if not isinstance(quantity, int) or quantity <= 0:
         return jsonify(message='quantity must be a positive integer'), 400
-    _call_proc(
+    err = _call_proc(
         'CALL sp_stock_in(:p_product_id, :p_warehouse_id, :p_quantity, :p_supplier_id, :p_created_by, :p_reason, :p_reference_document)',
         {
             'p_product_id': data.get('product_id'),
@@ -91,6 +118,8 @@ def stock_in():
             'p_reference_document': data.get('ref_document'),
         },
     )
+    if err:
+        return err
     return jsonify(message='ok')
 
 
@@ -102,7 +131,7 @@ def stock_out():
     quantity = data.get('quantity')
     if not isinstance(quantity, int) or quantity <= 0:
         return jsonify(message='quantity must be a positive integer'), 400
-    _call_proc(
+    err = _call_proc(
         'CALL sp_stock_out(:p_product_id, :p_warehouse_id, :p_quantity, :p_created_by, :p_reason, :p_reference_document)',
         {
             'p_product_id': data.get('product_id'),
@@ -113,6 +142,8 @@ def stock_out():
             'p_reference_document': data.get('ref_document'),
         },
     )
+    if err:
+        return err
     return jsonify(message='ok')
 
 
@@ -124,7 +155,7 @@ def stock_adjust():
     signed_delta = data.get('signed_delta')
     if not isinstance(signed_delta, int) or signed_delta == 0:
         return jsonify(message='signed_delta must be a non-zero integer'), 400
-    _call_proc(
+    err = _call_proc(
         'CALL sp_stock_adjust(:p_product_id, :p_warehouse_id, :p_delta, :p_created_by, :p_reason, :p_reference_document)',
         {
             'p_product_id': data.get('product_id'),
@@ -135,4 +166,254 @@ def stock_adjust():
             'p_reference_document': data.get('ref_document'),
         },
     )
+    if err:
+        return err
     return jsonify(message='ok')
+
+
+# ---------------------
+# Point stock lookups
+# ---------------------
+LEVELS_MAX_PAIRS = 5000
+
+
+def _stock_levels(pairs):
+    """Balances for (product_id, warehouse_id) pairs via stock_balances primary key; missing pairs are 0"""
+    found = {}
+    if pairs:
+        rows = db.session.execute(
+            select(StockBalance.product_id, StockBalance.warehouse_id,
+                   StockBalance.qty_on_hand, StockBalance.last_updated)
+            .where(tuple_(StockBalance.product_id, StockBalance.warehouse_id).in_(pairs))
+        ).all()
+        found = {(r.product_id, r.warehouse_id): r for r in rows}
+    items = []
+    for pid, wid in pairs:
+        r = found.get((pid, wid))
+        items.append({
+            'product_id': pid,
+            'warehouse_id': wid,
+            'qty_on_hand': r.qty_on_hand if r else 0,
+            'last_updated': r.last_updated.isoformat() if r and r.last_updated else None,
+        })
+    return items
+
+
+def _levels_response(pairs):
+    if not pairs:
+        return jsonify(message='at least one (product_id, warehouse_id) pair is required'), 400
+    if len(pairs) > LEVELS_MAX_PAIRS:
+        return jsonify(message=f'at most {LEVELS_MAX_PAIRS} pairs per request'), 400
+    # de-duplicate, keep request order
+    return jsonify(items=_stock_levels(list(dict.fromkeys(pairs))))
+
+
+@bp.get('/levels')
+@jwt_required()
+def stock_levels():
+    """
+    Current stock for specific pairs:
+    - ?product_id=1&warehouse_id=2
+    - ?pairs=1:2,1:3,5:2
+    """
+    try:
+        if request.args.get('pairs'):
+            pairs = [tuple(int(x) for x in pair.split(':', 1)) for pair in request.args['pairs'].split(',') if pair]
+            if any(len(p) != 2 for p in pairs):
+                raise ValueError
+        else:
+            pairs = [(int(request.args['product_id']), int(request.args['warehouse_id']))]
+    except (KeyError, ValueError):
+        return jsonify(message='use product_id & warehouse_id, or pairs=pid:wid,...'), 400
+    return _levels_response(pairs)
+
+
+@bp.post('/levels')
+@jwt_required()
+def stock_levels_bulk():
+    """Bulk form: { pairs: [{product_id, warehouse_id}, ...] }"""
+    data = request.get_json() or {}
+    raw = data.get('pairs')
+    if not isinstance(raw, list):
+        return jsonify(message='pairs must be a list'), 400
+    pairs = []
+    for p in raw:
+        pid = p.get('product_id') if isinstance(p, dict) else None
+        wid = p.get('warehouse_id') if isinstance(p, dict) else None
+        if not isinstance(pid, int) or not isinstance(wid, int):
+            return jsonify(message='each pair needs integer product_id and warehouse_id'), 400
+        pairs.append((pid, wid))
+    return _levels_response(pairs)
+
+
+# ---------------------
+# Batch stock movements
+# ---------------------
+BATCH_MAX_LINES = 5000
+BATCH_MODES = ('atomic', 'partial')
+
+
+def _parse_batch_line(raw):
+    """Validate one batch line; returns (line, error)"""
+    if not isinstance(raw, dict):
+        return None, 'line must be an object'
+    txn_type = str(raw.get('type') or '').upper()
+    if txn_type not in ('IN', 'OUT', 'ADJUST'):
+        return None, 'type must be IN, OUT or ADJUST'
+    pid = raw.get('product_id')
+    wid = raw.get('warehouse_id')
+    if not isinstance(pid, int) or not isinstance(wid, int):
+        return None, 'product_id and warehouse_id must be integers'
+    if txn_type == 'ADJUST':
+        qty = raw.get('signed_delta')
+        if not isinstance(qty, int) or qty == 0:
+            return None, 'signed_delta must be a non-zero integer'
+    else:
+        qty = raw.get('quantity')
+        if not isinstance(qty, int) or qty <= 0:
+            return None, 'quantity must be a positive integer'
+    sid = raw.get('supplier_id') if txn_type == 'IN' else None
+    if sid is not None and not isinstance(sid, int):
+        return None, 'supplier_id must be an integer'
+    return {
+        'type': txn_type,
+        'product_id': pid,
+        'warehouse_id': wid,
+        'supplier_id': sid,
+        'quantity': qty,
+        'reason': raw.get('reason'),
+        'ref_document': raw.get('ref_document'),
+    }, None
+
+
+def _existing_ids(column, ids):
+    if not ids:
+        return set()
+    rows = db.session.execute(select(column).where(column.in_(ids))).scalars()
+    return set(rows)
+
+
+def _lock_balances(pairs):
+    """Ensure stock_balances rows exist for pairs and lock them in primary-key order"""
+    params = [{'pid': p, 'wid': w, 'zero': 0} for p, w in pairs]
+    # executemany: PyMySQL rewrites this into one multi-row INSERT, but only when VALUES
+    # holds nothing but placeholders (pymysql.cursors.RE_INSERT_VALUES), so 0 is bound too
+    db.session.execute(text("""
+        INSERT INTO stock_balances (product_id, warehouse_id, qty_on_hand)
+        VALUES (:pid, :wid, :zero)
+        ON DUPLICATE KEY UPDATE qty_on_hand = qty_on_hand
+    """), params)
+    rows = db.session.execute(
+        select(StockBalance.product_id, StockBalance.warehouse_id, StockBalance.qty_on_hand)
+        .where(tuple_(StockBalance.product_id, StockBalance.warehouse_id).in_(pairs))
+        .order_by(StockBalance.product_id, StockBalance.warehouse_id)
+        .with_for_update()
+    ).all()
+    return {(r.product_id, r.warehouse_id): r.qty_on_hand for r in rows}
+
+
+@bp.post('/batch')
+@jwt_required()
+def stock_batch():
+    """
+    Apply many IN/OUT/ADJUST lines in one transaction.
+    Body: { mode: 'atomic'|'partial', lines: [{type, product_id, warehouse_id,
+            quantity | signed_delta, supplier_id, reason, ref_document}, ...] }
+    - atomic (default): any invalid line rejects the whole batch (400)
+    - partial: valid lines are applied, invalid ones are reported
+    """
+    ident = get_jwt_identity()
+    data = request.get_json() or {}
+    mode = data.get('mode') or 'atomic'
+    raw_lines = data.get('lines')
+    if mode not in BATCH_MODES:
+        return jsonify(message='mode must be atomic or partial'), 400
+    if not isinstance(raw_lines, list) or not raw_lines:
+        return jsonify(message='lines must be a non-empty list'), 400
+    if len(raw_lines) > BATCH_MAX_LINES:
+        return jsonify(message=f'at most {BATCH_MAX_LINES} lines per batch'), 400
+
+    lines = []
+    results = []
+    for i, raw in enumerate(raw_lines):
+        line, error = _parse_batch_line(raw)
+        lines.append(line)
+        results.append({'line': i, 'status': 'error', 'message': error} if error else {'line': i, 'status': 'ok'})
+
+    # Reference checks: one IN query per entity instead of one lookup per line
+    parsed = [ln for ln in lines if ln]
+    product_ids = _existing_ids(Product.product_id, {ln['product_id'] for ln in parsed})
+    warehouse_ids = _existing_ids(Warehouse.warehouse_id, {ln['warehouse_id'] for ln in parsed})
+    supplier_ids = _existing_ids(Supplier.supplier_id, {ln['supplier_id'] for ln in parsed if ln['supplier_id']})
+    for i, ln in enumerate(lines):
+        if not ln:
+            continue
+        if ln['product_id'] not in product_ids:
+            error = f"product {ln['product_id']} not found"
+        elif ln['warehouse_id'] not in warehouse_ids:
+            error = f"warehouse {ln['warehouse_id']} not found"
+        elif ln['supplier_id'] and ln['supplier_id'] not in supplier_ids:
+            error = f"supplier {ln['supplier_id']} not found"
+        else:
+            continue
+        lines[i] = None
+        results[i] = {'line': i, 'status': 'error', 'message': error}
+
+    if mode == 'atomic' and any(r['status'] == 'error' for r in results):
+        db.session.rollback()
+        return jsonify(message='batch rejected', applied=0, results=results), 400
+
+    try:
+        pairs = sorted({(ln['product_id'], ln['warehouse_id']) for ln in lines if ln})
+        balances = _lock_balances(pairs) if pairs else {}
+
+        # Replay lines in order against the locked balances, same rules as trg_it_before_insert
+        rows = []
+        batch_tag = datetime.now().strftime('%Y%m%d%H%M%S') + '-' + uuid.uuid4().hex[:6]
+        for i, ln in enumerate(lines):
+            if not ln:
+                continue
+            key = (ln['product_id'], ln['warehouse_id'])
+            before = balances[key]
+            after = before - ln['quantity'] if ln['type'] == 'OUT' else before + ln['quantity']
+            if after < 0:
+                error = (f'Không đủ tồn kho. Tồn hiện tại: {before}' if ln['type'] == 'OUT'
+                         else 'Điều chỉnh sẽ làm tồn kho âm')
+                results[i] = {'line': i, 'status': 'error', 'message': error}
+                continue
+            balances[key] = after
+            results[i].update(stock_before=before, stock_after=after)
+            rows.append({
+                'code': f"{ln['type']}-{batch_tag}-{i:04d}",
+                'pid': ln['product_id'],
+                'wid': ln['warehouse_id'],
+                'sid': ln['supplier_id'],
+                'qty': ln['quantity'],
+                'type': ln['type'],
+                'reason': ln['reason'],
+                'ref': ln['ref_document'],
+                'uid': int(ident),
+            })
+
+        applied = len(rows)
+        if mode == 'atomic' and applied != len(lines):
+            db.session.rollback()
+            for r in results:
+                r.pop('stock_before', None)
+                r.pop('stock_after', None)
+            return jsonify(message='batch rejected', applied=0, results=results), 400
+
+        if rows:
+            # The trigger still runs per row; the balance rows are already locked by this transaction
+            db.session.execute(text("""
+                INSERT INTO inventory_transactions (
+                  transaction_code, product_id, warehouse_id, supplier_id, quantity,
+                  transaction_type, reason, reference_document, created_by
+                ) VALUES (:code, :pid, :wid, :sid, :qty, :type, :reason, :ref, :uid)
+            """), rows)
+        db.session.commit()
+    except DBAPIError as e:
+        db.session.rollback()
+        return _db_error_response(e)
+
+    return jsonify(message='ok', applied=applied, failed=len(lines) - applied, results=results)
@@ -1,23 +1,15 @@
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask_jwt_extended import jwt_required
 from extensions import db
-from models import Supplier, User, Role
+from models import Supplier
+from authz import require_manager
+from cache import catalog_cache, relationships_cache
 from sqlalchemy.exc import IntegrityError
+from conditional import conditional
 
 bp = Blueprint('suppliers', __name__)
 
 
-def require_manager() -> bool:
-    ident = get_jwt_identity()
-    if not ident:
-        return False
-    u = User.query.get(int(ident))
-    if not u:
-        return False
-    r = Role.query.get(u.role_id)
-    return bool(r and r.role_name == 'manager')
-
-
 def _sup_to_dict(s: Supplier):
     return {
         'id': s.supplier_id,
@@ -32,6 +24,7 @@ def _sup_to_dict(s: Supplier):
 
 @bp.get('/')
 @jwt_required()
+@conditional('suppliers')
 def list_suppliers():
     q = Supplier.query.order_by(Supplier.supplier_id.desc()).all()
     return jsonify(items=[_sup_to_dict(s) for s in q])
@@ -59,6 +52,7 @@ def create_supplier():
         )
         db.session.add(s)
         db.session.commit()
+        catalog_cache.bump('suppliers')
         return jsonify(item=_sup_to_dict(s)), 201
     except IntegrityError:
         db.session.rollback()
@@ -87,6 +81,8 @@ def update_supplier(sid: int):
             setattr(s, backend_field, (data[frontend_field] or '').strip() if isinstance(data[frontend_field], str) else data[frontend_field])
     try:
         db.session.commit()
+        catalog_cache.bump('suppliers')
+        relationships_cache.invalidate()
         return jsonify(item=_sup_to_dict(s))
     except IntegrityError:
         db.session.rollback()
@@ -104,6 +100,8 @@ def delete_supplier(sid: int):
     try:
         db.session.delete(s)
         db.session.commit()
+        catalog_cache.bump('suppliers')
+        relationships_cache.invalidate()
         return jsonify(message='deleted')
     except IntegrityError:
         db.session.rollback()
@@ -4,20 +4,11 @@ from werkzeug.security import generate_password_hash
 from sqlalchemy.orm import joinedload
 from extensions import db
 from models import User, Role
+from authz import require_manager, invalidate_role
 
 bp = Blueprint('users', __name__)
 
 
-def require_manager():
-    ident = get_jwt_identity()
-    try:
-        uid = int(ident)
-    except Exception:
-        return False
-    u = User.query.get(uid)
-    return bool(u and u.role and u.role.role_name == 'manager')
-
-
 def _user_to_dict(u: User):
     return {
         'id': u.user_id,
@@ -81,6 +72,7 @@ def update_user(uid: int):
     if 'status' in data and data['status'] in ['active', 'inactive']:
         user.status = data['status']
     db.session.commit()
+    invalidate_role(user.user_id)
     return jsonify(item=_user_to_dict(user))
 
 
@@ -99,6 +91,7 @@ def set_role(uid: int):
         return jsonify(message='not found'), 404
     user.role_id = role.role_id
     db.session.commit()
+    invalidate_role(user.user_id)
     return jsonify(item=_user_to_dict(user))
 
 
@@ -112,6 +105,7 @@ def activate(uid: int):
         return jsonify(message='not found'), 404
     user.status = 'active'
     db.session.commit()
+    invalidate_role(user.user_id)
     return jsonify(item=_user_to_dict(user))
 
 
@@ -125,6 +119,7 @@ def deactivate(uid: int):
         return jsonify(message='not found'), 404
     user.status = 'inactive'
     db.session.commit()
+    invalidate_role(user.user_id)
     return jsonify(item=_user_to_dict(user))
 
 
@@ -166,4 +161,5 @@ def delete_user(uid: int):
         return jsonify(message='cannot delete manager'), 400
     db.session.delete(user)
     db.session.commit()
+    invalidate_role(uid)
     return ('', 204)
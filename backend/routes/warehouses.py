@@ -1,23 +1,16 @@
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask_jwt_extended import jwt_required
 from extensions import db
-from models import Warehouse, User, Role
+from models import Warehouse
+from authz import require_manager
+from cache import catalog_cache, relationships_cache
 from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload
+from conditional import conditional
 
 bp = Blueprint('warehouses', __name__)
 
 
-def require_manager() -> bool:
-    ident = get_jwt_identity()
-    if not ident:
-        return False
-    u = User.query.get(int(ident))
-    if not u:
-        return False
-    r = Role.query.get(u.role_id)
-    return bool(r and r.role_name == 'manager')
-
-
 def _wh_to_dict(w: Warehouse):
     return {
         'id': w.warehouse_id,
@@ -34,8 +27,9 @@ def _wh_to_dict(w: Warehouse):
 
 @bp.get('/')
 @jwt_required()
+@conditional('warehouses', 'users')
 def list_warehouses():
-    q = Warehouse.query.order_by(Warehouse.warehouse_code.asc()).all()
+    q = Warehouse.query.options(joinedload(Warehouse.manager)).order_by(Warehouse.warehouse_code.asc()).all()
     return jsonify(items=[_wh_to_dict(w) for w in q])
 
 
@@ -61,6 +55,7 @@ def create_warehouse():
         )
         db.session.add(w)
         db.session.commit()
+        catalog_cache.bump('warehouses')
         return jsonify(item=_wh_to_dict(w)), 201
     except IntegrityError:
         db.session.rollback()
@@ -93,6 +88,8 @@ def update_warehouse(wid: int):
                 setattr(w, backend_field, (val or '').strip() if isinstance(val, str) else val)
     try:
         db.session.commit()
+        catalog_cache.bump('warehouses')
+        relationships_cache.invalidate()
         return jsonify(item=_wh_to_dict(w))
     except IntegrityError:
         db.session.rollback()
@@ -111,6 +108,8 @@ def delete_warehouse(wid: int):
     try:
         db.session.delete(w)
         db.session.commit()
+        catalog_cache.bump('warehouses')
+        relationships_cache.invalidate()
         return jsonify(message='deleted')
     except IntegrityError:
         db.session.rollback()
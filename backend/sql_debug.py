@@ -0,0 +1,145 @@
+"""
+Development-mode SQL diagnostics: N+1 and slow-query warnings
+
+Enabled by SQL_DEBUG (on in DevConfig). Every statement is fingerprinted
+(literals and IN-lists collapsed) and attributed to the first stack frame in
+this codebase. At the end of a request, a fingerprint seen SQL_NPLUS1_THRESHOLD
+or more times is reported as a likely N+1. Any statement slower than
+SQL_SLOW_MS is reported immediately. Warnings go to app.logger as one JSON
+object per line.
+
+assert_max_queries() is a helper for tests and ad-hoc checks and works
+whether or not SQL_DEBUG is on.
+"""
+import json
+import os
+import re
+import time
+import traceback
+from contextlib import contextmanager
+
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+THIS_FILE = os.path.abspath(__file__)
+BACKEND_DIR = os.path.dirname(THIS_FILE)
+STATEMENT_PREVIEW = 300
+
+_WS_RE = re.compile(r'\s+')
+_STRING_RE = re.compile(r"'(?:[^'\\]|\\.)*'")
+_NUMBER_RE = re.compile(r'\b\d+(?:\.\d+)?\b')
+_IN_LIST_RE = re.compile(r'\bIN\s*\((?:\s*(?:\?|%s|%\(\w+\)s)\s*,?)+\)', re.IGNORECASE)
+_PARAM_RE = re.compile(r'%\(\w+\)s|%s|:\w+')
+
+
+def fingerprint(statement: str) -> str:
+    """Statement shape: whitespace, literals, bind markers and IN-lists normalized"""
+    s = _WS_RE.sub(' ', statement).strip()
+    s = _STRING_RE.sub('?', s)
+    s = _NUMBER_RE.sub('?', s)
+    s = _PARAM_RE.sub('?', s)
+    return _IN_LIST_RE.sub('IN (...)', s)
+
+
+def _origin() -> str:
+    """First stack frame inside this codebase, skipping this module"""
+    for frame in reversed(traceback.extract_stack()[:-1]):
+        path = os.path.abspath(frame.filename)
+        if path.startswith(BACKEND_DIR) and path != THIS_FILE and 'site-packages' not in path:
+            return f'{os.path.relpath(path, BACKEND_DIR)}:{frame.lineno} in {frame.name}'
+    return 'unknown'
+
+
+def _route() -> str:
+    return request.url_rule.rule if request.url_rule else request.path
+
+
+def _warn(payload: dict):
+    current_app.logger.warning('sql_debug %s', json.dumps(payload, ensure_ascii=False, default=str))
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('sql_debug_start', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed_ms = (time.perf_counter() - conn.info['sql_debug_start'].pop()) * 1000
+    if not (has_request_context() and 'sql_debug' in g):
+        return
+    fp = fingerprint(statement)
+    seen = g.sql_debug.get(fp)
+    if seen is None:
+        g.sql_debug[fp] = seen = {'count': 0, 'ms': 0.0, 'origin': _origin()}
+    seen['count'] += 1
+    seen['ms'] += elapsed_ms
+    if elapsed_ms >= current_app.config['SQL_SLOW_MS']:
+        _warn({
+            'event': 'slow_query',
+            'route': _route(),
+            'method': request.method,
+            'duration_ms': round(elapsed_ms, 2),
+            'origin': _origin(),
+            'statement': statement[:STATEMENT_PREVIEW],
+        })
+
+
+def _handle_error(context):
+    starts = context.connection.info.get('sql_debug_start') if context.connection else None
+    if starts:
+        starts.pop()
+
+
+def init_app(app):
+    @app.before_request
+    def _start():
+        g.sql_debug = {}  # fingerprint -> {'count', 'ms', 'origin'}
+
+    @app.after_request
+    def _report(resp):
+        threshold = app.config['SQL_NPLUS1_THRESHOLD']
+        for fp, seen in getattr(g, 'sql_debug', {}).items():
+            if seen['count'] >= threshold:
+                _warn({
+                    'event': 'n_plus_one',
+                    'route': _route(),
+                    'method': request.method,
+                    'count': seen['count'],
+                    'total_ms': round(seen['ms'], 2),
+                    'origin': seen['origin'],
+                    'statement': fp[:STATEMENT_PREVIEW],
+                })
+        return resp
+
+    for name, fn in (('before_cursor_execute', _before_cursor_execute),
+                     ('after_cursor_execute', _after_cursor_execute),
+                     ('handle_error', _handle_error)):
+        if not event.contains(Engine, name, fn):
+            event.listen(Engine, name, fn)
+
+
+@contextmanager
+def assert_max_queries(limit: int):
+    """Fail if the block issues more than `limit` SQL statements.
+
+        with assert_max_queries(3):
+            client.get('/api/products/', headers=auth)
+    """
+    statements = []
+
+    def _capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(Engine, 'after_cursor_execute', _capture)
+    try:
+        yield statements
+    finally:
+        event.remove(Engine, 'after_cursor_execute', _capture)
+    if len(statements) > limit:
+        counts = {}
+        for s in statements:
+            fp = fingerprint(s)
+            counts[fp] = counts.get(fp, 0) + 1
+        shapes = '\n'.join(f'  {n} x {fp[:STATEMENT_PREVIEW]}'
+                           for fp, n in sorted(counts.items(), key=lambda kv: -kv[1]))
+        raise AssertionError(f'{len(statements)} SQL statements issued, expected at most {limit}:\n{shapes}')
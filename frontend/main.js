@@ -4,6 +4,9 @@ const API_BASE = (localStorage.getItem('API_BASE') || `${window.location.origin}
 let token = localStorage.getItem('jwt') || null;
 let currentUser = null;
 let catalog = { products: [], warehouses: [], suppliers: [] };
+// GET path -> { etag, text }: bodies revalidated with If-None-Match, reused on 304
+const etagCache = new Map();
+const ETAG_CACHE_MAX = 100;
 
 const el = (id) => document.getElementById(id);
 const qs = (sel) => document.querySelector(sel);
@@ -11,6 +14,7 @@ const qs = (sel) => document.querySelector(sel);
 function setAuth(t, user) {
   token = t;
   currentUser = user || null;
+  etagCache.clear();
   if (t) localStorage.setItem('jwt', t); else localStorage.removeItem('jwt');
   renderNav();
 }
@@ -21,6 +25,8 @@ async function loadReportTxns({ wid=null, pid=null, dateFrom='', dateTo='' }={})
   if (pid) params.set('product_id', pid);
   if (dateFrom) params.set('from', dateFrom);
   if (dateTo) params.set('to', dateTo);
+  // Reused by the "Xuất CSV" button of the transactions card
+  window._reportTxnsParams = Object.fromEntries(params);
   const data = await api(`/reports/txns?${params.toString()}`);
   const tb = el('report-txns'); if (!tb) return;
   tb.innerHTML = '';
@@ -53,6 +59,7 @@ async function loadReportTxns({ wid=null, pid=null, dateFrom='', dateTo='' }={})
     if (dateFrom || dateTo) parts.push(`Khoảng: ${dateFrom||'...'} → ${dateTo||'...'}`);
     if (wid) parts.push(`Kho: ${wid}`);
     if (pid) parts.push(`SP: ${pid}`);
+    if (data.next_cursor) parts.push(`Hiển thị ${data.items.length} giao dịch mới nhất`);
     hint.textContent = parts.join(' · ');
   }
 }
@@ -442,29 +449,82 @@ function bindReportFilters() {
     if (el('rep-filter-to')) el('rep-filter-to').value='';
     apply();
   });
-  el('rep-export')?.addEventListener('click', ()=>{
-    // Simple CSV export for current stock
-    const rows = [['SKU','Tên','Kho','Tồn','ĐVT','Reorder','Cập nhật']];
-    document.querySelectorAll('#report-cur tr').forEach(tr=>{
-      const tds=[...tr.children].map(td=>`"${td.textContent}"`); rows.push(tds);
-    });
-    const csv = rows.map(r=>r.join(',')).join('\n');
-    const blob = new Blob([csv], {type:'text/csv;charset=utf-8;'}); const url = URL.createObjectURL(blob); const a=document.createElement('a'); a.href=url; a.download='current_stock.csv'; a.click(); URL.revokeObjectURL(url);
+  // Export the active tab server-side with the current filters
+  const exportActive = (format) => {
+    const params = {};
+    let report = 'current-stock';
+    const tab = qs('#rep-tabs .nav-link.active')?.dataset.bsTarget;
+    if (tab === '#tab-time') {
+      const scale = el('rep-scale-week')?.classList.contains('active') ? 'weekly' : el('rep-scale-day')?.classList.contains('active') ? 'daily' : 'monthly';
+      report = `${scale}-in-out`;
+      if (getSel('rep-filter-from')) params.from = getSel('rep-filter-from');
+      if (getSel('rep-filter-to')) params.to = getSel('rep-filter-to');
+    } else {
+      if (tab === '#tab-low') report = 'low-stock';
+      if (getSel('rep-filter-warehouse')) params.warehouse_id = getSel('rep-filter-warehouse');
+      if (getSel('rep-filter-product')) params.product_id = getSel('rep-filter-product');
+    }
+    downloadExport(report, params, format);
+  };
+  // Bound once: loadReports runs on every visit and a second listener would download twice
+  [['rep-export', ()=>exportActive('xlsx')],
+   ['rep-export-csv', ()=>exportActive('csv')],
+   ['rep-export-txns', ()=>downloadExport('txns', window._reportTxnsParams || {}, 'csv')]].forEach(([id, fn]) => {
+    const b = el(id); if (b && !b._bound) { b._bound = true; b.addEventListener('click', fn); }
   });
 }
 
+// Download /exports/<report>; exports above EXPORT_ASYNC_ROWS come back as 202 and are polled as a job
+async function downloadExport(report, params = {}, format = 'csv') {
+  const headers = token ? { Authorization: `Bearer ${token}` } : {};
+  try {
+    let res = await fetch(`${API_BASE}/exports/${report}?${new URLSearchParams({ ...params, format })}`, { headers });
+    if (res.status === 202) {
+      let job = await res.json();
+      while (job.status === 'queued' || job.status === 'running') {
+        await new Promise(r => setTimeout(r, 2000));
+        job = await api(`/exports/jobs/${job.id}`);
+      }
+      if (job.status !== 'done') throw new Error(job.error || 'Xuất dữ liệu thất bại');
+      res = await fetch(`${API_BASE}/exports/jobs/${job.id}/download`, { headers });
+    }
+    if (!res.ok) {
+      let msg = `HTTP ${res.status}`;
+      try { msg = (await res.json()).message || msg; } catch {}
+      throw new Error(msg);
+    }
+    const disposition = res.headers.get('content-disposition') || '';
+    const name = /filename="?([^";]+)"?/.exec(disposition)?.[1] || `${report}.${format}`;
+    const url = URL.createObjectURL(await res.blob());
+    const a = document.createElement('a'); a.href = url; a.download = name; a.click(); URL.revokeObjectURL(url);
+  } catch (e) {
+    alert(`Không thể xuất dữ liệu: ${e.message}`);
+  }
+}
+
 async function api(path, { method = 'GET', body } = {}) {
   const headers = {};
   if (body !== undefined) headers['Content-Type'] = 'application/json';
   if (token) headers['Authorization'] = `Bearer ${token}`;
+  const cached = method === 'GET' ? etagCache.get(path) : undefined;
+  if (cached) headers['If-None-Match'] = cached.etag;
   
   try {
     const res = await fetch(`${API_BASE}${path}`, {
       method,
       headers,
       body: body !== undefined ? JSON.stringify(body) : undefined,
+      // We revalidate ourselves; keep the browser cache from answering for us
+      cache: method === 'GET' ? 'no-store' : 'default',
     });
     
+    if (res.status === 304 && cached) {
+      // Move to the back so the Map stays in least-recently-used order
+      etagCache.delete(path);
+      etagCache.set(path, cached);
+      return JSON.parse(cached.text);
+    }
+    
     if (!res.ok) {
       let errorMsg = `HTTP ${res.status}`;
       try {
@@ -486,6 +546,14 @@ async function api(path, { method = 'GET', body } = {}) {
     }
     
     const ct = res.headers.get('content-type') || '';
+    const etag = res.headers.get('etag');
+    if (method === 'GET' && etag && ct.includes('application/json')) {
+      const text = await res.text();
+      etagCache.delete(path);
+      etagCache.set(path, { etag, text });
+      if (etagCache.size > ETAG_CACHE_MAX) etagCache.delete(etagCache.keys().next().value);
+      return JSON.parse(text);
+    }
     return ct.includes('application/json') ? res.json() : res.text();
   } catch (error) {
     if (error instanceof TypeError && error.message.includes('fetch')) {
@@ -611,15 +679,13 @@ function bindNav() {
 }
 
 async function loadDashboard() {
-  // KPIs
-  const [products, currentStock, lowStock, monthly, top] = await Promise.all([
-    api('/products/'),
-    api('/reports/current-stock'),
-    api('/reports/low-stock'),
-    api('/reports/monthly-in-out'),
-    api('/reports/top-moving'),
-  ]);
-  el('kpi-products').textContent = (products.items || []).length;
+  // KPIs (one request; the server reads the stock snapshot once)
+  const dash = await api('/reports/dashboard');
+  const currentStock = { items: dash.current_stock };
+  const lowStock = { items: dash.low_stock };
+  const monthly = { items: dash.monthly };
+  const top = { items: dash.top_moving };
+  el('kpi-products').textContent = dash.product_count;
   const warehouses = new Set((currentStock.items || []).map((r) => r.warehouse_id));
   el('kpi-warehouses').textContent = warehouses.size;
   el('kpi-low').textContent = (lowStock.items || []).length;
@@ -1250,6 +1316,17 @@ function bindStockOps() {
     prSel.addEventListener('change', fetchCurrentStock);
   }
 
+  // Typeahead: narrow the product dropdown via the server-side search index
+  const prSearch = el('op-product-search');
+  if (prSearch && !prSearch._bound) {
+    prSearch._bound = true;
+    let timer = null;
+    prSearch.addEventListener('input', () => {
+      clearTimeout(timer);
+      timer = setTimeout(() => searchOpProducts(prSearch.value.trim()), 150);
+    });
+  }
+
   // Save / Reset buttons
   el('btn-op-save').onclick = async () => {
     await withBusy(el('btn-op-save'), async () => {
@@ -1318,6 +1395,7 @@ function genDocCode() {
 function resetOpForm() {
   el('op-warehouse').value = '';
   el('op-product').value = '';
+  if (el('op-product-search')?.value) { el('op-product-search').value = ''; searchOpProducts(''); }
   el('op-supplier').value = '';
   el('op-qty').value = '';
   if (el('op-reason-select')) el('op-reason-select').value = '';
@@ -1422,10 +1500,9 @@ async function fetchCurrentStock() {
   }
   
   try {
-    const data = await api(`/reports/current-stock`);
-    const items = data.items || [];
-    const current = items.find(it => it.product_id === pid && it.warehouse_id === wid);
-    const qty = current ? current.qty_on_hand : 0;
+    const data = await api(`/stock/levels?product_id=${pid}&warehouse_id=${wid}`);
+    const current = (data.items || [])[0];
+    const qty = current ? Number(current.qty_on_hand) : 0;
     stockSpan.textContent = qty;
     stockInfo.classList.remove('d-none');
     
@@ -1537,6 +1614,27 @@ function fillStockDropdowns() {
   setOptions(el('adj-warehouse'), catalog.warehouses, w => `${w.code} - ${w.name}`);
 }
 
+async function searchOpProducts(q) {
+  const sel = el('op-product');
+  if (!sel) return;
+  let items = catalog.products;
+  if (q) {
+    try {
+      const res = await api(`/catalog/products/search?q=${encodeURIComponent(q)}&limit=20`);
+      if (el('op-product-search')?.value.trim() !== q) return; // a newer query is in flight
+      items = res.items || [];
+    } catch (err) {
+      console.error('Product search error:', err);
+      return;
+    }
+  }
+  sel.innerHTML = '<option value="">-- Chọn --</option>' + items.map(p => `<option value="${p.id}">${p.sku} - ${p.name}</option>`).join('');
+  if (q && items.length === 1) {
+    sel.value = String(items[0].id);
+    fetchCurrentStock();
+  }
+}
+
 function fillUnifiedStockDropdowns() {
   const setOptions = (sel, items, getLabel) => {
     if (!sel) return;
@@ -2072,8 +2170,8 @@ document.addEventListener('DOMContentLoaded', init);
 // Warehouse products helper functions
 async function loadWarehouseProducts(warehouseId) {
   try {
-    const res = await api('/products');
-    const products = (res.items || []).filter(p => p.default_warehouse_id === warehouseId);
+    const res = await api(`/products/?default_warehouse_id=${warehouseId}`);
+    const products = res.items || [];
     renderWarehouseProducts(products);
   } catch (e) {
     console.error('Error loading warehouse products:', e);
@@ -123,10 +123,17 @@ CREATE TABLE product_supplier (
 
 -- =====================================
 -- BẢNG 7: inventory_transactions
+-- Phân vùng theo tháng của created_at (ledger_partitions.py tạo trước partition mới,
+-- lưu trữ rồi xóa các tháng cũ). Bảng phân vùng không có khóa ngoại và mọi khóa
+-- duy nhất phải chứa created_at, nên:
+--   - product_id/warehouse_id được kiểm tra qua khóa ngoại của stock_balances (trigger ghi vào đó)
+--   - supplier_id/created_by được kiểm tra trong trg_it_before_insert,
+--     xóa supplier/user do trg_suppliers_ledger_set_null / trg_users_ledger_restrict xử lý
+--   - transaction_code duy nhất nhờ bảng transaction_codes
 -- =====================================
 CREATE TABLE inventory_transactions (
-  transaction_id           BIGINT AUTO_INCREMENT PRIMARY KEY COMMENT 'Mã giao dịch',
-  transaction_code         VARCHAR(50) NOT NULL UNIQUE COMMENT 'Mã giao dịch (code)',
+  transaction_id           BIGINT AUTO_INCREMENT COMMENT 'Mã giao dịch',
+  transaction_code         VARCHAR(50) NOT NULL COMMENT 'Mã giao dịch (code)',
   product_id               INT NOT NULL COMMENT 'Mã sản phẩm',
   warehouse_id             INT NOT NULL COMMENT 'Mã kho',
   supplier_id              INT NULL COMMENT 'Mã nhà cung cấp',
@@ -138,25 +145,164 @@ CREATE TABLE inventory_transactions (
   stock_after_transaction  BIGINT DEFAULT 0 COMMENT 'Tồn kho sau khi giao dịch',
   created_by               INT NOT NULL COMMENT 'Người tạo giao dịch',
   created_at               TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP COMMENT 'Ngày tạo',
-  CONSTRAINT fk_it_product
+  PRIMARY KEY (transaction_id, created_at),
+  INDEX idx_it_code (transaction_code),
+  INDEX idx_it_pair_date (product_id, warehouse_id, created_at),
+  INDEX idx_it_type_date (transaction_type, created_at),
+  INDEX idx_it_product_date (product_id, created_at),
+  INDEX idx_it_warehouse_date (warehouse_id, created_at),
+  INDEX idx_it_user (created_by),
+  INDEX idx_it_supplier (supplier_id)
+) ENGINE=InnoDB COMMENT='Bảng giao dịch tồn kho'
+PARTITION BY RANGE (UNIX_TIMESTAMP(created_at)) (
+  PARTITION pmax VALUES LESS THAN MAXVALUE
+);
+
+-- =====================================
+-- BẢNG 8: stock_balances
+-- Tồn kho hiện tại theo (sản phẩm, kho), được trigger cập nhật
+-- trong cùng giao dịch với việc ghi sổ inventory_transactions
+-- =====================================
+CREATE TABLE stock_balances (
+  product_id       INT NOT NULL COMMENT 'Mã sản phẩm',
+  warehouse_id     INT NOT NULL COMMENT 'Mã kho',
+  qty_on_hand      BIGINT NOT NULL DEFAULT 0 COMMENT 'Tồn kho hiện tại',
+  last_updated     TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP COMMENT 'Thời điểm giao dịch cuối',
+  PRIMARY KEY (product_id, warehouse_id),
+  CONSTRAINT fk_sb_product
     FOREIGN KEY (product_id) REFERENCES products(product_id)
       ON UPDATE CASCADE ON DELETE RESTRICT,
-  CONSTRAINT fk_it_warehouse
+  CONSTRAINT fk_sb_warehouse
     FOREIGN KEY (warehouse_id) REFERENCES warehouses(warehouse_id)
       ON UPDATE CASCADE ON DELETE RESTRICT,
-  CONSTRAINT fk_it_supplier
-    FOREIGN KEY (supplier_id) REFERENCES suppliers(supplier_id)
-      ON UPDATE CASCADE ON DELETE SET NULL,
-  CONSTRAINT fk_it_user
-    FOREIGN KEY (created_by) REFERENCES users(user_id)
+  INDEX idx_sb_warehouse (warehouse_id)
+) ENGINE=InnoDB COMMENT='Bảng tồn kho hiện tại (materialized từ inventory_transactions)';
+
+-- =====================================
+-- BẢNG 9: txn_daily_rollup
+-- Tổng hợp nhập/xuất theo ngày cho báo cáo ngày/tuần/tháng
+-- =====================================
+CREATE TABLE txn_daily_rollup (
+  day              DATE NOT NULL COMMENT 'Ngày giao dịch',
+  product_id       INT NOT NULL COMMENT 'Mã sản phẩm',
+  warehouse_id     INT NOT NULL COMMENT 'Mã kho',
+  qty_in           BIGINT NOT NULL DEFAULT 0 COMMENT 'Tổng số lượng nhập',
+  qty_out          BIGINT NOT NULL DEFAULT 0 COMMENT 'Tổng số lượng xuất',
+  qty_adjust       BIGINT NOT NULL DEFAULT 0 COMMENT 'Tổng điều chỉnh (có dấu)',
+  qty_moved        BIGINT NOT NULL DEFAULT 0 COMMENT 'Tổng |số lượng| luân chuyển',
+  txn_count        INT NOT NULL DEFAULT 0 COMMENT 'Số giao dịch',
+  txn_in_count     INT NOT NULL DEFAULT 0 COMMENT 'Số giao dịch nhập',
+  txn_out_count    INT NOT NULL DEFAULT 0 COMMENT 'Số giao dịch xuất',
+  txn_adjust_count INT NOT NULL DEFAULT 0 COMMENT 'Số giao dịch điều chỉnh',
+  PRIMARY KEY (day, product_id, warehouse_id),
+  CONSTRAINT fk_tdr_product
+    FOREIGN KEY (product_id) REFERENCES products(product_id)
       ON UPDATE CASCADE ON DELETE RESTRICT,
-  INDEX idx_it_product_warehouse (product_id, warehouse_id),
-  INDEX idx_it_type_date (transaction_type, created_at),
-  INDEX idx_it_product (product_id),
-  INDEX idx_it_warehouse (warehouse_id),
-  INDEX idx_it_user (created_by),
-  INDEX idx_it_supplier (supplier_id)
-) ENGINE=InnoDB COMMENT='Bảng giao dịch tồn kho';
+  CONSTRAINT fk_tdr_warehouse
+    FOREIGN KEY (warehouse_id) REFERENCES warehouses(warehouse_id)
+      ON UPDATE CASCADE ON DELETE RESTRICT,
+  INDEX idx_tdr_product_day (product_id, day),
+  INDEX idx_tdr_warehouse_day (warehouse_id, day)
+) ENGINE=InnoDB COMMENT='Bảng tổng hợp giao dịch theo ngày';
+
+-- =====================================
+-- BẢNG 10: table_versions
+-- Bộ đếm phiên bản theo bảng, do trigger tăng sau mỗi lần ghi;
+-- API dùng làm ETag cho các danh sách/báo cáo (HTTP 304)
+-- =====================================
+CREATE TABLE table_versions (
+  table_name       VARCHAR(64) PRIMARY KEY COMMENT 'Tên bảng',
+  version          BIGINT NOT NULL DEFAULT 0 COMMENT 'Số lần ghi',
+  updated_at       TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP COMMENT 'Thời điểm ghi cuối'
+) ENGINE=InnoDB COMMENT='Phiên bản dữ liệu theo bảng (validator cho conditional GET)';
+
+-- =====================================
+-- BẢNG 11: stock_checkpoints
+-- Tồn kho chốt cuối ngày (mặc định cuối mỗi tháng) theo (sản phẩm, kho);
+-- tồn tại một ngày bất kỳ = lần chốt gần nhất trước đó + biến động trong txn_daily_rollup
+-- =====================================
+CREATE TABLE stock_checkpoints (
+  checkpoint_date  DATE NOT NULL COMMENT 'Ngày chốt (tồn cuối ngày)',
+  product_id       INT NOT NULL COMMENT 'Mã sản phẩm',
+  warehouse_id     INT NOT NULL COMMENT 'Mã kho',
+  qty_on_hand      BIGINT NOT NULL DEFAULT 0 COMMENT 'Tồn kho cuối ngày chốt',
+  PRIMARY KEY (checkpoint_date, product_id, warehouse_id),
+  CONSTRAINT fk_sc_product
+    FOREIGN KEY (product_id) REFERENCES products(product_id)
+      ON UPDATE CASCADE ON DELETE RESTRICT,
+  CONSTRAINT fk_sc_warehouse
+    FOREIGN KEY (warehouse_id) REFERENCES warehouses(warehouse_id)
+      ON UPDATE CASCADE ON DELETE RESTRICT,
+  INDEX idx_sc_warehouse_date (warehouse_id, checkpoint_date)
+) ENGINE=InnoDB COMMENT='Tồn kho chốt định kỳ cho truy vấn tồn tại một thời điểm';
+
+-- =====================================
+-- BẢNG 12: transaction_codes
+-- Đảm bảo transaction_code duy nhất trên mọi partition (kể cả tháng đã lưu trữ)
+-- =====================================
+CREATE TABLE transaction_codes (
+  transaction_code VARCHAR(50) PRIMARY KEY COMMENT 'Mã giao dịch (code)'
+) ENGINE=InnoDB COMMENT='Sổ đăng ký mã giao dịch';
+
+-- =====================================
+-- BẢNG 13: ledger_archive
+-- Các tháng của inventory_transactions đã xuất ra file nén và xóa khỏi bảng chính
+-- =====================================
+CREATE TABLE ledger_archive (
+  month            DATE PRIMARY KEY COMMENT 'Tháng đã lưu trữ (ngày 1)',
+  partition_name   VARCHAR(64) NOT NULL COMMENT 'Partition đã xóa',
+  file_name        VARCHAR(255) NOT NULL COMMENT 'File lưu trữ (.csv.gz)',
+  row_count        BIGINT NOT NULL COMMENT 'Số dòng',
+  sha256           CHAR(64) NOT NULL COMMENT 'Checksum file',
+  archived_at      TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP COMMENT 'Thời điểm lưu trữ',
+  restored_at      TIMESTAMP NULL COMMENT 'Lần nạp lại gần nhất vào inventory_transactions_archive'
+) ENGINE=InnoDB COMMENT='Danh mục các tháng sổ giao dịch đã lưu trữ';
+
+-- =====================================
+-- BẢNG 14: inventory_transactions_archive
+-- Nơi nạp lại các tháng đã lưu trữ khi cần tra cứu (/api/reports/txns?archived=1)
+-- =====================================
+CREATE TABLE inventory_transactions_archive (
+  transaction_id           BIGINT PRIMARY KEY COMMENT 'Mã giao dịch',
+  transaction_code         VARCHAR(50) NOT NULL COMMENT 'Mã giao dịch (code)',
+  product_id               INT NOT NULL COMMENT 'Mã sản phẩm',
+  warehouse_id             INT NOT NULL COMMENT 'Mã kho',
+  supplier_id              INT NULL COMMENT 'Mã nhà cung cấp',
+  quantity                 BIGINT NOT NULL COMMENT 'Số lượng',
+  transaction_type         ENUM('IN','OUT','ADJUST') NOT NULL COMMENT 'Loại giao dịch',
+  reason                   VARCHAR(255) NULL COMMENT 'Lý do',
+  reference_document       VARCHAR(100) NULL COMMENT 'Tài liệu tham chiếu',
+  stock_before_transaction BIGINT DEFAULT 0 COMMENT 'Tồn kho trước khi giao dịch',
+  stock_after_transaction  BIGINT DEFAULT 0 COMMENT 'Tồn kho sau khi giao dịch',
+  created_by               INT NOT NULL COMMENT 'Người tạo giao dịch',
+  created_at               TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP COMMENT 'Ngày tạo',
+  INDEX idx_ita_date (created_at),
+  INDEX idx_ita_product_date (product_id, created_at),
+  INDEX idx_ita_warehouse_date (warehouse_id, created_at)
+) ENGINE=InnoDB ROW_FORMAT=COMPRESSED COMMENT='Giao dịch của các tháng đã lưu trữ, nạp lại theo yêu cầu';
+
+-- =====================================
+-- BẢNG 15: schema_migrations
+-- Các file trong backend/migrations đã áp dụng (python -m migrations).
+-- Schema này đã bao gồm tất cả các migration dưới đây
+-- =====================================
+CREATE TABLE schema_migrations (
+  migration        VARCHAR(255) PRIMARY KEY COMMENT 'Tên file migration',
+  checksum         CHAR(64) NULL COMMENT 'SHA-256 của file khi áp dụng',
+  applied_at       TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP COMMENT 'Thời điểm áp dụng'
+) ENGINE=InnoDB COMMENT='Lịch sử áp dụng migration';
+
+INSERT INTO schema_migrations (migration) VALUES
+  ('remove_price_update_delivery.sql'),
+  ('add_stock_balances.sql'),
+  ('stock_balance_row_lock.sql'),
+  ('add_txn_daily_rollup.sql'),
+  ('add_rollup_qty_moved.sql'),
+  ('add_table_versions.sql'),
+  ('add_stock_checkpoints.sql'),
+  ('partition_inventory_transactions.sql'),
+  ('add_ledger_date_indexes.sql'),
+  ('add_ledger_archive_version.sql');
 
 -- =====================================
 -- VIEWS
@@ -169,14 +315,13 @@ SELECT
   w.warehouse_id,
   w.warehouse_code,
   w.warehouse_name,
-  COALESCE(MAX(it.stock_after_transaction), 0) AS stock_quantity,
+  sb.qty_on_hand AS stock_quantity,
   p.unit,
   p.min_stock_level,
-  MAX(it.created_at) AS last_updated
-FROM products p
-CROSS JOIN warehouses w
-LEFT JOIN inventory_transactions it ON it.product_id = p.product_id AND it.warehouse_id = w.warehouse_id
-GROUP BY p.product_id, p.sku, p.product_name, w.warehouse_id, w.warehouse_code, w.warehouse_name, p.unit, p.min_stock_level;
+  sb.last_updated
+FROM stock_balances sb
+JOIN products p ON p.product_id = sb.product_id
+JOIN warehouses w ON w.warehouse_id = sb.warehouse_id;
 
 CREATE OR REPLACE VIEW v_low_stock AS
 SELECT *
@@ -213,20 +358,39 @@ FOR EACH ROW
 BEGIN
   DECLARE v_stock_current BIGINT DEFAULT 0;
   DECLARE v_stock_new BIGINT DEFAULT 0;
+  DECLARE v_message VARCHAR(500);
   
-  -- Lấy tồn kho hiện tại từ giao dịch cuối cùng
-  SELECT COALESCE(stock_after_transaction, 0) INTO v_stock_current
-  FROM inventory_transactions
+  -- Bảng phân vùng không có khóa ngoại: kiểm tra nhà cung cấp và người tạo tại đây
+  -- (sản phẩm/kho đã được khóa ngoại của stock_balances kiểm tra ở lệnh INSERT bên dưới)
+  IF NEW.supplier_id IS NOT NULL
+     AND NOT EXISTS (SELECT 1 FROM suppliers WHERE supplier_id = NEW.supplier_id) THEN
+    SIGNAL SQLSTATE '23000'
+      SET MESSAGE_TEXT = 'Nhà cung cấp không tồn tại', MYSQL_ERRNO = 1452;
+  END IF;
+  IF NOT EXISTS (SELECT 1 FROM users WHERE user_id = NEW.created_by) THEN
+    SIGNAL SQLSTATE '23000'
+      SET MESSAGE_TEXT = 'Người tạo giao dịch không tồn tại', MYSQL_ERRNO = 1452;
+  END IF;
+  
+  -- Đảm bảo có dòng tồn kho và khóa nó đến hết giao dịch,
+  -- để các giao dịch đồng thời trên cùng (sản phẩm, kho) chạy tuần tự
+  INSERT INTO stock_balances (product_id, warehouse_id, qty_on_hand)
+  VALUES (NEW.product_id, NEW.warehouse_id, 0)
+  ON DUPLICATE KEY UPDATE qty_on_hand = qty_on_hand;
+  
+  -- Lấy tồn kho hiện tại theo khóa chính (không quét sổ giao dịch)
+  SELECT qty_on_hand INTO v_stock_current
+  FROM stock_balances
   WHERE product_id = NEW.product_id AND warehouse_id = NEW.warehouse_id
-  ORDER BY created_at DESC, transaction_id DESC
-  LIMIT 1;
+  FOR UPDATE;
   
   -- Tính toán tồn kho sau giao dịch
   IF NEW.transaction_type = 'IN' THEN
     SET v_stock_new = v_stock_current + NEW.quantity;
   ELSEIF NEW.transaction_type = 'OUT' THEN
     IF v_stock_current < NEW.quantity THEN
-      SIGNAL SQLSTATE '45000' SET MESSAGE_TEXT = 'Không đủ tồn kho để xuất';
+      SET v_message = CONCAT('Không đủ tồn kho. Tồn hiện tại: ', v_stock_current);
+      SIGNAL SQLSTATE '45000' SET MESSAGE_TEXT = v_message;
     END IF;
     SET v_stock_new = v_stock_current - NEW.quantity;
   ELSEIF NEW.transaction_type = 'ADJUST' THEN
@@ -248,6 +412,216 @@ BEGIN
       LPAD(FLOOR(RAND()*1000), 3, '0')
     );
   END IF;
+  
+  -- Mã giao dịch duy nhất trên mọi partition: trùng mã sẽ lỗi khóa chính (1062) tại đây
+  INSERT INTO transaction_codes (transaction_code) VALUES (NEW.transaction_code);
+END$$
+
+CREATE TRIGGER trg_it_after_insert
+AFTER INSERT ON inventory_transactions
+FOR EACH ROW
+BEGIN
+  -- Cập nhật tồn kho hiện tại trong cùng giao dịch với bản ghi sổ
+  INSERT INTO stock_balances (product_id, warehouse_id, qty_on_hand, last_updated)
+  VALUES (NEW.product_id, NEW.warehouse_id, NEW.stock_after_transaction, NEW.created_at)
+  ON DUPLICATE KEY UPDATE
+    qty_on_hand = NEW.stock_after_transaction,
+    last_updated = NEW.created_at;
+
+  -- Cộng dồn vào bảng tổng hợp theo ngày
+  INSERT INTO txn_daily_rollup (
+    day, product_id, warehouse_id, qty_in, qty_out, qty_adjust, qty_moved,
+    txn_count, txn_in_count, txn_out_count, txn_adjust_count
+  ) VALUES (
+    DATE(NEW.created_at), NEW.product_id, NEW.warehouse_id,
+    IF(NEW.transaction_type = 'IN', NEW.quantity, 0),
+    IF(NEW.transaction_type = 'OUT', NEW.quantity, 0),
+    IF(NEW.transaction_type = 'ADJUST', NEW.quantity, 0),
+    ABS(NEW.quantity),
+    1,
+    IF(NEW.transaction_type = 'IN', 1, 0),
+    IF(NEW.transaction_type = 'OUT', 1, 0),
+    IF(NEW.transaction_type = 'ADJUST', 1, 0)
+  )
+  ON DUPLICATE KEY UPDATE
+    qty_in = qty_in + VALUES(qty_in),
+    qty_out = qty_out + VALUES(qty_out),
+    qty_adjust = qty_adjust + VALUES(qty_adjust),
+    qty_moved = qty_moved + VALUES(qty_moved),
+    txn_count = txn_count + 1,
+    txn_in_count = txn_in_count + VALUES(txn_in_count),
+    txn_out_count = txn_out_count + VALUES(txn_out_count),
+    txn_adjust_count = txn_adjust_count + VALUES(txn_adjust_count);
+END$$
+
+-- Tăng table_versions sau mỗi lần ghi vào các bảng danh mục
+CREATE TRIGGER trg_products_version_insert
+AFTER INSERT ON products
+FOR EACH ROW
+BEGIN
+  INSERT INTO table_versions (table_name, version) VALUES ('products', 1)
+  ON DUPLICATE KEY UPDATE version = version + 1, updated_at = CURRENT_TIMESTAMP;
+END$$
+
+CREATE TRIGGER trg_products_version_update
+AFTER UPDATE ON products
+FOR EACH ROW
+BEGIN
+  INSERT INTO table_versions (table_name, version) VALUES ('products', 1)
+  ON DUPLICATE KEY UPDATE version = version + 1, updated_at = CURRENT_TIMESTAMP;
+END$$
+
+CREATE TRIGGER trg_products_version_delete
+AFTER DELETE ON products
+FOR EACH ROW
+BEGIN
+  INSERT INTO table_versions (table_name, version) VALUES ('products', 1)
+  ON DUPLICATE KEY UPDATE version = version + 1, updated_at = CURRENT_TIMESTAMP;
+END$$
+
+CREATE TRIGGER trg_suppliers_version_insert
+AFTER INSERT ON suppliers
+FOR EACH ROW
+BEGIN
+  INSERT INTO table_versions (table_name, version) VALUES ('suppliers', 1)
+  ON DUPLICATE KEY UPDATE version = version + 1, updated_at = CURRENT_TIMESTAMP;
+END$$
+
+CREATE TRIGGER trg_suppliers_version_update
+AFTER UPDATE ON suppliers
+FOR EACH ROW
+BEGIN
+  INSERT INTO table_versions (table_name, version) VALUES ('suppliers', 1)
+  ON DUPLICATE KEY UPDATE version = version + 1, updated_at = CURRENT_TIMESTAMP;
+END$$
+
+CREATE TRIGGER trg_suppliers_version_delete
+AFTER DELETE ON suppliers
+FOR EACH ROW
+BEGIN
+  INSERT INTO table_versions (table_name, version) VALUES ('suppliers', 1)
+  ON DUPLICATE KEY UPDATE version = version + 1, updated_at = CURRENT_TIMESTAMP;
+END$$
+
+CREATE TRIGGER trg_warehouses_version_insert
+AFTER INSERT ON warehouses
+FOR EACH ROW
+BEGIN
+  INSERT INTO table_versions (table_name, version) VALUES ('warehouses', 1)
+  ON DUPLICATE KEY UPDATE version = version + 1, updated_at = CURRENT_TIMESTAMP;
+END$$
+
+CREATE TRIGGER trg_warehouses_version_update
+AFTER UPDATE ON warehouses
+FOR EACH ROW
+BEGIN
+  INSERT INTO table_versions (table_name, version) VALUES ('warehouses', 1)
+  ON DUPLICATE KEY UPDATE version = version + 1, updated_at = CURRENT_TIMESTAMP;
+END$$
+
+CREATE TRIGGER trg_warehouses_version_delete
+AFTER DELETE ON warehouses
+FOR EACH ROW
+BEGIN
+  INSERT INTO table_versions (table_name, version) VALUES ('warehouses', 1)
+  ON DUPLICATE KEY UPDATE version = version + 1, updated_at = CURRENT_TIMESTAMP;
+END$$
+
+CREATE TRIGGER trg_ps_version_insert
+AFTER INSERT ON product_supplier
+FOR EACH ROW
+BEGIN
+  INSERT INTO table_versions (table_name, version) VALUES ('product_supplier', 1)
+  ON DUPLICATE KEY UPDATE version = version + 1, updated_at = CURRENT_TIMESTAMP;
+END$$
+
+CREATE TRIGGER trg_ps_version_update
+AFTER UPDATE ON product_supplier
+FOR EACH ROW
+BEGIN
+  INSERT INTO table_versions (table_name, version) VALUES ('product_supplier', 1)
+  ON DUPLICATE KEY UPDATE version = version + 1, updated_at = CURRENT_TIMESTAMP;
+END$$
+
+CREATE TRIGGER trg_ps_version_delete
+AFTER DELETE ON product_supplier
+FOR EACH ROW
+BEGIN
+  INSERT INTO table_versions (table_name, version) VALUES ('product_supplier', 1)
+  ON DUPLICATE KEY UPDATE version = version + 1, updated_at = CURRENT_TIMESTAMP;
+END$$
+
+CREATE TRIGGER trg_users_version_insert
+AFTER INSERT ON users
+FOR EACH ROW
+BEGIN
+  INSERT INTO table_versions (table_name, version) VALUES ('users', 1)
+  ON DUPLICATE KEY UPDATE version = version + 1, updated_at = CURRENT_TIMESTAMP;
+END$$
+
+CREATE TRIGGER trg_users_version_update
+AFTER UPDATE ON users
+FOR EACH ROW
+BEGIN
+  -- Bỏ qua đổi mật khẩu/email/trạng thái: danh sách chỉ hiển thị username, full_name
+  IF NOT (OLD.username <=> NEW.username AND OLD.full_name <=> NEW.full_name) THEN
+    INSERT INTO table_versions (table_name, version) VALUES ('users', 1)
+    ON DUPLICATE KEY UPDATE version = version + 1, updated_at = CURRENT_TIMESTAMP;
+  END IF;
+END$$
+
+CREATE TRIGGER trg_users_version_delete
+AFTER DELETE ON users
+FOR EACH ROW
+BEGIN
+  INSERT INTO table_versions (table_name, version) VALUES ('users', 1)
+  ON DUPLICATE KEY UPDATE version = version + 1, updated_at = CURRENT_TIMESTAMP;
+END$$
+
+-- Lưu trữ / nạp lại tháng cũ của sổ không đổi đầu sổ (MAX(transaction_id)),
+-- nên ETag của /reports/txns và /reports/stock-as-of ghép thêm version này
+CREATE TRIGGER trg_ledger_archive_version_insert
+AFTER INSERT ON ledger_archive
+FOR EACH ROW
+BEGIN
+  INSERT INTO table_versions (table_name, version) VALUES ('ledger_archive', 1)
+  ON DUPLICATE KEY UPDATE version = version + 1, updated_at = CURRENT_TIMESTAMP;
+END$$
+
+CREATE TRIGGER trg_ledger_archive_version_update
+AFTER UPDATE ON ledger_archive
+FOR EACH ROW
+BEGIN
+  INSERT INTO table_versions (table_name, version) VALUES ('ledger_archive', 1)
+  ON DUPLICATE KEY UPDATE version = version + 1, updated_at = CURRENT_TIMESTAMP;
+END$$
+
+CREATE TRIGGER trg_ledger_archive_version_delete
+AFTER DELETE ON ledger_archive
+FOR EACH ROW
+BEGIN
+  INSERT INTO table_versions (table_name, version) VALUES ('ledger_archive', 1)
+  ON DUPLICATE KEY UPDATE version = version + 1, updated_at = CURRENT_TIMESTAMP;
+END$$
+
+-- Thay cho khóa ngoại của inventory_transactions (bảng phân vùng)
+-- supplier_id: ON DELETE SET NULL
+CREATE TRIGGER trg_suppliers_ledger_set_null
+AFTER DELETE ON suppliers
+FOR EACH ROW
+BEGIN
+  UPDATE inventory_transactions SET supplier_id = NULL WHERE supplier_id = OLD.supplier_id;
+END$$
+
+-- created_by: ON DELETE RESTRICT
+CREATE TRIGGER trg_users_ledger_restrict
+BEFORE DELETE ON users
+FOR EACH ROW
+BEGIN
+  IF EXISTS (SELECT 1 FROM inventory_transactions WHERE created_by = OLD.user_id) THEN
+    SIGNAL SQLSTATE '23000'
+      SET MESSAGE_TEXT = 'Người dùng đã tạo giao dịch, không thể xóa', MYSQL_ERRNO = 1451;
+  END IF;
 END$$
 
 DELIMITER ;
@@ -289,25 +663,11 @@ CREATE PROCEDURE sp_stock_out (
   IN p_reference_document VARCHAR(100)
 )
 BEGIN
-  DECLARE v_stock_current BIGINT;
-  DECLARE v_message VARCHAR(500);
-  
   IF p_quantity <= 0 THEN
     SIGNAL SQLSTATE '45000' SET MESSAGE_TEXT = 'Số lượng phải lớn hơn 0';
   END IF;
   
-  -- Kiểm tra tồn kho
-  SELECT COALESCE(stock_after_transaction, 0) INTO v_stock_current
-  FROM inventory_transactions
-  WHERE product_id = p_product_id AND warehouse_id = p_warehouse_id
-  ORDER BY created_at DESC, transaction_id DESC
-  LIMIT 1;
-  
-  IF v_stock_current < p_quantity THEN
-    SET v_message = CONCAT('Không đủ tồn kho. Tồn hiện tại: ', v_stock_current);
-    SIGNAL SQLSTATE '45000' SET MESSAGE_TEXT = v_message;
-  END IF;
-  
+  -- Kiểm tra tồn kho do trg_it_before_insert thực hiện trên dòng stock_balances đã khóa
   INSERT INTO inventory_transactions (
     product_id, warehouse_id, quantity, transaction_type,
     reason, reference_document, created_by
@@ -339,6 +699,109 @@ BEGIN
   );
 END$$
 
+-- Tính lại toàn bộ stock_balances từ sổ inventory_transactions
+-- (nếu đã lưu trữ: lần chốt cuối tháng lưu trữ gần nhất + phần sổ còn lại)
+CREATE PROCEDURE sp_rebuild_stock_balances ()
+BEGIN
+  DECLARE v_cp DATE;
+  DECLARE v_from DATE;
+
+  SELECT LAST_DAY(MAX(month)) INTO v_cp FROM ledger_archive;
+  SET v_from = COALESCE(v_cp + INTERVAL 1 DAY, '1000-01-01');
+
+  DELETE FROM stock_balances;
+
+  INSERT INTO stock_balances (product_id, warehouse_id, qty_on_hand, last_updated)
+  SELECT
+    x.product_id,
+    x.warehouse_id,
+    SUM(x.qty),
+    MAX(x.at)
+  FROM (
+    SELECT product_id, warehouse_id, qty_on_hand AS qty, TIMESTAMP(checkpoint_date, '23:59:59') AS at
+    FROM stock_checkpoints
+    WHERE checkpoint_date = v_cp
+    UNION ALL
+    SELECT product_id, warehouse_id,
+      CASE WHEN transaction_type = 'OUT' THEN -quantity ELSE quantity END,
+      created_at
+    FROM inventory_transactions
+    WHERE created_at >= v_from
+  ) x
+  GROUP BY x.product_id, x.warehouse_id;
+END$$
+
+-- Tính lại txn_daily_rollup từ sổ inventory_transactions
+-- (các ngày thuộc tháng đã lưu trữ không còn trong sổ nên được giữ nguyên)
+CREATE PROCEDURE sp_rebuild_txn_daily_rollup ()
+BEGIN
+  DECLARE v_from DATE;
+
+  SELECT LAST_DAY(MAX(month)) + INTERVAL 1 DAY INTO v_from FROM ledger_archive;
+  SET v_from = COALESCE(v_from, '1000-01-01');
+
+  DELETE FROM txn_daily_rollup WHERE day >= v_from;
+
+  INSERT INTO txn_daily_rollup (
+    day, product_id, warehouse_id, qty_in, qty_out, qty_adjust, qty_moved,
+    txn_count, txn_in_count, txn_out_count, txn_adjust_count
+  )
+  SELECT
+    DATE(created_at),
+    product_id,
+    warehouse_id,
+    SUM(CASE WHEN transaction_type = 'IN' THEN quantity ELSE 0 END),
+    SUM(CASE WHEN transaction_type = 'OUT' THEN quantity ELSE 0 END),
+    SUM(CASE WHEN transaction_type = 'ADJUST' THEN quantity ELSE 0 END),
+    SUM(ABS(quantity)),
+    COUNT(*),
+    SUM(transaction_type = 'IN'),
+    SUM(transaction_type = 'OUT'),
+    SUM(transaction_type = 'ADJUST')
+  FROM inventory_transactions
+  WHERE created_at >= v_from
+  GROUP BY DATE(created_at), product_id, warehouse_id;
+END$$
+
+-- Chốt tồn cuối ngày p_date: lần chốt trước đó + biến động từng ngày sau nó (txn_daily_rollup)
+CREATE PROCEDURE sp_create_stock_checkpoint (
+  IN p_date DATE
+)
+BEGIN
+  DECLARE v_prev DATE;
+
+  SELECT MAX(checkpoint_date) INTO v_prev
+  FROM stock_checkpoints
+  WHERE checkpoint_date < p_date;
+
+  DELETE FROM stock_checkpoints WHERE checkpoint_date = p_date;
+  INSERT INTO stock_checkpoints (checkpoint_date, product_id, warehouse_id, qty_on_hand)
+  SELECT p_date, x.product_id, x.warehouse_id, SUM(x.qty)
+  FROM (
+    SELECT product_id, warehouse_id, qty_on_hand AS qty
+    FROM stock_checkpoints
+    WHERE checkpoint_date = v_prev
+    UNION ALL
+    SELECT product_id, warehouse_id, qty_in - qty_out + qty_adjust
+    FROM txn_daily_rollup
+    WHERE day > COALESCE(v_prev, '1000-01-01') AND day <= p_date
+  ) x
+  GROUP BY x.product_id, x.warehouse_id;
+END$$
+
+-- Tính lại toàn bộ stock_checkpoints: chốt cuối mỗi tháng đã kết thúc
+CREATE PROCEDURE sp_rebuild_stock_checkpoints ()
+BEGIN
+  DECLARE v_date DATE;
+
+  DELETE FROM stock_checkpoints;
+  SELECT LAST_DAY(MIN(day)) INTO v_date FROM txn_daily_rollup;
+  WHILE v_date IS NOT NULL AND v_date < CURDATE() DO
+    CALL sp_create_stock_checkpoint(v_date);
+    SET v_date = LAST_DAY(v_date + INTERVAL 1 DAY);
+  END WHILE;
+END$$
+
 DELIMITER ;
 
 -- =====================================
@@ -431,4 +894,24 @@ CREATE INDEX idx_it_date ON inventory_transactions(created_at);
 --    - Quan hệ Product-Supplier-Warehouse: qua product_supplier với warehouse_id (N-N-N) - tạo quan hệ Supplier-Warehouse gián tiếp
 --    - Quan hệ Supplier-Warehouse: qua product_supplier.warehouse_id (gián tiếp, không có bảng riêng)
 -- 4. Views hỗ trợ báo cáo không cần join nhiều bảng
+-- 5. stock_balances giữ tồn kho hiện tại theo (product_id, warehouse_id):
+--    trg_it_after_insert cập nhật trong cùng giao dịch, sp_rebuild_stock_balances tính lại từ sổ
+-- 6. trg_it_before_insert đọc tồn kho trước giao dịch từ stock_balances (SELECT ... FOR UPDATE),
+--    nên chi phí ghi sổ không tăng theo lịch sử và hai lệnh xuất đồng thời không thể cùng vượt tồn
+-- 7. txn_daily_rollup tổng hợp nhập/xuất theo (ngày, sản phẩm, kho), do trg_it_after_insert cộng dồn;
+--    báo cáo ngày/tuần/tháng đọc từ đây, sp_rebuild_txn_daily_rollup tính lại từ sổ
+-- 8. table_versions được trigger tăng sau mỗi lần ghi products/suppliers/warehouses/product_supplier/users;
+--    API ghép các version này với MAX(transaction_id) của sổ làm ETag để trả 304 trước khi truy vấn nặng
 
+-- 9. stock_checkpoints chốt tồn cuối kỳ (mặc định cuối tháng, sp_create_stock_checkpoint cho từng ngày chốt);
+--    tồn tại ngày D = lần chốt gần nhất <= D + biến động txn_daily_rollup trong (ngày chốt, D],
+--    nên chi phí không phụ thuộc D cách hiện tại bao xa
+-- 10. inventory_transactions phân vùng RANGE theo tháng (p<YYYYMM>, pmax); ledger_partitions.py
+--    tạo trước partition tháng tới, lưu trữ tháng cũ ra file .csv.gz (ledger_archive) rồi DROP PARTITION.
+--    Báo cáo lọc theo created_at chỉ đọc các partition liên quan; txn_daily_rollup, stock_checkpoints
+--    giữ nguyên lịch sử của các tháng đã lưu trữ, và sp_rebuild_* bắt đầu từ mốc lưu trữ;
+--    mỗi lần ghi ledger_archive (sau DROP PARTITION / sau khi nạp lại) tăng table_versions('ledger_archive')
+-- 11. Chỉ mục sổ giao dịch kết thúc bằng created_at (idx_it_pair_date, idx_it_product_date,
+--    idx_it_warehouse_date) để lọc theo sản phẩm/kho + khoảng ngày trả về đúng thứ tự
+--    ORDER BY created_at DESC, transaction_id DESC mà không filesort;
+--    python -m migrations.check_plans chạy EXPLAIN cho các truy vấn của routes/